@@ -0,0 +1,312 @@
+"""
+Admission - Concurrency limits and a bounded wait queue for the chat and voice views
+"""
+import asyncio
+import threading
+from collections import deque
+from functools import wraps
+from typing import Any, Deque, Dict, NamedTuple, Optional, Tuple
+from django.http import JsonResponse
+from ai_app import metrics
+from ai_app.config import AIConfig
+
+
+COUNTERS = (
+    "admission.admitted",
+    "admission.queued",
+    "admission.rejected.user_limit",
+    "admission.rejected.queue_full",
+    "admission.rejected.timeout",
+)
+
+
+class Rejection(NamedTuple):
+    """Why a request was not admitted"""
+    status: int
+    reason: str
+    retry_after: int
+
+
+class _Waiter:
+    """A queued request; release() hands its slot over by setting `granted`"""
+    
+    def __init__(self, client: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.client = client
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+    
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+    
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class AdmissionController:
+    """
+    Limits how many chat/voice requests one worker process runs at once
+    
+    A client (user, or IP address for anonymous requests) may hold at most
+    `max_per_client` running or queued requests; beyond that it gets 429.
+    Requests over the global limit wait in a FIFO queue of at most
+    `max_queue` entries for up to `queue_timeout` seconds; a full queue or
+    an expired wait gets 503. A finished request hands its slot straight to
+    the oldest waiter, so sync (thread) and async (event loop) requests
+    share one queue.
+    """
+    
+    def __init__(self, max_concurrent: Optional[int] = None, max_per_client: Optional[int] = None,
+                 max_queue: Optional[int] = None, queue_timeout: Optional[float] = None):
+        """Initialize controller (limits default to AIConfig)"""
+        self.max_concurrent = AIConfig.ADMISSION_MAX_CONCURRENT if max_concurrent is None else max_concurrent
+        self.max_per_client = AIConfig.ADMISSION_MAX_PER_CLIENT if max_per_client is None else max_per_client
+        self.max_queue = AIConfig.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.queue_timeout = AIConfig.ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.retry_after = AIConfig.ADMISSION_RETRY_AFTER
+        
+        self._lock = threading.Lock()
+        self._active = 0
+        self._held: Dict[str, int] = {}
+        self._waiters: Deque[_Waiter] = deque()
+    
+    def admit(self, client: str) -> Optional[Rejection]:
+        """
+        Take a slot for `client`, waiting in the queue if necessary
+        
+        Returns:
+            None once admitted (call release() when done), or the Rejection
+        """
+        waiter, rejection, counter = self._enter(client, None)
+        metrics.incr(counter)
+        if waiter is None:
+            return rejection
+        
+        waiter.event.wait(self.queue_timeout)
+        rejection, counter = self._settle(waiter)
+        metrics.incr(counter)
+        return rejection
+    
+    async def aadmit(self, client: str) -> Optional[Rejection]:
+        """Take a slot for `client` (async); counters are updated off the event loop"""
+        waiter, rejection, counter = self._enter(client, asyncio.get_running_loop())
+        metrics.incr_soon(counter)
+        if waiter is None:
+            return rejection
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot if one was handed over
+            if self._settle(waiter)[0] is None:
+                self.release(client)
+            raise
+        rejection, counter = self._settle(waiter)
+        metrics.incr_soon(counter)
+        return rejection
+    
+    def release(self, client: str):
+        """Free the slot taken by admit(), handing it to the oldest waiter if any"""
+        with self._lock:
+            self._drop(client)
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._active -= 1
+    
+    def stats(self) -> Dict[str, int]:
+        """Running and queued requests in this process"""
+        with self._lock:
+            return {"active": self._active, "queued": len(self._waiters)}
+    
+    def _enter(self, client: str, loop: Optional[asyncio.AbstractEventLoop]):
+        """Admit immediately, queue, or reject; returns (waiter or None, rejection or None, counter)"""
+        with self._lock:
+            if self._held.get(client, 0) >= self.max_per_client:
+                rejection = Rejection(429, "Too many requests in progress for this client", self.retry_after)
+                counter = "admission.rejected.user_limit"
+            elif self._active < self.max_concurrent:
+                self._active += 1
+                self._held[client] = self._held.get(client, 0) + 1
+                rejection = None
+                counter = "admission.admitted"
+            elif len(self._waiters) >= self.max_queue:
+                rejection = Rejection(503, "Chat service is at capacity", self.retry_after)
+                counter = "admission.rejected.queue_full"
+            else:
+                waiter = _Waiter(client, loop)
+                self._waiters.append(waiter)
+                self._held[client] = self._held.get(client, 0) + 1
+                return waiter, None, "admission.queued"
+        
+        return None, rejection, counter
+    
+    def _settle(self, waiter: _Waiter) -> Tuple[Optional[Rejection], str]:
+        """Outcome of a finished wait and its counter: admitted if the slot was handed over in time"""
+        with self._lock:
+            if not waiter.granted:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                self._drop(waiter.client)
+        
+        if waiter.granted:
+            return None, "admission.admitted"
+        
+        return Rejection(503, "Chat service is busy, please retry shortly", self.retry_after), "admission.rejected.timeout"
+    
+    def _drop(self, client: str):
+        held = self._held.get(client, 0) - 1
+        if held > 0:
+            self._held[client] = held
+        else:
+            self._held.pop(client, None)
+
+
+def admission_stats() -> Dict[str, Any]:
+    """Admission counters for all workers plus the queue of the worker answering"""
+    counts = metrics.get_counts(COUNTERS)
+    
+    return {
+        "admitted": counts["admission.admitted"],
+        "queued": counts["admission.queued"],
+        "rejected": {
+            "user_limit": counts["admission.rejected.user_limit"],
+            "queue_full": counts["admission.rejected.queue_full"],
+            "timeout": counts["admission.rejected.timeout"],
+        },
+        "this_worker": admission_controller.stats()
+    }
+
+
+def rejection_response(rejection: Rejection) -> JsonResponse:
+    """429/503 response with a Retry-After header"""
+    response = JsonResponse({
+        "response": rejection.reason,
+        "success": False,
+        "error": "rate_limited" if rejection.status == 429 else "overloaded"
+    }, status=rejection.status)
+    response["Retry-After"] = str(rejection.retry_after)
+    return response
+
+
+def client_key(user, address: str, forwarded: Optional[str] = None) -> str:
+    """
+    Admission client of a user, or of the remote address when anonymous
+    
+    Args:
+        user: Request user (None or anonymous for unauthenticated clients)
+        address: Peer address of the connection
+        forwarded: Value of AIConfig.ADMISSION_FORWARDED_HEADER, if set
+    """
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{forwarded_address(address, forwarded)}"
+
+
+def forwarded_address(address: str, forwarded: Optional[str]) -> str:
+    """
+    Client address added by the trusted proxies, else the peer address
+    
+    Entries to the left of the trusted proxies' own are set by the client
+    and can be spoofed, so they are ignored.
+    """
+    if not AIConfig.ADMISSION_FORWARDED_HEADER or not forwarded:
+        return address
+    
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    trusted = max(1, AIConfig.ADMISSION_TRUSTED_PROXIES)
+    return hops[-trusted] if len(hops) >= trusted else address
+
+
+def _client_key(request, user) -> str:
+    header = AIConfig.ADMISSION_FORWARDED_HEADER
+    forwarded = request.headers.get(header) if header else None
+    return client_key(user, request.META.get('REMOTE_ADDR', ''), forwarded)
+
+
+def _release_after_stream(response, client: str):
+    """Keep the slot until a streamed response has been sent"""
+    content = response.streaming_content
+    
+    if response.is_async:
+        async def stream():
+            try:
+                async for part in content:
+                    yield part
+            finally:
+                admission_controller.release(client)
+    else:
+        def stream():
+            try:
+                yield from content
+            finally:
+                admission_controller.release(client)
+    
+    response.streaming_content = stream()
+    return response
+
+
+def admission_controlled(handler):
+    """
+    Run a view handler (sync, DRF or async) under the shared admission controller
+    
+    The slot is held until the response is built, or for streamed responses
+    until the stream is closed.
+    """
+    if asyncio.iscoroutinefunction(handler):
+        @wraps(handler)
+        async def async_wrapper(view, request, *args, **kwargs):
+            auser = getattr(request, "auser", None)
+            client = _client_key(request, await auser() if auser else None)
+            
+            rejection = await admission_controller.aadmit(client)
+            if rejection:
+                return rejection_response(rejection)
+            
+            try:
+                response = await handler(view, request, *args, **kwargs)
+            except BaseException:
+                admission_controller.release(client)
+                raise
+            if response.streaming:
+                return _release_after_stream(response, client)
+            admission_controller.release(client)
+            return response
+        
+        return async_wrapper
+    
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        client = _client_key(request, getattr(request, "user", None))
+        
+        rejection = admission_controller.admit(client)
+        if rejection:
+            return rejection_response(rejection)
+        
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except BaseException:
+            admission_controller.release(client)
+            raise
+        if response.streaming:
+            return _release_after_stream(response, client)
+        admission_controller.release(client)
+        return response
+    
+    return wrapper
+
+
+admission_controller = AdmissionController()
@@ -11,6 +11,9 @@ class FloorBotAPI:
     """
     Simple API interface for FloorBot AI
     For direct Python integration or testing
+    
+    The chatbot and speech service share the process-wide OpenAI client
+    from ai_app.clients, so creating many FloorBotAPI instances is cheap.
     """
     
     def __init__(self):
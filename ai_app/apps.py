@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AiAppConfig(AppConfig):
     name = 'ai_app'
+
+    def ready(self):
+        import ai_app.signals  # noqa: F401
@@ -0,0 +1,208 @@
+"""
+Audio Preprocess - Shrinks PCM WAV clips before they are uploaded to Whisper
+"""
+import io
+import tempfile
+import wave
+from typing import List, Optional
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - clips are uploaded as recorded
+    np = None
+
+from ai_app.config import AIConfig
+
+
+# Full-scale value of each PCM sample width (bytes)
+PCM_SCALE = {1: 128.0, 2: 32768.0, 3: 8388608.0, 4: 2147483648.0}
+
+# Input decoded per step, in seconds; bounds the working set of a conversion
+BLOCK_SECONDS = 1
+
+
+class AudioTooLong(ValueError):
+    """Speech in the clip is longer than AIConfig.AUDIO_MAX_DURATION_SECONDS"""
+
+
+def preprocess_wav(audio_file, max_duration: Optional[float] = None) -> Optional[bytes]:
+    """
+    Mono, 16 kHz, silence-trimmed 16-bit PCM WAV for a seekable PCM WAV file
+    
+    The clip is decoded and resampled one BLOCK_SECONDS block at a time
+    straight from `audio_file`. The 16-bit output goes to a spooled temporary
+    file, which spills to disk past FILE_UPLOAD_MAX_MEMORY_SIZE. Only the
+    trimmed result is returned as bytes, and the duration limit caps it at
+    about 32 KB per second of speech (3.8 MB at the 120 s default).
+    
+    Args:
+        audio_file: Seekable WAV file, read from its current position
+        max_duration: Longest speech allowed in seconds (default from AIConfig)
+    
+    Returns:
+        The new WAV bytes, or None to upload the file as it is: the clip is
+        not PCM WAV, is already mono 16 kHz 16-bit with nothing to trim, or
+        NumPy is missing
+    
+    Raises:
+        AudioTooLong: The trimmed clip is longer than max_duration
+    """
+    max_duration = AIConfig.AUDIO_MAX_DURATION_SECONDS if max_duration is None else max_duration
+    if np is None:
+        return None
+    
+    try:
+        reader = wave.open(audio_file, "rb")
+    except (wave.Error, EOFError):
+        return None
+    
+    with reader, tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as pcm:
+        channels = reader.getnchannels()
+        width = reader.getsampwidth()
+        rate = reader.getframerate()
+        if width not in PCM_SCALE or not rate or not reader.getnframes():
+            return None
+        
+        target_rate = AIConfig.AUDIO_SAMPLE_RATE
+        resampler = _Resampler(rate, target_rate)
+        meter = _EnergyMeter(max(1, target_rate * AIConfig.AUDIO_SILENCE_FRAME_MS // 1000))
+        
+        while True:
+            frames = reader.readframes(rate * BLOCK_SECONDS)
+            if not frames:
+                break
+            samples = resampler.feed(_to_mono(frames, channels, width))
+            meter.feed(samples)
+            pcm.write(_to_pcm16(samples))
+        
+        total = meter.total
+        start, end = meter.speech_bounds(target_rate * AIConfig.AUDIO_SILENCE_PADDING_MS // 1000)
+        
+        duration = (end - start) / target_rate
+        if max_duration and duration > max_duration:
+            raise AudioTooLong(f"Audio is {duration:.0f}s long; the limit is {max_duration:.0f}s")
+        
+        if (channels, width, rate) == (1, 2, target_rate) and (start, end) == (0, total):
+            return None
+        
+        pcm.seek(start * 2)
+        return _encode_wav(pcm.read((end - start) * 2), target_rate)
+
+
+def _to_mono(frames: bytes, channels: int, width: int):
+    """Float32 samples in [-1, 1], averaged across channels"""
+    if width == 1:
+        samples = np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0
+    elif width == 3:
+        # Little-endian 24-bit: widen to int32 with the sign in the top byte
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (
+            raw[:, 0].astype(np.int32)
+            | (raw[:, 1].astype(np.int32) << 8)
+            | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)
+        ).astype(np.float32)
+    else:
+        samples = np.frombuffer(frames, dtype=f"<i{width}").astype(np.float32)
+    
+    samples /= PCM_SCALE[width]
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+
+class _Resampler:
+    """
+    Block-by-block linear resampling, box-filtered first when downsampling
+    
+    The filter history and the last filtered sample are carried between
+    blocks, so the output matches resampling the whole clip at once.
+    """
+    
+    def __init__(self, rate: int, target_rate: int):
+        self.step = rate / target_rate
+        self.identity = rate == target_rate
+        self.width = int(round(self.step)) if rate > target_rate else 1
+        self.history = np.zeros(self.width - 1, dtype=np.float32)
+        self.previous: Optional[float] = None
+        self.consumed = 0
+        self.produced = 0
+    
+    def feed(self, samples):
+        if self.identity or not len(samples):
+            return samples
+        
+        if self.width > 1:
+            padded = np.concatenate([self.history, samples])
+            self.history = padded[len(padded) - (self.width - 1):]
+            samples = np.convolve(padded, np.full(self.width, 1.0 / self.width, dtype=np.float32), mode="valid")
+        
+        # Global input positions covered: the carried sample (if any) plus this block
+        if self.previous is None:
+            origin, points = self.consumed, samples
+        else:
+            origin, points = self.consumed - 1, np.concatenate([[self.previous], samples])
+        self.consumed += len(samples)
+        self.previous = float(samples[-1])
+        
+        last = int((self.consumed - 1) / self.step)
+        if last < self.produced:
+            return np.zeros(0, dtype=np.float32)
+        
+        positions = np.arange(self.produced, last + 1, dtype=np.float64) * self.step - origin
+        self.produced = last + 1
+        return np.interp(positions, np.arange(len(points)), points).astype(np.float32)
+
+
+class _EnergyMeter:
+    """RMS energy per fixed-size frame of a sample stream, fed in blocks"""
+    
+    def __init__(self, frame: int):
+        self.frame = frame
+        self.total = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.rms: List = []
+    
+    def feed(self, samples):
+        self.total += len(samples)
+        samples = np.concatenate([self.pending, samples])
+        count = len(samples) // self.frame
+        if count:
+            frames = samples[:count * self.frame].reshape(count, self.frame)
+            self.rms.append(np.sqrt(np.mean(np.square(frames), axis=1)))
+        self.pending = samples[count * self.frame:]
+    
+    def speech_bounds(self, padding: int):
+        """
+        (start, end) sample range between the first and last loud frame
+        
+        A frame is loud when its RMS energy is within AUDIO_SILENCE_THRESHOLD_DB
+        of full scale. `padding` samples are kept on both sides; a clip with
+        no loud frame is kept whole.
+        """
+        if not self.rms:
+            return 0, self.total
+        
+        rms = np.concatenate(self.rms)
+        threshold = 10 ** (AIConfig.AUDIO_SILENCE_THRESHOLD_DB / 20)
+        loud = np.flatnonzero(rms >= threshold)
+        if not len(loud):
+            return 0, self.total
+        
+        start = max(0, loud[0] * self.frame - padding)
+        end = min(self.total, (loud[-1] + 1) * self.frame + padding)
+        return int(start), int(end)
+
+
+def _to_pcm16(samples) -> bytes:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def _encode_wav(pcm: bytes, rate: int) -> bytes:
+    """16-bit mono PCM WAV bytes"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(pcm)
+    return buffer.getvalue()
@@ -2,13 +2,20 @@
 FloorBot AI Chatbot Engine - Core conversational AI using OpenAI GPT-4
 """
 import json
-from typing import Optional, Dict, List, Any
-from openai import OpenAI
+from typing import Optional, Dict, List, Any, Iterator, AsyncIterator, Tuple
+from asgiref.sync import sync_to_async
+from ai_app.clients import get_openai_client, get_async_openai_client
 from ai_app.config import AIConfig
-from ai_app.schemas import ChatSession, MessageRole
-from ai_app.session_manager import SessionManager
+from ai_app.completion_cache import completion_coalescer, completion_key
+from ai_app.context_builder import ContextBuilder, HISTORY_LOAD_LIMIT
+from ai_app.intent_router import IntentRouter
+from ai_app.schemas import ChatSession, ConversationMessage, MessageRole
+from ai_app.session_manager import SessionManager, SESSION_BUSY
 from ai_app.product_service import DjangoProductService
 from ai_app.order_calculator import OrderCalculator
+from ai_app.tool_cache import ToolResultCache
+from ai_app.tool_executor import run_concurrently
+from ai_app.tool_payload import tool_message_content
 
 
 class FloorBotAI:
@@ -16,7 +23,7 @@ class FloorBotAI:
     
     def __init__(self):
         """Initialize FloorBot AI"""
-        self.client = OpenAI(api_key=AIConfig.OPENAI_API_KEY)
+        self.client = get_openai_client()
         self.model = AIConfig.OPENAI_MODEL
         self.temperature = AIConfig.OPENAI_TEMPERATURE
         self.max_tokens = AIConfig.OPENAI_MAX_TOKENS
@@ -24,6 +31,9 @@ class FloorBotAI:
         self.session_manager = SessionManager()
         self.product_service = DjangoProductService()
         self.order_calculator = OrderCalculator(self.product_service)
+        self.tool_cache = ToolResultCache()
+        self.context_builder = ContextBuilder(summarizer=self._summarize_history)
+        self.intent_router = IntentRouter(self.product_service)
         
         self.tools = self._define_tools()
     
@@ -140,6 +150,10 @@ class FloorBotAI:
         """
         Process a chat message
         
+        Turns for one session run one at a time; a duplicate submission waits
+        for the running turn and is rejected (error SESSION_BUSY) if it takes
+        longer than AIConfig.SESSION_TURN_WAIT.
+        
         Args:
             session_id: Session ID
             message: User message
@@ -147,14 +161,20 @@ class FloorBotAI:
         Returns:
             Response dictionary with AI reply and products if found
         """
-        session = self.session_manager.get_session(session_id)
+        turn = self.session_manager.acquire_turn(session_id)
+        if not turn:
+            return self._session_busy(session_id)
+        
+        try:
+            return self._chat(session_id, message)
+        finally:
+            self.session_manager.release_turn(session_id, turn)
+    
+    def _chat(self, session_id: str, message: str) -> Dict[str, Any]:
+        session = self.session_manager.get_session(session_id, history_limit=HISTORY_LOAD_LIMIT)
         
         if not session:
-            return {
-                "session_id": session_id,
-                "response": "Session not found. Please create a new session.",
-                "success": False
-            }
+            return self._session_not_found(session_id)
         
         session.add_message(MessageRole.USER, message)
         
@@ -162,90 +182,386 @@ class FloorBotAI:
         found_products = []
         
         try:
-            messages = session.get_openai_messages(limit=AIConfig.MAX_CONVERSATION_HISTORY)
+            fast_reply = self._fast_path(session, message)
+            if fast_reply:
+                return self._finish_turn(session, *fast_reply)
+            
+            messages = self.context_builder.build(session)
+            
+            first = self._first_completion(messages)
+            
+            if first["tool_calls"]:
+                found_products = self._run_tool_calls(messages, first["content"], first["tool_calls"], session)
+                
+                second_response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+                
+                final_content = second_response.choices[0].message.content
+            else:
+                final_content = first["content"]
+            
+            return self._finish_turn(session, final_content, found_products)
+        
+        except Exception as e:
+            return self._turn_error(session_id, e)
+    
+    def chat_stream(self, session_id: str, message: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process a chat message, yielding events as the reply is produced
+        
+        Both completions are streamed. Tool-call deltas from the first one
+        are accumulated by index; products found by the tools are yielded
+        before the second completion starts.
+        
+        Args:
+            session_id: Session ID
+            message: User message
+            
+        Yields:
+            {"event": "products" | "token" | "done" | "error", "data": {...}}
+        """
+        turn = self.session_manager.acquire_turn(session_id)
+        if not turn:
+            yield {"event": "error", "data": self._session_busy(session_id)}
+            return
+        
+        try:
+            yield from self._chat_stream(session_id, message)
+        finally:
+            self.session_manager.release_turn(session_id, turn)
+    
+    def _chat_stream(self, session_id: str, message: str) -> Iterator[Dict[str, Any]]:
+        session = self.session_manager.get_session(session_id, history_limit=HISTORY_LOAD_LIMIT)
+        
+        if not session:
+            yield {"event": "error", "data": self._session_not_found(session_id)}
+            return
+        
+        session.add_message(MessageRole.USER, message)
+        
+        found_products = []
+        
+        try:
+            fast_reply = self._fast_path(session, message)
+            if fast_reply:
+                for event in self._fast_reply_events(*fast_reply, self._finish_turn(session, *fast_reply)):
+                    yield event
+                return
+            
+            messages = self.context_builder.build(session)
             
-            response = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 tools=self.tools,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens
+                max_tokens=self.max_tokens,
+                stream=True
             )
             
-            assistant_message = response.choices[0].message
+            content_parts = []
+            tool_calls_by_index = {}
             
-            if assistant_message.tool_calls:
-                function_responses = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
                 
-                for tool_call in assistant_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    function_response = self._execute_function(function_name, function_args, session)
-                    
-                    # If products were searched, track them
-                    if function_name == "search_products" and "products" in function_response:
-                        found_products = function_response["products"]
-                    
-                    function_responses.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": json.dumps(function_response)
-                    })
+                if delta.content:
+                    content_parts.append(delta.content)
+                    # Once tool calls start, text is superseded by the
+                    # second completion and no longer forwarded
+                    if not tool_calls_by_index:
+                        yield {"event": "token", "data": {"content": delta.content}}
                 
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_message.content or "",
-                    "tool_calls": [
-                        {
-                            "id": tc.id,
-                            "type": "function",
-                            "function": {"name": tc.function.name, "arguments": tc.function.arguments}
-                        }
-                        for tc in assistant_message.tool_calls
-                    ]
-                })
+                for tool_delta in delta.tool_calls or []:
+                    self._accumulate_tool_call(tool_calls_by_index, tool_delta)
+            
+            first_content = "".join(content_parts)
+            
+            if tool_calls_by_index:
+                tool_calls = [tool_calls_by_index[index] for index in sorted(tool_calls_by_index)]
+                found_products = self._run_tool_calls(messages, first_content, tool_calls, session)
                 
-                messages.extend(function_responses)
+                if found_products:
+                    yield {
+                        "event": "products",
+                        "data": {"products": found_products, "product_count": len(found_products)}
+                    }
                 
-                second_response = self.client.chat.completions.create(
+                second_stream = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=self.temperature,
-                    max_tokens=self.max_tokens
+                    max_tokens=self.max_tokens,
+                    stream=True
                 )
                 
-                final_content = second_response.choices[0].message.content
+                content_parts = []
+                for chunk in second_stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        content_parts.append(token)
+                        yield {"event": "token", "data": {"content": token}}
+                
+                final_content = "".join(content_parts)
             else:
-                final_content = assistant_message.content
+                final_content = first_content
+            
+            response_data = self._finish_turn(session, final_content, found_products)
+            # Products were already delivered in their own event
+            response_data.pop("products", None)
+            yield {"event": "done", "data": response_data}
+        
+        except Exception as e:
+            yield {"event": "error", "data": self._turn_error(session_id, e)}
+    
+    def _fast_path(self, session: ChatSession, message: str) -> Optional[Tuple[str, List[Dict]]]:
+        """
+        Answer a turn through the intent router, skipping both LLM calls
+        
+        Returns:
+            (reply, found_products), or None if the turn needs the model
+        """
+        if AIConfig.INTENT_ROUTER_ENABLED:
+            intent = self.intent_router.route(message, session)
+            if intent:
+                result = self._execute_function(intent.function_name, intent.arguments, session)
+                reply = self.intent_router.render(intent, result)
+                if reply is not None:
+                    self.intent_router.record(intent.function_name)
+                    return reply, result.get("products", []) if intent.function_name == "search_products" else []
             
-            session.add_message(MessageRole.ASSISTANT, final_content)
-            self.session_manager.update_session(session)
+            self.intent_router.record(None)
+        
+        return None
+    
+    def _fast_reply_events(self, reply: str, found_products: List[Dict],
+                           response_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """chat_stream events for a fast-path reply"""
+        events = []
+        if found_products:
+            events.append({
+                "event": "products",
+                "data": {"products": found_products, "product_count": len(found_products)}
+            })
+        events.append({"event": "token", "data": {"content": reply}})
+        
+        response_data.pop("products", None)
+        events.append({"event": "done", "data": response_data})
+        return events
+    
+    def _first_completion(self, messages: List[Dict]) -> Dict[str, Any]:
+        """
+        First completion of a turn, shared with identical concurrent or recent requests
+        
+        Returns:
+            {"content": str or None, "tool_calls": [{"id", "name", "arguments"}]}
+        """
+        request = self._first_completion_request(messages)
+        
+        def call():
+            return self._completion_result(self.client.chat.completions.create(**request))
+        
+        return completion_coalescer.run(completion_key(**request), call)
+    
+    def _first_completion_request(self, messages: List[Dict]) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "tools": self.tools,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+    
+    def _completion_result(self, response: Any) -> Dict[str, Any]:
+        """Plain (cacheable) form of a non-streamed completion"""
+        assistant_message = response.choices[0].message
+        return {
+            "content": assistant_message.content,
+            "tool_calls": self._tool_calls_from_message(assistant_message) if assistant_message.tool_calls else []
+        }
+    
+    def _tool_calls_from_message(self, assistant_message: Any) -> List[Dict[str, str]]:
+        """Normalize tool calls of a non-streamed completion message"""
+        return [
+            {"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+            for tc in assistant_message.tool_calls
+        ]
+    
+    def _accumulate_tool_call(self, tool_calls_by_index: Dict[int, Dict[str, str]], tool_delta: Any):
+        """Merge one streamed tool-call delta into the call at its index"""
+        call = tool_calls_by_index.setdefault(
+            tool_delta.index, {"id": "", "name": "", "arguments": ""}
+        )
+        if tool_delta.id:
+            call["id"] = tool_delta.id
+        if tool_delta.function:
+            if tool_delta.function.name:
+                call["name"] += tool_delta.function.name
+            if tool_delta.function.arguments:
+                call["arguments"] += tool_delta.function.arguments
+    
+    def _run_tool_calls(self, messages: List[Dict], content: Optional[str],
+                        tool_calls: List[Dict[str, str]], session: ChatSession) -> List[Dict]:
+        """
+        Execute tool calls and append the assistant/tool messages to `messages`
+        
+        Calls run concurrently, each bounded by AIConfig.TOOL_CALL_TIMEOUT.
+        Results and session context updates are applied in tool_call order.
+        
+        Args:
+            messages: OpenAI message list for this turn (mutated)
+            content: Assistant text that accompanied the tool calls
+            tool_calls: [{"id", "name", "arguments"}] with arguments as JSON text
+            session: Current chat session
             
-            # Build response with products if any were found
-            response_data = {
-                "session_id": session_id,
-                "response": final_content,
-                "success": True
-            }
+        Returns:
+            Serialized products from the last search_products call, if any
+        """
+        found_products = []
+        function_responses = []
+        
+        calls = [(tc["name"], json.loads(tc["arguments"] or "{}")) for tc in tool_calls]
+        results = run_concurrently(
+            self._execute_function,
+            calls,
+            on_timeout=lambda call: {"error": f"{call[0]} timed out, please try again"}
+        )
+        
+        for tool_call, (function_name, function_args), function_response in zip(tool_calls, calls, results):
+            self._remember_search(function_name, function_args, function_response, session)
             
-            if found_products:
-                response_data["products"] = found_products
-                response_data["product_count"] = len(found_products)
+            # If products were searched, track them
+            if function_name == "search_products" and "products" in function_response:
+                found_products = function_response["products"]
             
-            return response_data
+            function_responses.append({
+                "tool_call_id": tool_call["id"],
+                "role": "tool",
+                "name": function_name,
+                "content": tool_message_content(function_name, function_response)
+            })
         
-        except Exception as e:
-            return {
-                "session_id": session_id,
-                "response": f"I encountered an error: {str(e)}",
-                "success": False,
-                "error": str(e)
-            }
+        messages.append({
+            "role": "assistant",
+            "content": content or "",
+            "tool_calls": [
+                {
+                    "id": tc["id"],
+                    "type": "function",
+                    "function": {"name": tc["name"], "arguments": tc["arguments"]}
+                }
+                for tc in tool_calls
+            ]
+        })
+        
+        messages.extend(function_responses)
+        
+        return found_products
+    
+    def _finish_turn(self, session: ChatSession, final_content: str, found_products: List[Dict]) -> Dict[str, Any]:
+        """Store the assistant reply and build the turn response"""
+        session.add_message(MessageRole.ASSISTANT, final_content)
+        self.session_manager.update_session(session)
+        
+        return self._turn_response(session, final_content, found_products)
+    
+    def _turn_response(self, session: ChatSession, final_content: str, found_products: List[Dict]) -> Dict[str, Any]:
+        """Build the turn response with products if any were found"""
+        response_data = {
+            "session_id": session.session_id,
+            "response": final_content,
+            "success": True
+        }
+        
+        if found_products:
+            response_data["products"] = found_products
+            response_data["product_count"] = len(found_products)
+        
+        return response_data
+    
+    def _summarize_history(self, previous_summary: str, messages: List[ConversationMessage]) -> str:
+        """Fold older turns into the running conversation summary (always via the sync client)"""
+        transcript = "\n".join(f"{msg.role.value}: {msg.content}" for msg in messages)
+        response = get_openai_client().chat.completions.create(
+            model=AIConfig.SUMMARY_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Update the summary of a flooring shop conversation. Keep the customer's "
+                               "requirements, room dimensions, products discussed (with ids and prices) "
+                               "and any decisions. Reply with the summary only."
+                },
+                {
+                    "role": "user",
+                    "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+                }
+            ],
+            temperature=0,
+            max_tokens=AIConfig.SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content or previous_summary
+    
+    def _session_not_found(self, session_id: str) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "response": "Session not found. Please create a new session.",
+            "success": False
+        }
+    
+    def _session_busy(self, session_id: str) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "response": "Your previous message is still being answered. Please wait for the reply and try again.",
+            "success": False,
+            "error": SESSION_BUSY
+        }
+    
+    def _turn_error(self, session_id: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "response": f"I encountered an error: {str(error)}",
+            "success": False,
+            "error": str(error)
+        }
     
     def _execute_function(self, function_name: str, arguments: Dict, session: Any = None) -> Dict:
-        """Execute a function call from GPT"""
+        """Execute a function call from GPT, serving repeated calls from the tool cache"""
+        
+        if self.tool_cache.is_cacheable(function_name):
+            result = self.tool_cache.get(function_name, arguments)
+            if result is None:
+                result = self._call_function(function_name, arguments)
+                self.tool_cache.set(function_name, arguments, result)
+        else:
+            result = self._call_function(function_name, arguments)
+        
+        self._remember_search(function_name, arguments, result, session)
+        
+        return result
+    
+    def _remember_search(self, function_name: str, arguments: Dict, result: Dict, session: Any = None):
+        """Store search context in session for follow-up filtering"""
+        if function_name == "search_products" and session and "products" in result:
+            session.context["last_search_filters"] = {
+                "product_type": arguments.get("product_type"),
+                "color": arguments.get("color"),
+                "material": arguments.get("material"),
+                "pattern": arguments.get("pattern"),
+                "max_price": arguments.get("max_price"),
+                "keyword": arguments.get("keyword")
+            }
+            session.context["last_products"] = [p["id"] for p in result["products"]]
+    
+    def _call_function(self, function_name: str, arguments: Dict) -> Dict:
+        """Run a tool against the database"""
         
         if function_name == "search_products":
             from ai_app.serializers import ProductSerializer
@@ -259,18 +575,6 @@ class FloorBotAI:
                 keyword=arguments.get("keyword")
             )
             
-            # Store search context in session for follow-up filtering
-            if session:
-                session.context["last_search_filters"] = {
-                    "product_type": arguments.get("product_type"),
-                    "color": arguments.get("color"),
-                    "material": arguments.get("material"),
-                    "pattern": arguments.get("pattern"),
-                    "max_price": arguments.get("max_price"),
-                    "keyword": arguments.get("keyword")
-                }
-                session.context["last_products"] = [p.id for p in products]
-            
             # Serialize using ModelSerializer
             serializer = ProductSerializer(products, many=True)
             
@@ -310,26 +614,210 @@ class FloorBotAI:
             }
         
         elif function_name == "create_order_summary":
-            items_data = arguments["items"]
-            order_items = []
-            
-            for item_data in items_data:
-                order_item = self.order_calculator.calculate_order_item(
-                    product_id=item_data["product_id"],
-                    quantity=item_data["quantity"]
-                )
-                if order_item:
-                    order_items.append(order_item)
-            
-            if not order_items:
-                return {"error": "No valid items found"}
-            
-            summary = self.order_calculator.create_order_summary(
-                items=order_items,
+            summary = self.order_calculator.quote_order(
+                items=arguments["items"],
                 tax_rate=0.1,
                 delivery_fee=0.0
             )
             
+            if not summary:
+                return {"error": "No valid items found"}
+            
             return summary.to_dict()
         
         return {"error": f"Unknown function: {function_name}"}
+
+
+class AsyncFloorBotAI(FloorBotAI):
+    """
+    asyncio counterpart of FloorBotAI for ASGI views (construct inside a coroutine)
+    
+    LLM calls go through AsyncOpenAI and session access through the async
+    cache API, so a turn only holds a thread while tools query the ORM.
+    """
+    
+    def __init__(self):
+        """Initialize async FloorBot AI"""
+        super().__init__()
+        self.client = get_async_openai_client()
+    
+    async def chat(self, session_id: str, message: str) -> Dict[str, Any]:
+        """
+        Process a chat message
+        
+        Args:
+            session_id: Session ID
+            message: User message
+            
+        Returns:
+            Response dictionary with AI reply and products if found
+        """
+        turn = await self.session_manager.aacquire_turn(session_id)
+        if not turn:
+            return self._session_busy(session_id)
+        
+        try:
+            return await self._achat(session_id, message)
+        finally:
+            await self.session_manager.arelease_turn(session_id, turn)
+    
+    async def _achat(self, session_id: str, message: str) -> Dict[str, Any]:
+        session = await self.session_manager.aget_session(session_id, history_limit=HISTORY_LOAD_LIMIT)
+        
+        if not session:
+            return self._session_not_found(session_id)
+        
+        session.add_message(MessageRole.USER, message)
+        
+        found_products = []
+        
+        try:
+            fast_reply = await sync_to_async(self._fast_path)(session, message)
+            if fast_reply:
+                return await self._afinish_turn(session, *fast_reply)
+            
+            messages = await sync_to_async(self.context_builder.build, thread_sensitive=False)(session)
+            
+            first = await self._afirst_completion(messages)
+            
+            if first["tool_calls"]:
+                found_products = await sync_to_async(self._run_tool_calls)(
+                    messages, first["content"], first["tool_calls"], session
+                )
+                
+                second_response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+                
+                final_content = second_response.choices[0].message.content
+            else:
+                final_content = first["content"]
+            
+            return await self._afinish_turn(session, final_content, found_products)
+        
+        except Exception as e:
+            return self._turn_error(session_id, e)
+    
+    async def chat_stream(self, session_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a chat message, yielding events as the reply is produced
+        
+        Same events (and per-session turn lock) as FloorBotAI.chat_stream.
+        """
+        turn = await self.session_manager.aacquire_turn(session_id)
+        if not turn:
+            yield {"event": "error", "data": self._session_busy(session_id)}
+            return
+        
+        try:
+            async for event in self._achat_stream(session_id, message):
+                yield event
+        finally:
+            await self.session_manager.arelease_turn(session_id, turn)
+    
+    async def _achat_stream(self, session_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        session = await self.session_manager.aget_session(session_id, history_limit=HISTORY_LOAD_LIMIT)
+        
+        if not session:
+            yield {"event": "error", "data": self._session_not_found(session_id)}
+            return
+        
+        session.add_message(MessageRole.USER, message)
+        
+        found_products = []
+        
+        try:
+            fast_reply = await sync_to_async(self._fast_path)(session, message)
+            if fast_reply:
+                response_data = await self._afinish_turn(session, *fast_reply)
+                for event in self._fast_reply_events(*fast_reply, response_data):
+                    yield event
+                return
+            
+            messages = await sync_to_async(self.context_builder.build, thread_sensitive=False)(session)
+            
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=self.tools,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True
+            )
+            
+            content_parts = []
+            tool_calls_by_index = {}
+            
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                
+                if delta.content:
+                    content_parts.append(delta.content)
+                    if not tool_calls_by_index:
+                        yield {"event": "token", "data": {"content": delta.content}}
+                
+                for tool_delta in delta.tool_calls or []:
+                    self._accumulate_tool_call(tool_calls_by_index, tool_delta)
+            
+            first_content = "".join(content_parts)
+            
+            if tool_calls_by_index:
+                tool_calls = [tool_calls_by_index[index] for index in sorted(tool_calls_by_index)]
+                found_products = await sync_to_async(self._run_tool_calls)(
+                    messages, first_content, tool_calls, session
+                )
+                
+                if found_products:
+                    yield {
+                        "event": "products",
+                        "data": {"products": found_products, "product_count": len(found_products)}
+                    }
+                
+                second_stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                )
+                
+                content_parts = []
+                async for chunk in second_stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        content_parts.append(token)
+                        yield {"event": "token", "data": {"content": token}}
+                
+                final_content = "".join(content_parts)
+            else:
+                final_content = first_content
+            
+            response_data = await self._afinish_turn(session, final_content, found_products)
+            response_data.pop("products", None)
+            yield {"event": "done", "data": response_data}
+        
+        except Exception as e:
+            yield {"event": "error", "data": self._turn_error(session_id, e)}
+    
+    async def _afirst_completion(self, messages: List[Dict]) -> Dict[str, Any]:
+        """First completion of a turn (async), shared like FloorBotAI._first_completion"""
+        request = self._first_completion_request(messages)
+        
+        async def call():
+            return self._completion_result(await self.client.chat.completions.create(**request))
+        
+        return await completion_coalescer.arun(completion_key(**request), call)
+    
+    async def _afinish_turn(self, session: ChatSession, final_content: str, found_products: List[Dict]) -> Dict[str, Any]:
+        """Store the assistant reply and build the turn response"""
+        session.add_message(MessageRole.ASSISTANT, final_content)
+        await self.session_manager.aupdate_session(session)
+        
+        return self._turn_response(session, final_content, found_products)
@@ -0,0 +1,107 @@
+"""
+OpenAI Clients - Process-wide pooled clients shared by the AI services
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from ai_app.config import AIConfig
+
+
+_lock = threading.Lock()
+_sync_client: Optional[OpenAI] = None
+# httpx async pools are bound to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=AIConfig.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=AIConfig.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=AIConfig.OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(AIConfig.OPENAI_TIMEOUT, connect=AIConfig.OPENAI_CONNECT_TIMEOUT)
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Get the shared synchronous OpenAI client
+    
+    The client (and its httpx connection pool) is created once per process
+    and is safe to use from multiple threads.
+    """
+    global _sync_client
+    
+    client = _sync_client
+    if client is not None:
+        return client
+    
+    with _lock:
+        if _sync_client is None:
+            _sync_client = OpenAI(
+                api_key=AIConfig.OPENAI_API_KEY,
+                base_url=AIConfig.OPENAI_BASE_URL,
+                max_retries=AIConfig.OPENAI_MAX_RETRIES,
+                timeout=_timeout(),
+                http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+        return _sync_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Get the shared AsyncOpenAI client for the running event loop
+    
+    Must be called from a coroutine. One client is kept per loop because
+    an httpx async pool cannot be used across loops.
+    """
+    loop = asyncio.get_running_loop()
+    
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=AIConfig.OPENAI_API_KEY,
+                base_url=AIConfig.OPENAI_BASE_URL,
+                max_retries=AIConfig.OPENAI_MAX_RETRIES,
+                timeout=_timeout(),
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+def reset_clients(close: bool = True):
+    """
+    Forget all pooled clients so the next call builds fresh ones
+    
+    Args:
+        close: Close the sync client's connections first. Must be False in a
+            forked child, whose inherited sockets still belong to the parent.
+    """
+    global _sync_client, _async_clients
+    
+    if close and _sync_client is not None:
+        _sync_client.close()
+    
+    _sync_client = None
+    _async_clients = weakref.WeakKeyDictionary()
+
+
+def _reset_after_fork():
+    global _lock
+    # The lock may have been held by another thread at fork time
+    _lock = threading.Lock()
+    reset_clients(close=False)
+
+
+# Celery prefork workers (and any other forked child) must not reuse the
+# parent's connection pool
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,252 @@
+"""
+Completion Cache - Single-flight coalescing and short-lived caching of identical LLM calls
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from django.core.cache import cache
+from ai_app import metrics
+from ai_app.config import AIConfig
+
+
+POLL_INTERVAL = 0.05
+
+COUNTERS = ("completion.upstream", "completion.cache_hit", "completion.coalesced")
+
+
+def completion_key(**request: Any) -> str:
+    """Stable hash of a completion request (model, messages, tools, sampling settings)"""
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One in-process upstream call that other callers can wait for"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class CompletionCoalescer:
+    """
+    Shares one upstream completion between identical concurrent requests
+    
+    Within a process, callers with the same key wait for the first caller
+    (the leader) instead of calling OpenAI themselves. Across processes the
+    leader holds a cache lock and publishes its result in the cache for
+    COMPLETION_CACHE_TTL seconds, which also serves exact repeats. If the
+    leader fails or takes longer than COMPLETION_COALESCE_WAIT, waiting
+    callers make their own call.
+    
+    Results must be plain, cacheable data (not SDK response objects). Other
+    upstream calls (e.g. transcriptions) use their own instance with a
+    separate cache prefix and metric name.
+    
+    With `max_entries`, each cached result also takes a slot in a ring of
+    that many slots; when the ring wraps, the result in the reused slot is
+    deleted, so at most `max_entries` results are cached even within the TTL.
+    """
+    
+    def __init__(self, ttl: Optional[int] = None, wait: Optional[float] = None,
+                 prefix: str = "ai_completion:", metric: str = "completion",
+                 max_entries: Optional[int] = None):
+        """Initialize coalescer"""
+        self.cache_prefix = prefix
+        self.metric = metric
+        self.ttl = AIConfig.COMPLETION_CACHE_TTL if ttl is None else ttl
+        self.wait = AIConfig.COMPLETION_COALESCE_WAIT if wait is None else wait
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[tuple, asyncio.Future] = {}
+    
+    def run(self, key: str, call: Callable[[], Dict]) -> Dict:
+        """
+        Return the result for `key`, calling `call` only if no identical call is cached or running
+        
+        Args:
+            key: completion_key() of the request
+            call: Makes the upstream request and returns a plain dict
+        """
+        if self.ttl <= 0:
+            return call()
+        
+        cached = cache.get(self._result_key(key))
+        if cached is not None:
+            self._count("cache_hit")
+            return cached
+        
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            flight.event.wait(self.wait)
+            if flight.result is not None:
+                self._count("coalesced")
+                return flight.result
+            return self._call(call)
+        
+        try:
+            flight.result = self._lead(key, call)
+            return flight.result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+    
+    async def arun(self, key: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Async version of run(); in-process waiting is per event loop"""
+        if self.ttl <= 0:
+            return await call()
+        
+        cached = await cache.aget(self._result_key(key))
+        if cached is not None:
+            await self._acount("cache_hit")
+            return cached
+        
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._async_flights.get(flight_key)
+        if flight is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight), self.wait)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                return await self._acall(call)
+            except Exception:
+                # Leader failed or is too slow
+                return await self._acall(call)
+            await self._acount("coalesced")
+            return result
+        
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[flight_key] = flight
+        try:
+            result = await self._alead(key, call)
+            flight.set_result(result)
+            return result
+        except Exception as error:
+            flight.set_exception(error)
+            # Mark the exception retrieved; waiters fall back to their own call
+            flight.exception()
+            raise
+        finally:
+            if not flight.done():
+                flight.cancel()
+            self._async_flights.pop(flight_key, None)
+    
+    def _lead(self, key: str, call: Callable[[], Dict]) -> Dict:
+        """Call upstream under the cross-process lock, or wait for the process holding it"""
+        lock_key = self._lock_key(key)
+        if not cache.add(lock_key, 1, timeout=max(1, int(self.wait))):
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                cached = cache.get(self._result_key(key))
+                if cached is not None:
+                    self._count("coalesced")
+                    return cached
+            return self._call(call)
+        
+        try:
+            result = self._call(call)
+            cache.set(self._result_key(key), result, timeout=self.ttl)
+            if self.max_entries:
+                self._take_slot(key)
+            return result
+        finally:
+            cache.delete(lock_key)
+    
+    async def _alead(self, key: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        lock_key = self._lock_key(key)
+        if not await cache.aadd(lock_key, 1, timeout=max(1, int(self.wait))):
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                cached = await cache.aget(self._result_key(key))
+                if cached is not None:
+                    await self._acount("coalesced")
+                    return cached
+            return await self._acall(call)
+        
+        try:
+            result = await self._acall(call)
+            await cache.aset(self._result_key(key), result, timeout=self.ttl)
+            if self.max_entries:
+                await self._atake_slot(key)
+            return result
+        finally:
+            await cache.adelete(lock_key)
+    
+    def _take_slot(self, key: str):
+        """Record `key` in the next ring slot, evicting the result that held it"""
+        counter_key = f"{self.cache_prefix}slots"
+        try:
+            position = cache.incr(counter_key)
+        except ValueError:
+            cache.add(counter_key, 0, timeout=None)
+            position = cache.incr(counter_key)
+        
+        slot_key = f"{self.cache_prefix}slot:{position % self.max_entries}"
+        evicted = cache.get(slot_key)
+        if evicted is not None and evicted != key:
+            cache.delete(self._result_key(evicted))
+        cache.set(slot_key, key, timeout=self.ttl)
+    
+    async def _atake_slot(self, key: str):
+        counter_key = f"{self.cache_prefix}slots"
+        try:
+            position = await cache.aincr(counter_key)
+        except ValueError:
+            await cache.aadd(counter_key, 0, timeout=None)
+            position = await cache.aincr(counter_key)
+        
+        slot_key = f"{self.cache_prefix}slot:{position % self.max_entries}"
+        evicted = await cache.aget(slot_key)
+        if evicted is not None and evicted != key:
+            await cache.adelete(self._result_key(evicted))
+        await cache.aset(slot_key, key, timeout=self.ttl)
+    
+    def _call(self, call: Callable[[], Dict]) -> Dict:
+        self._count("upstream")
+        return call()
+    
+    async def _acall(self, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        await self._acount("upstream")
+        return await call()
+    
+    def _count(self, event: str):
+        metrics.incr(f"{self.metric}.{event}")
+    
+    async def _acount(self, event: str):
+        await metrics.aincr(f"{self.metric}.{event}")
+    
+    def _result_key(self, key: str) -> str:
+        return f"{self.cache_prefix}{key}"
+    
+    def _lock_key(self, key: str) -> str:
+        return f"{self.cache_prefix}{key}:lock"
+
+
+def completion_stats() -> Dict[str, Any]:
+    """Upstream calls versus calls served by coalescing or the cache"""
+    counts = metrics.get_counts(COUNTERS)
+    saved = counts["completion.cache_hit"] + counts["completion.coalesced"]
+    total = saved + counts["completion.upstream"]
+    
+    return {
+        "upstream": counts["completion.upstream"],
+        "cache_hits": counts["completion.cache_hit"],
+        "coalesced": counts["completion.coalesced"],
+        "saved_rate": round(saved / total, 4) if total else 0.0
+    }
+
+
+completion_coalescer = CompletionCoalescer()
@@ -11,11 +11,81 @@ class AIConfig:
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
     OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "1000"))
+    # Alternative OpenAI-compatible endpoint, e.g. ai_app.fake_openai for load tests
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+    
+    # Shared HTTP connection pool (see ai_app/clients.py)
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
     
     WHISPER_MODEL = os.getenv("WHISPER_MODEL", "whisper-1")
+    # Largest raw audio body accepted by the voice endpoints (Whisper's own limit)
+    VOICE_MAX_UPLOAD_BYTES = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+    # PCM WAV clips are downmixed, resampled and silence-trimmed before upload
+    AUDIO_PREPROCESS_ENABLED = os.getenv("AUDIO_PREPROCESS_ENABLED", "true").lower() == "true"
+    AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+    AUDIO_SILENCE_THRESHOLD_DB = float(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", "-45"))
+    AUDIO_SILENCE_FRAME_MS = int(os.getenv("AUDIO_SILENCE_FRAME_MS", "20"))
+    AUDIO_SILENCE_PADDING_MS = int(os.getenv("AUDIO_SILENCE_PADDING_MS", "200"))
+    AUDIO_MAX_DURATION_SECONDS = float(os.getenv("AUDIO_MAX_DURATION_SECONDS", "120"))
+    # Transcripts are cached by audio hash, language and model (0 disables);
+    # a resent clip still being transcribed waits for the first request.
+    # Any clip up to VOICE_MAX_UPLOAD_BYTES is cached; entries expire after
+    # the TTL and beyond MAX_ENTRIES the oldest are evicted
+    TRANSCRIPTION_CACHE_TTL = int(os.getenv("TRANSCRIPTION_CACHE_TTL", "900"))
+    TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "5000"))
+    TRANSCRIPTION_COALESCE_WAIT = float(os.getenv("TRANSCRIPTION_COALESCE_WAIT", "30"))
     
     SESSION_TIMEOUT_MINUTES = int(os.getenv("SESSION_TIMEOUT_MINUTES", "30"))
     MAX_CONVERSATION_HISTORY = int(os.getenv("MAX_CONVERSATION_HISTORY", "20"))
+    # Prompt tokens for history + summary; older turns are summarized beyond this
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+    SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "250"))
+    # "cache" (one JSON blob per session) or "redis_list" (append-only, needs RedisCache)
+    SESSION_STORE = os.getenv("SESSION_STORE", "cache")
+    # "json" or "msgpack"; stores read both, so the codec can be switched live
+    SESSION_CODEC = os.getenv("SESSION_CODEC", "json")
+    # In-process LRU of hot sessions in front of the shared cache, validated
+    # against a per-session version counter on every read (0 disables)
+    SESSION_LOCAL_CACHE_SIZE = int(os.getenv("SESSION_LOCAL_CACHE_SIZE", "1000"))
+    SESSION_LOCAL_CACHE_BYTES = int(os.getenv("SESSION_LOCAL_CACHE_BYTES", str(32 * 1024 * 1024)))
+    SESSION_LOCAL_CACHE_TTL = int(os.getenv("SESSION_LOCAL_CACHE_TTL", "300"))
+    # A session runs one chat turn at a time; a duplicate submission waits this
+    # long for the running turn, then is rejected
+    SESSION_TURN_WAIT = float(os.getenv("SESSION_TURN_WAIT", "5"))
+    # Expiry of the turn lock, in case the process holding it dies
+    SESSION_TURN_LOCK_TIMEOUT = int(os.getenv("SESSION_TURN_LOCK_TIMEOUT", "120"))
+    
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "30"))
+    TOOL_CACHE_TIMEOUT = int(os.getenv("TOOL_CACHE_TIMEOUT", "600"))
+    # Tool calls from one assistant message run concurrently on a shared pool,
+    # each limited to TOOL_CALL_TIMEOUT seconds (0 disables the limit)
+    TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+    TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "10"))
+    # Measure the compact tool payload on 1 in N product searches (0 disables)
+    TOOL_PAYLOAD_STATS_SAMPLE = int(os.getenv("TOOL_PAYLOAD_STATS_SAMPLE", "20"))
+    # Answer simple turns ("room is 4 by 5", "show grey carpets") without the LLM
+    INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+    # Identical first completions are shared in flight and cached this long (0 disables)
+    COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", "30"))
+    COMPLETION_COALESCE_WAIT = float(os.getenv("COMPLETION_COALESCE_WAIT", "20"))
+    # Chat/voice requests running at once per worker process, and per client
+    # (user, or IP when anonymous); extra requests queue up to the timeout
+    ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+    ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "4"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+    # Behind a reverse proxy, anonymous clients are told apart by this header
+    # (e.g. X-Forwarded-For): the entry the outermost of the trusted proxies
+    # appended. Empty uses the peer address, which is the proxy's own.
+    ADMISSION_FORWARDED_HEADER = os.getenv("ADMISSION_FORWARDED_HEADER", "")
+    ADMISSION_TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "1"))
     
     SYSTEM_PROMPT = """You are DMS AI Assistant, a helpful and knowledgeable flooring specialist for a construction materials company.
 
@@ -0,0 +1,161 @@
+"""
+Consumers - The AI assistant over a WebSocket
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.serializers.json import DjangoJSONEncoder
+from ai_app.admission import admission_controller, client_key
+from ai_app.chatbot import AsyncFloorBotAI
+from ai_app.config import AIConfig
+from ai_app.session_manager import SESSION_BUSY
+from ai_app.speech_service import AsyncSpeechService
+
+
+AUDIO_FORMATS = ("wav", "mp3", "webm", "m4a", "ogg")
+
+
+class AIChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Chat with the assistant over one connection: ws/ai/chat/?token=<jwt>
+    
+    The optional query parameters are session_id (resume a session),
+    audio_format and language. CustomAuthMiddleware resolves the token,
+    and anonymous clients are allowed as on the REST chat views.
+    
+    Client frames:
+        text   {"type": "message", "message": "..."}
+        text   {"type": "audio_config", "audio_format": "webm", "language": "en"}
+        binary one complete audio clip in the configured format
+    
+    Server frames are JSON {"event": ..., "data": ...}. The first one is
+    "session"; voice turns then send "transcript". Every turn then sends
+    the chat_stream events ("token", "products", then "done" or "error").
+    One turn runs at a time per socket; each turn takes an admission slot.
+    """
+    
+    async def connect(self):
+        self.turn: Optional[asyncio.Task] = None
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        user = self.scope.get("user")
+        address = (self.scope.get("client") or [""])[0]
+        
+        self.client = client_key(user, address, self._header(AIConfig.ADMISSION_FORWARDED_HEADER))
+        self.chatbot = AsyncFloorBotAI()
+        self.audio_format = self._param(params, "audio_format", "wav")
+        if self.audio_format not in AUDIO_FORMATS:
+            self.audio_format = "wav"
+        self.language = self._param(params, "language", "en")
+        
+        session_id = self._param(params, "session_id", None)
+        session = await self.chatbot.session_manager.aget_session(session_id) if session_id else None
+        if session is None:
+            user_id = str(user.pk) if user is not None and user.is_authenticated else None
+            session = await self.chatbot.session_manager.acreate_session(user_id)
+        self.session_id = session.session_id
+        
+        await self.accept()
+        await self.send_json({"event": "session", "data": {"session_id": self.session_id}})
+    
+    async def disconnect(self, close_code):
+        if self.turn and not self.turn.done():
+            self.turn.cancel()
+    
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if bytes_data is not None:
+            await self._start_turn(self._voice_turn(bytes_data, self.audio_format, self.language))
+            return
+        
+        try:
+            content = await self.decode_json(text_data)
+        except ValueError:
+            await self._send_error("Malformed JSON frame")
+            return
+        await self.receive_json(content)
+    
+    async def receive_json(self, content, **kwargs):
+        kind = content.get("type", "message") if isinstance(content, dict) else None
+        
+        if kind == "message":
+            message = str(content.get("message") or "").strip()
+            if not message:
+                await self._send_error("message is required")
+                return
+            await self._start_turn(self._text_turn(message))
+        
+        elif kind == "audio_config":
+            audio_format = content.get("audio_format", self.audio_format)
+            if audio_format not in AUDIO_FORMATS:
+                await self._send_error(f"audio_format must be one of {', '.join(AUDIO_FORMATS)}")
+                return
+            self.audio_format = audio_format
+            self.language = str(content.get("language") or self.language)[:10]
+        
+        else:
+            await self._send_error("Unknown frame type")
+    
+    @classmethod
+    async def encode_json(cls, content):
+        return json.dumps(content, cls=DjangoJSONEncoder)
+    
+    async def _start_turn(self, turn):
+        """Run a turn in the background so frames (and disconnects) keep being received"""
+        if self.turn and not self.turn.done():
+            turn.close()
+            await self._send_error("Your previous message is still being answered.", error=SESSION_BUSY)
+            return
+        self.turn = asyncio.create_task(self._admitted(turn))
+    
+    async def _admitted(self, turn):
+        try:
+            rejection = await admission_controller.aadmit(self.client)
+        except asyncio.CancelledError:
+            turn.close()
+            raise
+        if rejection:
+            turn.close()
+            await self._send_error(rejection.reason, retry_after=rejection.retry_after)
+            return
+        
+        try:
+            await turn
+        finally:
+            admission_controller.release(self.client)
+    
+    async def _text_turn(self, message: str):
+        async for event in self.chatbot.chat_stream(self.session_id, message):
+            await self.send_json(event)
+    
+    async def _voice_turn(self, audio: bytes, audio_format: str, language: str):
+        if len(audio) > AIConfig.VOICE_MAX_UPLOAD_BYTES:
+            await self._send_error(f"Audio exceeds {AIConfig.VOICE_MAX_UPLOAD_BYTES} bytes")
+            return
+        
+        try:
+            transcribed_text = await AsyncSpeechService().transcribe_audio(audio, audio_format, language)
+        except Exception as e:
+            await self._send_error(f"Failed to process voice message: {str(e)}", error=str(e))
+            return
+        
+        await self.send_json({"event": "transcript", "data": {"transcribed_text": transcribed_text}})
+        await self._text_turn(transcribed_text)
+    
+    async def _send_error(self, response: str, **extra: Any):
+        data: Dict[str, Any] = {"session_id": self.session_id, "response": response, "success": False}
+        data.update(extra)
+        await self.send_json({"event": "error", "data": data})
+    
+    def _header(self, name: str) -> Optional[str]:
+        """Value of a request header of the handshake (None if unset or absent)"""
+        if not name:
+            return None
+        wanted = name.lower().encode("latin-1")
+        values = [value.decode("latin-1") for key, value in self.scope.get("headers", []) if key.lower() == wanted]
+        return ", ".join(values) if values else None
+    
+    @staticmethod
+    def _param(params: Dict, name: str, default: Optional[str]) -> Optional[str]:
+        values = params.get(name)
+        return values[0] if values else default
@@ -0,0 +1,144 @@
+"""
+Context Builder - Token-budgeted prompt assembly with rolling summarization
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from ai_app.config import AIConfig
+from ai_app.schemas import ChatSession, ConversationMessage, MessageRole
+
+
+# Chat-format overhead per message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# After the window overflows, fold old turns until it is back under this
+# share of the budget, so summarization runs every few turns, not every turn
+LOW_WATERMARK = 0.6
+
+# Messages a session load must include: the largest window plus what one
+# turn adds before the next fold, so folded messages were always loaded
+HISTORY_LOAD_LIMIT = AIConfig.MAX_CONVERSATION_HISTORY + 4
+
+SUMMARY_CONTEXT_KEY = "history_summary"
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough local token count (~4 characters per token for English)"""
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+    return MESSAGE_OVERHEAD_TOKENS + (len(text) + 3) // 4
+
+
+def to_millisecond(value: datetime) -> datetime:
+    """Timestamp as the msgpack session codec stores it (floored to the millisecond)"""
+    return value.replace(microsecond=value.microsecond - value.microsecond % 1000)
+
+
+def fallback_summary(previous: str, messages: List[ConversationMessage], max_chars: int = 1200) -> str:
+    """Extractive summary used when no LLM summarizer is available"""
+    lines = [previous] if previous else []
+    for message in messages:
+        lines.append(f"{message.role.value}: {' '.join((message.content or '').split())[:200]}")
+    return "\n".join(lines)[-max_chars:]
+
+
+class ContextBuilder:
+    """
+    Builds the OpenAI message list for a turn within a token budget
+
+    The system prompt is always first. Recent messages are kept newest-first
+    while they fit `token_budget` and `max_messages`; older ones are folded
+    into a summary cached in `session.context["history_summary"]` together
+    with the fold point: the millisecond of the newest message it covers
+    ("until") and how many covered messages share that millisecond
+    ("until_count"). Millisecond precision survives every session codec,
+    and the count keeps a later message from that millisecond in the prompt.
+    """
+
+    def __init__(self, summarizer: Optional[Callable[[str, List[ConversationMessage]], str]] = None,
+                 token_budget: Optional[int] = None, max_messages: Optional[int] = None):
+        """
+        Args:
+            summarizer: fn(previous_summary, messages) -> new summary text
+            token_budget: Tokens allowed for history and summary (system prompt excluded)
+            max_messages: Cap on verbatim history messages
+        """
+        self.summarizer = summarizer or fallback_summary
+        self.token_budget = token_budget or AIConfig.HISTORY_TOKEN_BUDGET
+        self.max_messages = max_messages or AIConfig.MAX_CONVERSATION_HISTORY
+
+    def build(self, session: ChatSession) -> List[Dict]:
+        """Return messages for the completion request, updating the cached summary if needed"""
+        system_message = None
+        history = []
+        for message in session.messages:
+            if system_message is None and message.role == MessageRole.SYSTEM:
+                system_message = message
+            else:
+                history.append(message)
+
+        summary = session.context.get(SUMMARY_CONTEXT_KEY) or {}
+        start = self._fold_point(history, summary) if summary.get("until") else 0
+        summary_text = summary.get("text", "")
+
+        if self._over_budget(summary_text, history[start:], 1.0):
+            history, summary_text = self._fold(session, summary_text, history, start)
+        else:
+            history = history[start:]
+
+        messages = [{
+            "role": MessageRole.SYSTEM.value,
+            "content": system_message.content if system_message else AIConfig.SYSTEM_PROMPT
+        }]
+        if summary_text:
+            messages.append({
+                "role": MessageRole.SYSTEM.value,
+                "content": f"Summary of the earlier conversation:\n{summary_text}"
+            })
+        messages.extend({"role": m.role.value, "content": m.content} for m in history)
+
+        return messages
+
+    def _fold_point(self, history: List[ConversationMessage], summary: Dict) -> int:
+        """Index of the first history message the summary does not cover"""
+        until = to_millisecond(datetime.fromisoformat(summary["until"]))
+        covered = summary.get("until_count", 0)
+
+        for index, message in enumerate(history):
+            at = to_millisecond(message.timestamp)
+            if at > until or (at == until and not covered):
+                return index
+            if at == until:
+                covered -= 1
+        return len(history)
+
+    def _fold(self, session: ChatSession, summary_text: str, history: List[ConversationMessage], start: int):
+        """Move the oldest messages after `start` into the summary until under the low watermark"""
+        end = start
+        # Always keep the current user message verbatim
+        while end < len(history) - 1 and self._over_budget(summary_text, history[end:], LOW_WATERMARK):
+            end += 1
+
+        folded, kept = history[start:end], history[end:]
+        if not folded:
+            return kept, summary_text
+
+        try:
+            summary_text = self.summarizer(summary_text, folded)
+        except Exception:
+            summary_text = fallback_summary(summary_text, folded)
+
+        until = to_millisecond(folded[-1].timestamp)
+        session.context[SUMMARY_CONTEXT_KEY] = {
+            "text": summary_text,
+            "until": until.isoformat(),
+            "until_count": sum(1 for m in history[:end] if to_millisecond(m.timestamp) == until)
+        }
+        return kept, summary_text
+
+    def _over_budget(self, summary_text: str, history: List[ConversationMessage], fraction: float) -> bool:
+        if len(history) > self.max_messages * fraction:
+            return True
+        tokens = (estimate_tokens(summary_text) if summary_text else 0) + sum(
+            estimate_tokens(m.content) for m in history
+        )
+        return tokens > self.token_budget * fraction
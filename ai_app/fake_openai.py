@@ -0,0 +1,220 @@
+"""
+Fake OpenAI - Local OpenAI-compatible server for load tests and offline runs
+
+Serves the endpoints FloorBotAI uses: chat completions (plain and
+streamed, with tool calls) and audio transcriptions. Replies come from a
+script and are delayed by a configurable latency, so the chatbot can be
+benchmarked without network access or API spend. Point the app at it with
+OPENAI_BASE_URL=<server.url>.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+
+DEFAULT_REPLY = (
+    "Here are some options that match what you are looking for. Each one is in stock "
+    "and I can work out how many packs you need once you tell me the room size."
+)
+
+# A script maps a chat completion request to {"content": str, "tool_calls": [(name, arguments)]}
+Script = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def default_script(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Search once, then answer
+    
+    When tools are offered and the conversation has no tool result since the
+    last user message, call search_products with the user's words as the
+    keyword; otherwise reply with DEFAULT_REPLY.
+    """
+    messages = request.get("messages", [])
+    last_user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+    answered = messages and messages[-1].get("role") == "tool"
+    
+    if request.get("tools") and not answered:
+        keyword = str(last_user.get("content") or "")[:100]
+        return {"content": "", "tool_calls": [("search_products", {"keyword": keyword})]}
+    
+    return {"content": DEFAULT_REPLY, "tool_calls": []}
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server speaking enough of the OpenAI API for FloorBotAI
+    
+    Args:
+        latency: Seconds before the first byte of every response
+        token_delay: Seconds between streamed content chunks
+        script: Chooses the reply for each chat completion request
+        transcript: Text returned by audio transcriptions
+        host, port: Bind address (port 0 picks a free port)
+    
+    Use as a context manager, or call start() and stop().
+    """
+    
+    def __init__(self, latency: float = 0.0, token_delay: float = 0.0, script: Optional[Script] = None,
+                 transcript: str = "Show me grey carpets", host: str = "127.0.0.1", port: int = 0):
+        """Initialize server (not yet listening)"""
+        self.latency = latency
+        self.token_delay = token_delay
+        self.script = script or default_script
+        self.transcript = transcript
+        self.requests: Dict[str, int] = {}
+        
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL for the OpenAI client (ends in /v1)"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+    
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def count(self, endpoint: str):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+
+def _handler_for(server: FakeOpenAIServer):
+    class Handler(_FakeOpenAIHandler):
+        fake = server
+    return Handler
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeOpenAIServer
+    
+    def do_POST(self):
+        body = self._read_body()
+        time.sleep(self.fake.latency)
+        
+        if self.path.endswith("/chat/completions"):
+            self.fake.count("chat.completions")
+            request = json.loads(body or b"{}")
+            reply = self.fake.script(request)
+            if request.get("stream"):
+                self._stream_completion(request, reply)
+            else:
+                self._send_json(_completion(request, reply))
+        elif self.path.endswith("/audio/transcriptions"):
+            self.fake.count("audio.transcriptions")
+            self._send_json({"text": self.fake.transcript})
+        else:
+            self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, status=404)
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        
+        parts = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if not size:
+                self.rfile.readline()
+                return b"".join(parts)
+            parts.append(self.rfile.read(size))
+            self.rfile.readline()
+    
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _stream_completion(self, request: Dict, reply: Dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        for index, delta in enumerate(_deltas(reply)):
+            if index and self.fake.token_delay:
+                time.sleep(self.fake.token_delay)
+            self._write_chunk(f"data: {json.dumps(_chunk(request, delta))}\n\n")
+        
+        finish = "tool_calls" if reply.get("tool_calls") else "stop"
+        self._write_chunk(f"data: {json.dumps(_chunk(request, {}, finish))}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _tool_calls(reply: Dict) -> List[Dict]:
+    return [
+        {
+            "id": f"call_{index}_{uuid.uuid4().hex[:8]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}
+        }
+        for index, (name, arguments) in enumerate(reply.get("tool_calls") or [])
+    ]
+
+
+def _completion(request: Dict, reply: Dict) -> Dict:
+    tool_calls = _tool_calls(reply)
+    message = {"role": "assistant", "content": reply.get("content") or None}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+def _deltas(reply: Dict):
+    """Streamed deltas: the content word by word, then one delta per tool call"""
+    words = (reply.get("content") or "").split(" ")
+    for index, word in enumerate(word for word in words if word):
+        yield {"role": "assistant", "content": word if index == 0 else f" {word}"}
+    
+    for index, call in enumerate(_tool_calls(reply)):
+        yield {"tool_calls": [{"index": index, **call}]}
+
+
+def _chunk(request: Dict, delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
@@ -0,0 +1,200 @@
+"""
+Intent Router - Pattern-based fast path that answers common turns without the LLM
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from dashboard.models import Product
+from ai_app import metrics
+from ai_app.product_service import DjangoProductService
+from ai_app.schemas import ChatSession
+
+
+NUMBER = r"(\d+(?:\.\d+)?)"
+METRES = r"\s*(?:m|meters?|metres?)?"
+SQUARE_METRES = r"\s*(?:m2|m²|sqm|sq\.? ?m|square (?:meters?|metres?))"
+
+# "room is 4 by 5", "4m x 5m", "the kitchen is 3.5 x 4 metres"
+AREA_PATTERN = re.compile(
+    rf"^(?:(?:my|the|our)\s+)?(?:room|space|area|floor|kitchen|bedroom|hallway|lounge|living room|it)?"
+    rf"\s*(?:is|measures|=)?\s*{NUMBER}{METRES}\s*(?:by|x|×|\*)\s*{NUMBER}{METRES}[.!]?$"
+)
+
+# "show grey carpets", "find me laminate", "show me some oak wood flooring"
+SEARCH_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:show|find|search(?: for)?|list|browse)(?:\s+me)?\s+(?:some\s+|the\s+|your\s+)?"
+    r"(?:([a-z]+)\s+)?([a-z]+)(?:\s+(?:flooring|floors?))?(?:\s+please)?[.!]?$"
+)
+
+# "how many boxes of C-1 for 20m2", "how much oak laminate do i need for 12.5 sqm?"
+QUANTITY_PATTERN = re.compile(
+    rf"^how (?:many|much)\s+(?:boxes|packs|units|rolls)?\s*(?:of\s+)?(.+?)\s+(?:do i need\s+|would i need\s+)?"
+    rf"for\s+{NUMBER}{SQUARE_METRES}\s*\??$"
+)
+
+KNOWN_COLORS = {
+    "grey", "gray", "beige", "brown", "white", "black", "red", "blue", "green",
+    "oak", "walnut", "yellow", "orange", "purple", "cream", "charcoal", "natural",
+}
+
+PRODUCT_TYPE_LABELS = {
+    "carpets": "carpet",
+    "vinyl": "vinyl flooring",
+    "laminate": "laminate",
+    "wood flooring": "wood flooring",
+}
+
+INTENTS = ("calculate_area", "search_products", "calculate_quantity")
+
+COUNTERS = tuple(f"intent_router.hit.{name}" for name in INTENTS) + ("intent_router.miss",)
+
+
+@dataclass
+class RoutedIntent:
+    """A tool call recognised without the LLM"""
+    function_name: str
+    arguments: Dict[str, Any]
+
+
+def router_stats() -> Dict[str, Any]:
+    """Fast-path hit rate across all processes sharing the cache"""
+    counts = metrics.get_counts(COUNTERS)
+    
+    hits = {name: counts[f"intent_router.hit.{name}"] for name in INTENTS}
+    total_hits = sum(hits.values())
+    total = total_hits + counts["intent_router.miss"]
+    
+    return {
+        "hits": hits,
+        "misses": counts["intent_router.miss"],
+        "hit_rate": round(total_hits / total, 4) if total else 0.0
+    }
+
+
+class IntentRouter:
+    """
+    Recognises a few unambiguous request shapes and maps them to tool calls
+    
+    Only whole-message matches are routed; anything else (extra words,
+    unknown colours or product types, product references that do not
+    resolve to exactly one product) returns None and goes to the model.
+    """
+    
+    def __init__(self, product_service: DjangoProductService):
+        """Initialize router"""
+        self.product_service = product_service
+    
+    def route(self, message: str, session: Optional[ChatSession] = None) -> Optional[RoutedIntent]:
+        """
+        Match a user message against the fast-path patterns
+        
+        Args:
+            message: User message
+            session: Current session (used to resolve product references)
+        
+        Returns:
+            RoutedIntent, or None if the message needs the LLM
+        """
+        text = " ".join(message.lower().split())
+        
+        match = AREA_PATTERN.match(text)
+        if match:
+            return RoutedIntent("calculate_area", {
+                "width": float(match.group(1)),
+                "length": float(match.group(2))
+            })
+        
+        match = SEARCH_PATTERN.match(text)
+        if match:
+            return self._route_search(match.group(1), match.group(2))
+        
+        match = QUANTITY_PATTERN.match(text)
+        if match:
+            return self._route_quantity(match.group(1), float(match.group(2)), session)
+        
+        return None
+    
+    def render(self, intent: RoutedIntent, result: Dict) -> Optional[str]:
+        """
+        Reply text for a tool result, or None if the model should answer instead
+        
+        Errors and empty searches are left to the model, which can explain
+        and suggest alternatives.
+        """
+        if "error" in result:
+            return None
+        
+        if intent.function_name == "calculate_area":
+            return (
+                f"That's {result['width']:g} m × {result['length']:g} m = {result['area']:g} square meters. "
+                f"Would you like me to find flooring for this room or work out how much you'd need?"
+            )
+        
+        if intent.function_name == "search_products":
+            if not result.get("count"):
+                return None
+            color = intent.arguments.get("color")
+            label = PRODUCT_TYPE_LABELS[intent.arguments["product_type"]]
+            description = f"{color} {label}" if color else label
+            return (
+                f"Here are our {description} options! Browse through and let me know if you'd like "
+                f"to filter by color, material, or price range."
+            )
+        
+        if intent.function_name == "calculate_quantity":
+            unit = "boxes" if result["unit"] == "box" else "m²"
+            return (
+                f"For {result['area']:g} m² of {result['product_name']} you'll need {result['quantity']:g} {unit}"
+                f" ({result['coverage_per_unit']:g} m² per {result['unit']}). "
+                f"Would you like me to prepare an order summary?"
+            )
+        
+        return None
+    
+    def record(self, intent_name: Optional[str]):
+        """Count a routed turn (`intent_name`) or a model turn (None)"""
+        if intent_name:
+            metrics.incr(f"intent_router.hit.{intent_name}")
+        else:
+            metrics.incr("intent_router.miss")
+    
+    def _route_search(self, color: Optional[str], product_word: str) -> Optional[RoutedIntent]:
+        if product_word in ("flooring", "floor", "floors"):
+            # "wood flooring": the first word was the product type, not a colour
+            color, product_word = None, color or ""
+        
+        product_type = self.product_service._normalize_product_type(product_word)
+        if product_type not in PRODUCT_TYPE_LABELS:
+            return None
+        
+        arguments = {"product_type": product_type}
+        if color:
+            if color not in KNOWN_COLORS:
+                return None
+            arguments["color"] = color
+        
+        return RoutedIntent("search_products", arguments)
+    
+    def _route_quantity(self, reference: str, area: float,
+                        session: Optional[ChatSession]) -> Optional[RoutedIntent]:
+        product_id = self._resolve_product(reference, session)
+        if not product_id:
+            return None
+        
+        return RoutedIntent("calculate_quantity", {"product_id": product_id, "area": area})
+    
+    def _resolve_product(self, reference: str, session: Optional[ChatSession]) -> Optional[str]:
+        """Map a product ID, or a title fragment of a product just shown, to one product ID"""
+        matches: List[str] = list(
+            Product.objects.filter(product_id__iexact=reference).values_list("product_id", flat=True)[:2]
+        )
+        
+        if not matches and session:
+            shown = session.context.get("last_products") or []
+            if shown:
+                matches = list(
+                    Product.objects.filter(pk__in=shown, product_title__icontains=reference)
+                    .values_list("product_id", flat=True)[:2]
+                )
+        
+        return matches[0] if len(matches) == 1 else None
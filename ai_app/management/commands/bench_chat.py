@@ -0,0 +1,243 @@
+"""
+Load-test chat turns against a local fake OpenAI server and report latency percentiles
+"""
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from ai_app import admission, clients, completion_cache, intent_router, metrics, tool_payload
+from ai_app.chatbot import FloorBotAI
+from ai_app.completion_cache import completion_coalescer
+from ai_app.config import AIConfig
+from ai_app.fake_openai import FakeOpenAIServer
+from ai_app.search_index import product_search_index
+from ai_app.session_manager import SessionManager
+from ai_app.tool_cache import bump_catalog_version
+from ai_app.views import TextChatView
+from dashboard.models import Category, Product
+
+
+BENCH_PREFIX = "BENCH-"
+
+CATALOG = (
+    ("Carpets", ("Grey", "Beige", "Charcoal"), "Wool"),
+    ("Vinyl", ("Oak", "White", "Grey"), "PVC"),
+    ("Laminate", ("Walnut", "Oak", "Brown"), "HDF"),
+    ("Wood Flooring", ("Natural", "Oak", "Dark"), "Engineered oak"),
+)
+
+# Counters a chat turn can increment; restored after the run
+BENCH_COUNTERS = admission.COUNTERS + completion_cache.COUNTERS + intent_router.COUNTERS + tool_payload.COUNTERS
+
+MESSAGES = (
+    "Do you have {color} {category} that would suit a living room?",
+    "What {category} do you have in {color} under 40 pounds?",
+    "I'm after hard wearing {category}, ideally {color}.",
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark TextChatView and FloorBotAI.chat at a given concurrency (p50/p95/p99 and throughput)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=["view", "chatbot", "both"], default="both")
+        parser.add_argument("--concurrency", type=int, default=8, help="Simulated customers chatting at once")
+        parser.add_argument("--turns", type=int, default=5, help="Chat turns per customer")
+        parser.add_argument("--latency", type=float, default=0.3, help="Fake OpenAI seconds to first byte")
+        parser.add_argument("--token-delay", type=float, default=0.01, help="Fake OpenAI seconds between streamed tokens")
+        parser.add_argument("--base-url", help="Use this OpenAI-compatible server instead of starting the fake one")
+        parser.add_argument("--seed", type=int, default=200, help="Synthetic products added for the run")
+        parser.add_argument("--keep-catalog", action="store_true", help="Leave the synthetic products in place")
+        parser.add_argument("--router", action="store_true", help="Keep the intent router (fast path) enabled")
+        parser.add_argument("--completion-cache", action="store_true", help="Keep completion coalescing enabled")
+        parser.add_argument(
+            "--scratch", action="store_true",
+            help="Confirm the database and cache are scratch copies; the run writes products, "
+                 "categories, sessions and metric counters there"
+        )
+
+    def handle(self, *args, **options):
+        if not options["scratch"]:
+            raise CommandError(
+                f"bench_chat writes to {connection.settings_dict['NAME']} and the cache. "
+                "Point DJANGO_SETTINGS_MODULE at a scratch database and pass --scratch."
+            )
+
+        counts = metrics.get_counts(BENCH_COUNTERS)
+        self.session_ids: List[str] = []
+        server = None
+        saved = (AIConfig.OPENAI_BASE_URL, AIConfig.OPENAI_API_KEY,
+                 AIConfig.INTENT_ROUTER_ENABLED, completion_coalescer.ttl)
+        created, new_categories = self._seed_catalog(options["seed"])
+
+        try:
+            if options["base_url"]:
+                AIConfig.OPENAI_BASE_URL = options["base_url"]
+            else:
+                server = FakeOpenAIServer(latency=options["latency"], token_delay=options["token_delay"]).start()
+                AIConfig.OPENAI_BASE_URL = server.url
+                AIConfig.OPENAI_API_KEY = AIConfig.OPENAI_API_KEY or "fake-key"
+            AIConfig.INTENT_ROUTER_ENABLED = options["router"]
+            if not options["completion_cache"]:
+                completion_coalescer.ttl = 0
+            clients.reset_clients()
+
+            self.stdout.write(
+                f"{created} synthetic products, {options['concurrency']} customers x {options['turns']} turns, "
+                f"OpenAI at {AIConfig.OPENAI_BASE_URL}\n"
+            )
+            self.stdout.write(
+                f"{'target':<10}{'turns':>7}{'errors':>8}{'turns/s':>10}"
+                f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+            )
+
+            targets = ["view", "chatbot"] if options["target"] == "both" else [options["target"]]
+            for target in targets:
+                turn = self._view_turn if target == "view" else self._chatbot_turn
+                self._report(target, *self._run(turn, options["concurrency"], options["turns"]))
+
+            if server:
+                self.stdout.write(f"\nFake OpenAI requests: {json.dumps(server.requests, sort_keys=True)}")
+        finally:
+            if server:
+                server.stop()
+            (AIConfig.OPENAI_BASE_URL, AIConfig.OPENAI_API_KEY,
+             AIConfig.INTENT_ROUTER_ENABLED, completion_coalescer.ttl) = saved
+            clients.reset_clients()
+            self._clean_up(counts, new_categories, options["keep_catalog"])
+
+    def _clean_up(self, counts: Dict[str, int], new_categories: List[int], keep_catalog: bool):
+        """Delete the run's sessions, restore the counters and (unless kept) remove the synthetic catalog"""
+        manager = SessionManager()
+        for session_id in self.session_ids:
+            manager.delete_session(session_id)
+        metrics.set_counts(counts)
+
+        if not keep_catalog:
+            Product.objects.filter(product_id__startswith=BENCH_PREFIX).delete()
+            Category.objects.filter(pk__in=new_categories, product__isnull=True).delete()
+
+    def _run(self, turn: Callable, concurrency: int, turns: int) -> Tuple[List[float], int, float]:
+        """Run `turns` sequential turns for each of `concurrency` customers; returns latencies, errors, wall time"""
+        latencies: List[float] = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def customer(index: int):
+            state: Dict = {"customer": index}
+            try:
+                for number in range(turns):
+                    started = time.perf_counter()
+                    ok = turn(state, self._message(index, number))
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if not ok:
+                            errors[0] += 1
+            finally:
+                if state.get("session_id"):
+                    with lock:
+                        self.session_ids.append(state["session_id"])
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(customer, range(concurrency)))
+        return latencies, errors[0], time.perf_counter() - started
+
+    def _view_turn(self, state: Dict, message: str) -> bool:
+        """POST to TextChatView; each customer has its own address for admission control"""
+        factory = state.setdefault("factory", RequestFactory())
+        payload = {"message": message}
+        if state.get("session_id"):
+            payload["session_id"] = state["session_id"]
+
+        request = factory.post(
+            "/api/v1/ai/chat/text/", data=json.dumps(payload), content_type="application/json",
+            REMOTE_ADDR=f"10.77.{state['customer'] // 250}.{state['customer'] % 250 + 1}"
+        )
+        response = TextChatView.as_view()(request)
+        state["session_id"] = response.data.get("session_id") or state.get("session_id")
+        return response.status_code == 200 and bool(response.data.get("success"))
+
+    def _chatbot_turn(self, state: Dict, message: str) -> bool:
+        if "chatbot" not in state:
+            state["chatbot"] = FloorBotAI()
+            state["session_id"] = state["chatbot"].session_manager.create_session().session_id
+        return bool(state["chatbot"].chat(state["session_id"], message).get("success"))
+
+    def _message(self, customer: int, number: int) -> str:
+        category, colors, _ = CATALOG[(customer + number) % len(CATALOG)]
+        template = MESSAGES[number % len(MESSAGES)]
+        return template.format(color=colors[customer % len(colors)].lower(), category=category.lower())
+
+    def _report(self, target: str, latencies: List[float], errors: int, wall: float):
+        if not latencies:
+            self.stdout.write(f"{target:<10}{0:>7}")
+            return
+
+        ms = sorted(latency * 1000 for latency in latencies)
+        cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+        self.stdout.write(
+            f"{target:<10}{len(ms):>7}{errors:>8}{len(ms) / wall:>10.1f}"
+            f"{cuts[49]:>10.1f}{cuts[94]:>10.1f}{cuts[98]:>10.1f}{ms[-1]:>10.1f}"
+        )
+
+    def _seed_catalog(self, count: int) -> Tuple[int, List[int]]:
+        """
+        Add `count` synthetic products (product_id BENCH-*) spread over the catalog categories
+
+        Returns the number of synthetic products and the ids of the categories created for them.
+        """
+        if count <= 0:
+            return 0, []
+
+        existing = set(Product.objects.filter(product_id__startswith=BENCH_PREFIX).values_list("product_id", flat=True))
+        categories, new_categories = {}, []
+        for title, _, _ in CATALOG:
+            category, created = Category.objects.get_or_create(title=title, defaults={"image": "categoris/placeholder.png"})
+            categories[title] = category
+            if created:
+                new_categories.append(category.pk)
+
+        products = []
+        for index in range(count):
+            product_id = f"{BENCH_PREFIX}{index:05d}"
+            if product_id in existing:
+                continue
+            title, colors, material = CATALOG[index % len(CATALOG)]
+            color = colors[index // len(CATALOG) % len(colors)]
+            price = Decimal(15 + index % 45)
+            product = Product(
+                product_title=f"{color} {title} {index}",
+                brand_manufacturer="Benchmark Mills",
+                item_description=f"Synthetic {color.lower()} {title.lower()} for load testing",
+                main_category=categories[title],
+                primary_image="products/placeholder.png",
+                regular_price=price,
+                sale_price=price * Decimal("0.85") if index % 3 == 0 else 0,
+                product_id=product_id,
+                pack_coverage="2.5",
+                length="1200", width="200", thickness="8", weight="12",
+                installation_method="click",
+                coverage_per_pack="2.5 m2 per box",
+                materials=material,
+                available_colors=color,
+                pattern_type="Modern",
+                stock_quantity=5 + index % 50,
+                total_salses=index % 30,
+            )
+            product.refresh_search_attributes()
+            products.append(product)
+
+        Product.objects.bulk_create(products, batch_size=500)
+        # bulk_create skips post_save, so invalidate the AI catalog caches here
+        product_search_index.invalidate()
+        bump_catalog_version()
+        return len(existing) + len(products), new_categories
@@ -0,0 +1,65 @@
+"""
+Compare session codecs on payload size, encode/decode time and memory
+"""
+import sys
+import timeit
+import tracemalloc
+from django.core.management.base import BaseCommand
+from ai_app.config import AIConfig
+from ai_app.schemas import ChatSession, MessageRole
+from ai_app.session_codec import SESSION_CODECS
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON vs msgpack session encoding on a synthetic conversation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--turns", type=int, default=20, help="User/assistant turns per session")
+        parser.add_argument("--repeat", type=int, default=2000, help="Encode/decode iterations")
+
+    def handle(self, *args, **options):
+        session = self._build_session(options["turns"])
+        repeat = options["repeat"]
+
+        self.stdout.write(f"Session with {len(session.messages)} messages, {repeat} iterations\n")
+        self.stdout.write(f"{'codec':<10}{'bytes':>10}{'encode us':>12}{'decode us':>12}{'live KiB':>12}")
+
+        for name, codec_class in SESSION_CODECS.items():
+            codec = codec_class()
+            payload = codec.encode_session(session)
+            size = len(payload.encode("utf-8") if isinstance(payload, str) else payload)
+
+            encode_us = timeit.timeit(lambda: codec.encode_session(session), number=repeat) / repeat * 1e6
+            decode_us = timeit.timeit(lambda: codec.decode_session(payload), number=repeat) / repeat * 1e6
+
+            tracemalloc.start()
+            decoded = codec.decode_session(payload)
+            live_kib = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            del decoded
+
+            self.stdout.write(f"{name:<10}{size:>10}{encode_us:>12.1f}{decode_us:>12.1f}{live_kib:>12.1f}")
+
+        message = session.messages[1]
+        self.stdout.write(
+            f"\nPer-message object size: {sys.getsizeof(message)} bytes "
+            f"(slots={not hasattr(message, '__dict__')})"
+        )
+
+    def _build_session(self, turns: int) -> ChatSession:
+        session = ChatSession(session_id="benchmark-session", user_id="42")
+        session.add_message(MessageRole.SYSTEM, AIConfig.SYSTEM_PROMPT)
+        session.context = {
+            "last_search_filters": {"product_type": "carpets", "color": "grey"},
+            "last_products": list(range(10)),
+        }
+
+        for i in range(turns):
+            session.add_message(MessageRole.USER, f"Do you have grey carpets for a {3 + i % 4} by 5 metre room?")
+            session.add_message(
+                MessageRole.ASSISTANT,
+                "Here are our grey carpet options. The room is 15 square metres, so you would need "
+                "about 15 m² of carpet. Let me know if you would like an order summary."
+            )
+
+        return session
@@ -0,0 +1,69 @@
+"""
+Metrics - Counters shared by all workers through the Django cache
+"""
+import asyncio
+from typing import Dict, Iterable, Set
+from django.core.cache import cache
+
+
+METRICS_PREFIX = "ai_metrics:"
+
+# Increments scheduled by incr_soon(), referenced until they finish
+_background: Set[asyncio.Task] = set()
+
+
+def incr(name: str, delta: int = 1):
+    """Increment a counter, creating it on first use"""
+    key = f"{METRICS_PREFIX}{name}"
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Missing key: add() loses the race gracefully if another worker created it
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, delta)
+
+
+async def aincr(name: str, delta: int = 1):
+    """Increment a counter (async)"""
+    key = f"{METRICS_PREFIX}{name}"
+    try:
+        await cache.aincr(key, delta)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key, delta)
+
+
+def incr_soon(name: str, delta: int = 1):
+    """
+    Increment a counter in the background of the running event loop
+    
+    For code that must not wait on the cache, or add an await (and so a
+    cancellation point) where it holds a resource.
+    """
+    task = asyncio.get_running_loop().create_task(aincr(name, delta))
+    _background.add(task)
+    task.add_done_callback(_finished)
+
+
+def _finished(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled():
+        task.exception()
+
+
+def get_counts(names: Iterable[str]) -> Dict[str, int]:
+    """Current value of each counter (0 if never incremented)"""
+    names = list(names)
+    values = cache.get_many([f"{METRICS_PREFIX}{name}" for name in names])
+    return {name: int(values.get(f"{METRICS_PREFIX}{name}", 0)) for name in names}
+
+
+def reset(names: Iterable[str]):
+    """Delete counters"""
+    cache.delete_many([f"{METRICS_PREFIX}{name}" for name in names])
+
+
+def set_counts(counts: Dict[str, int]):
+    """Overwrite counters, e.g. with values saved by get_counts(); 0 deletes the counter"""
+    reset(name for name, value in counts.items() if not value)
+    cache.set_many({f"{METRICS_PREFIX}{name}": value for name, value in counts.items() if value}, timeout=None)
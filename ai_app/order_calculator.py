@@ -42,6 +42,10 @@ class OrderCalculator:
         if not product:
             return None
         
+        return self._price_item(product, quantity, area)
+    
+    def _price_item(self, product: ProductInfo, quantity: float, area: Optional[float] = None) -> OrderItem:
+        """Price one line item for an already loaded product"""
         price = product.sale_price if product.sale_price > 0 else product.price_per_unit
         
         area_covered = area or (quantity * product.coverage_per_unit)
@@ -88,13 +92,30 @@ class OrderCalculator:
             grand_total=grand_total
         )
     
-    def get_product_recommendations(self, product_type: str, budget: Optional[float] = None) -> List[ProductInfo]:
-        """Get product recommendations based on type and budget"""
-        products = self.product_service.search_products(product_type=product_type)
+    def quote_order(self, items: List[Dict], tax_rate: float = 0.1, delivery_fee: float = 0.0) -> Optional[OrderSummary]:
+        """
+        Price a whole cart with a single product query
         
-        if budget:
-            products = [p for p in products if (p.sale_price or p.price_per_unit) <= budget]
+        Args:
+            items: [{"product_id", "quantity", optional "area"}]
+            tax_rate: Tax rate (default 10%)
+            delivery_fee: Flat delivery fee
+            
+        Returns:
+            OrderSummary for the items whose product exists, or None if none do
+        """
+        products = self.product_service.get_products_by_ids(item["product_id"] for item in items)
         
-        products.sort(key=lambda p: p.discount_percentage, reverse=True)
+        order_items = [
+            self._price_item(products[str(item["product_id"])], item["quantity"], item.get("area"))
+            for item in items
+            if str(item["product_id"]) in products
+        ]
+        if not order_items:
+            return None
         
-        return products[:5]
+        return self.create_order_summary(order_items, tax_rate, delivery_fee)
+    
+    def get_product_recommendations(self, product_type: str, budget: Optional[float] = None) -> List[ProductInfo]:
+        """Get product recommendations based on type and budget"""
+        return self.product_service.get_best_deals(product_type, max_price=budget or None, limit=5)
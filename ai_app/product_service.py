@@ -1,10 +1,63 @@
 """
 Product Service - Bridges AI chatbot with Django Product model
 """
-from typing import List, Optional, Dict, Any
-from django.db.models import Q
+from typing import Iterable, List, Optional, Dict, Any, Set
 from dashboard.models import Product
+from dashboard.attributes import CATEGORY_KEYWORDS
 from ai_app.schemas import ProductInfo
+from dashboard.search import product_search
+from ai_app.search_index import product_search_index
+from ai_app.vocabulary import FuzzyVocabulary
+
+
+# Words customers use for each product type. Misspellings are resolved by
+# PRODUCT_TYPE_VOCABULARY rather than listed here.
+PRODUCT_TYPE_SYNONYMS = {
+    "carpet": "carpets",
+    "carpets": "carpets",
+    "rug": "carpets",
+    "rugs": "carpets",
+    "vinyl": "vinyl",
+    "lvt": "vinyl",
+    "laminate": "laminate",
+    "laminated": "laminate",
+    "wood": "wood flooring",
+    "wooden": "wood flooring",
+    "hardwood": "wood flooring",
+    "timber": "wood flooring",
+    "wood flooring": "wood flooring",
+}
+
+COLOR_SYNONYMS = {
+    "grey": ["grey", "gray"],
+    "gray": ["grey", "gray"],
+    "beige": ["beige", "tan", "cream"],
+    "brown": ["brown", "chocolate", "espresso"],
+    "white": ["white", "ivory", "off-white"],
+    "black": ["black", "ebony", "charcoal"],
+    "red": ["red", "burgundy", "crimson"],
+    "blue": ["blue", "navy", "azure"],
+    "green": ["green", "olive", "sage"],
+    "oak": ["oak", "light oak", "natural oak"],
+    "walnut": ["walnut", "dark walnut"],
+    "yellow": ["yellow", "gold", "golden"],
+    "orange": ["orange", "terracotta"],
+    "purple": ["purple", "violet", "lavender"],
+}
+
+# Short misspellings customers send that are too close to other words for
+# the fuzzy lookup, which corrects nothing up to 4 letters (see max_edits)
+COLOR_SYNONYMS.update({
+    "blu": COLOR_SYNONYMS["blue"],
+    "blak": COLOR_SYNONYMS["black"],
+    "wite": COLOR_SYNONYMS["white"],
+})
+
+PRODUCT_TYPE_VOCABULARY = FuzzyVocabulary.from_terms(PRODUCT_TYPE_SYNONYMS)
+COLOR_VOCABULARY = FuzzyVocabulary.from_terms(COLOR_SYNONYMS)
+
+# Product types stored in Product.search_category
+KNOWN_CATEGORIES = {name for name, _ in CATEGORY_KEYWORDS}
 
 
 class DjangoProductService:
@@ -13,6 +66,9 @@ class DjangoProductService:
     Provides products from the actual database
     """
     
+    # Primary keys per `pk__in` query, kept under SQLite's bound-parameter limit
+    FETCH_CHUNK_SIZE = 500
+    
     def search_products(self, 
                        product_type: Optional[str] = None,
                        color: Optional[str] = None,
@@ -40,119 +96,150 @@ class DjangoProductService:
         """
         queryset = Product.objects.filter(stock_quantity__gt=0)
         
+        # Text filters are resolved against the in-memory token index as
+        # set intersections; None means "not constrained yet"
+        candidate_ids = None
+        # Query terms the results are ranked by
+        rank_terms = []
+        
         # Enhanced product type matching with more keywords and fuzzy matching
         if product_type:
             # Normalize and handle typos/variations
             product_type_normalized = self._normalize_product_type(product_type)
             
             category_map = {
-                "carpets": ["carpet", "carpets", "rug", "rugs", "carpat", "carpets"],
-                "vinyl": ["vinyl", "lvt", "luxury vinyl", "vinyl tile", "vinyl plank", "vynil"],
-                "laminate": ["laminate", "laminated", "laminat"],
+                "carpets": ["carpet", "carpets", "rug", "rugs"],
+                "vinyl": ["vinyl", "lvt", "luxury vinyl", "vinyl tile", "vinyl plank"],
+                "laminate": ["laminate", "laminated"],
                 "wood flooring": ["wood", "hardwood", "engineered wood", "timber", "wooden", "oak", "walnut", "wood floor"]
             }
             
-            category_keywords = category_map.get(product_type_normalized, [product_type.lower()])
-            
-            category_query = Q()
-            for keyword_item in category_keywords:
-                category_query |= Q(main_category__title__icontains=keyword_item)
-                category_query |= Q(product_title__icontains=keyword_item)
-                category_query |= Q(item_description__icontains=keyword_item)
+            category_keywords = category_map.get(product_type_normalized, [product_type_normalized])
+            rank_terms.extend(category_keywords)
             
-            queryset = queryset.filter(category_query)
+            matched_ids = product_search_index.match_any(category_keywords, ("category", "title", "description"))
+            if product_type_normalized in KNOWN_CATEGORIES:
+                # Plus products whose stored type (Product.search_category) matches
+                matched_ids = (matched_ids or set()) | product_search_index.match(product_type_normalized, ("type",))
+            candidate_ids = self._narrow(candidate_ids, matched_ids)
         
         # Enhanced color matching with variations
         if color:
             color_variations = self._get_color_variations(color)
-            color_query = Q()
-            for color_var in color_variations:
-                color_query |= Q(available_colors__icontains=color_var)
-                color_query |= Q(product_title__icontains=color_var)
-                color_query |= Q(item_description__icontains=color_var)
-            queryset = queryset.filter(color_query)
+            rank_terms.extend(color_variations)
+            candidate_ids = self._narrow(
+                candidate_ids,
+                product_search_index.match_any(color_variations, ("colors", "title", "description"))
+            )
         
         if material:
-            queryset = queryset.filter(
-                Q(materials__icontains=material) |
-                Q(product_title__icontains=material)
+            rank_terms.append(material)
+            candidate_ids = self._narrow(
+                candidate_ids,
+                self._match_with_correction(material, "materials", ("materials", "title"))
             )
         
         if pattern:
-            queryset = queryset.filter(
-                Q(pattern_type__icontains=pattern) |
-                Q(product_title__icontains=pattern) |
-                Q(item_description__icontains=pattern)
+            rank_terms.append(pattern)
+            candidate_ids = self._narrow(
+                candidate_ids,
+                self._match_with_correction(pattern, "pattern", ("pattern", "title", "description"))
             )
         
+        # Free-text keywords go through the shared FTS backend so results
+        # come back in BM25 order
+        ranked_ids = None
         if keyword:
-            queryset = queryset.filter(
-                Q(product_title__icontains=keyword) |
-                Q(item_description__icontains=keyword) |
-                Q(materials__icontains=keyword) |
-                Q(available_colors__icontains=keyword)
+            rank_terms.append(keyword)
+            ranked_ids = product_search.ranked_ids(
+                keyword,
+                columns=("product_title", "item_description", "materials", "available_colors")
             )
+            candidate_ids = self._narrow(candidate_ids, set(ranked_ids))
         
         if min_price is not None:
-            queryset = queryset.filter(
-                Q(sale_price__gte=min_price) | Q(regular_price__gte=min_price)
-            )
+            queryset = queryset.filter(effective_price__gte=min_price)
         
         if max_price is not None:
-            queryset = queryset.filter(
-                Q(sale_price__lte=max_price) | Q(regular_price__lte=max_price)
-            )
+            queryset = queryset.filter(effective_price__lte=max_price)
         
-        # Limit results to avoid overwhelming users
-        products = queryset[:limit]
+        # Rank only what passes the stock and price filters, checked against the
+        # index snapshot so the fetch below usually needs one query; it
+        # re-applies the DB filters in case the snapshot is behind
+        candidate_ids = product_search_index.filter(candidate_ids, min_price, max_price)
         
-        return list(products)
+        # Best matches first: BM25 over the query terms plus stock and sales
+        ordered_ids = product_search_index.rank(rank_terms, candidate_ids)
+        
+        if ordered_ids is None:
+            # Without NumPy, fall back to FTS order or primary key order
+            if ranked_ids is not None:
+                ordered_ids = [pk for pk in ranked_ids if pk in candidate_ids]
+            else:
+                ordered_ids = sorted(candidate_ids)
+        
+        return self._fetch_candidates(queryset, ordered_ids, limit)
+    
+    def _narrow(self, candidate_ids: Optional[Set[int]], matched_ids: Optional[Set[int]]) -> Optional[Set[int]]:
+        """Intersect the running candidate set with a filter's matches"""
+        if matched_ids is None:
+            return candidate_ids
+        if candidate_ids is None:
+            return matched_ids
+        return candidate_ids & matched_ids
+    
+    def _match_with_correction(self, term: str, vocabulary_field: str, fields) -> Optional[Set[int]]:
+        """Index match for `term`, retried with catalog spelling if it matches nothing"""
+        matched_ids = product_search_index.match(term, fields)
+        if matched_ids is None or matched_ids:
+            return matched_ids
+        
+        corrected = product_search_index.correct(term, vocabulary_field)
+        if corrected == " ".join(term.lower().split()):
+            return matched_ids
+        return product_search_index.match(corrected, fields)
+    
+    def _fetch_candidates(self, queryset, ordered_ids: List[int], limit: int) -> List[Product]:
+        """Load products in `ordered_ids` order, in chunks, until `limit` pass the DB filters"""
+        products = []
+        
+        for start in range(0, len(ordered_ids), self.FETCH_CHUNK_SIZE):
+            chunk = ordered_ids[start:start + self.FETCH_CHUNK_SIZE]
+            found = queryset.in_bulk(chunk)
+            products.extend(found[pk] for pk in chunk if pk in found)
+            if len(products) >= limit:
+                break
+        
+        return products[:limit]
     
     def _normalize_product_type(self, product_type: str) -> str:
         """Normalize product type to handle typos and variations"""
-        product_type = product_type.lower().strip()
+        product_type = " ".join(product_type.lower().split())
         
-        # Common typos and variations
-        typo_map = {
-            "carpat": "carpets",
-            "carpets": "carpets",
-            "carpet": "carpets",
-            "rug": "carpets",
-            "rugs": "carpets",
-            "vynil": "vinyl",
-            "vinly": "vinyl",
-            "vinyl": "vinyl",
-            "laminat": "laminate",
-            "laminated": "laminate",
-            "laminate": "laminate",
-            "wood": "wood flooring",
-            "wooden": "wood flooring",
-            "hardwood": "wood flooring",
-            "timber": "wood flooring",
-        }
+        if product_type in PRODUCT_TYPE_SYNONYMS:
+            return PRODUCT_TYPE_SYNONYMS[product_type]
         
-        return typo_map.get(product_type, product_type)
+        corrected = PRODUCT_TYPE_VOCABULARY.correct(product_type)
+        if corrected:
+            return PRODUCT_TYPE_SYNONYMS[corrected]
+        
+        # Unknown words resolve against the live catalog's category titles
+        return product_search_index.correct(product_type, "category") or product_type
     
     def _get_color_variations(self, color: str) -> List[str]:
-        """Get color variations and synonyms, including common typos"""
-        color = color.lower().strip()
-        color_map = {
-            "grey": ["grey", "gray"],
-            "gray": ["grey", "gray"],
-            "beige": ["beige", "tan", "cream", "biege"],
-            "brown": ["brown", "chocolate", "espresso", "bronw"],
-            "white": ["white", "ivory", "off-white", "wite"],
-            "black": ["black", "ebony", "charcoal", "blak"],
-            "red": ["red", "burgundy", "crimson"],
-            "blue": ["blue", "navy", "azure", "blu"],
-            "green": ["green", "olive", "sage"],
-            "oak": ["oak", "light oak", "natural oak"],
-            "walnut": ["walnut", "dark walnut"],
-            "yellow": ["yellow", "gold", "golden"],
-            "orange": ["orange", "terracotta"],
-            "purple": ["purple", "violet", "lavender"],
-        }
-        return color_map.get(color, [color])
+        """Get color variations and synonyms, resolving misspelt colors"""
+        color = " ".join(color.lower().split())
+        
+        if color not in COLOR_SYNONYMS:
+            corrected = COLOR_VOCABULARY.correct(color)
+            if corrected:
+                color = corrected
+            elif " " not in color:
+                # Closest spelling the catalog actually uses (exact match first)
+                catalog_terms = product_search_index.similar_terms(color, "colors")
+                return catalog_terms[:1] or [color]
+        
+        return COLOR_SYNONYMS.get(color, [color])
     
     def get_product_by_id(self, product_id: str) -> Optional[ProductInfo]:
         """Get a specific product by ID"""
@@ -162,24 +249,54 @@ class DjangoProductService:
         except Product.DoesNotExist:
             return None
     
+    def get_products_by_ids(self, product_ids: Iterable[str]) -> Dict[str, ProductInfo]:
+        """
+        Get several products in one query
+        
+        Args:
+            product_ids: Product IDs (duplicates allowed)
+            
+        Returns:
+            ProductInfo keyed by product ID; unknown IDs are left out
+        """
+        product_ids = list({str(product_id) for product_id in product_ids})
+        products = {}
+        
+        for start in range(0, len(product_ids), self.FETCH_CHUNK_SIZE):
+            chunk = product_ids[start:start + self.FETCH_CHUNK_SIZE]
+            queryset = Product.objects.filter(product_id__in=chunk)
+            for product in queryset:
+                products[product.product_id] = self._convert_to_product_info(product)
+        
+        return products
+    
     def get_all_products(self, limit: int = 50) -> List[Product]:
         """Get all available products"""
         products = Product.objects.filter(stock_quantity__gt=0)[:limit]
         return list(products)
     
-    def _convert_to_product_info(self, product: Product) -> ProductInfo:
-        """Convert Django Product model to ProductInfo schema"""
-        
-        coverage = self._parse_coverage(product.coverage_per_pack)
+    def get_best_deals(self, product_type: str, max_price: Optional[float] = None,
+                       limit: int = 5) -> List[ProductInfo]:
+        """
+        In-stock products of a type, biggest discount first
         
-        discount_pct = 0
-        if product.sale_price and product.regular_price:
-            if product.sale_price < product.regular_price:
-                discount_pct = ((product.regular_price - product.sale_price) / product.regular_price) * 100
+        Args:
+            product_type: Product type (normalized like search_products)
+            max_price: Highest effective (sale or regular) price
+            limit: Maximum number of results
+        """
+        queryset = Product.objects.filter(
+            stock_quantity__gt=0,
+            search_category=self._normalize_product_type(product_type)
+        )
+        if max_price is not None:
+            queryset = queryset.filter(effective_price__lte=max_price)
         
-        unit = "m2"
-        if "box" in product.coverage_per_pack.lower() or "pack" in product.coverage_per_pack.lower():
-            unit = "box"
+        products = queryset.order_by("-discount_percentage", "effective_price", "pk")[:limit]
+        return [self._convert_to_product_info(product) for product in products]
+    
+    def _convert_to_product_info(self, product: Product) -> ProductInfo:
+        """Convert Django Product model to ProductInfo schema"""
         
         # Get image URL
         image_url = None
@@ -189,15 +306,15 @@ class DjangoProductService:
         return ProductInfo(
             id=product.product_id,
             name=product.product_title,
-            category=self._get_category_type(product),
-            color=self._extract_color(product),
+            category=product.search_category,
+            color=product.primary_color,
             material=product.materials or "",
             price_per_unit=float(product.regular_price),
             sale_price=float(product.sale_price) if product.sale_price else 0,
-            unit=unit,
-            coverage_per_unit=coverage,
+            unit=product.coverage_unit,
+            coverage_per_unit=product.coverage_value,
             stock_quantity=product.stock_quantity or 0,
-            discount_percentage=round(discount_pct, 2),
+            discount_percentage=float(product.discount_percentage),
             description=product.item_description or "",
             image_url=image_url,
             specifications={
@@ -212,58 +329,3 @@ class DjangoProductService:
                 "underlay_required": product.is_underlay_required
             }
         )
-    
-    def _get_category_type(self, product: Product) -> str:
-        """Extract category type from product"""
-        if product.main_category:
-            title = product.main_category.title.lower()
-            if "carpet" in title or "rug" in title:
-                return "carpets"
-            elif "vinyl" in title or "lvt" in title:
-                return "vinyl"
-            elif "laminate" in title:
-                return "laminate"
-            elif "wood" in title or "timber" in title or "hardwood" in title:
-                return "wood flooring"
-        
-        title = product.product_title.lower()
-        if "carpet" in title:
-            return "carpets"
-        elif "vinyl" in title:
-            return "vinyl"
-        elif "laminate" in title:
-            return "laminate"
-        elif "wood" in title:
-            return "wood flooring"
-        
-        return "flooring"
-    
-    def _extract_color(self, product: Product) -> str:
-        """Extract primary color from product"""
-        if product.available_colors:
-            colors = product.available_colors.split(',')
-            if colors:
-                return colors[0].strip()
-        
-        common_colors = ["grey", "gray", "beige", "brown", "white", "black", "oak", "walnut", 
-                        "natural", "dark", "light", "cream", "tan", "charcoal"]
-        
-        title = product.product_title.lower()
-        for color in common_colors:
-            if color in title:
-                return color.capitalize()
-        
-        return "Natural"
-    
-    def _parse_coverage(self, coverage_str: str) -> float:
-        """Parse coverage from string format"""
-        if not coverage_str:
-            return 1.0
-        
-        import re
-        numbers = re.findall(r'\d+\.?\d*', coverage_str)
-        
-        if numbers:
-            return float(numbers[0])
-        
-        return 1.0
@@ -0,0 +1,159 @@
+"""
+Ranker - Field-weighted BM25 with popularity signals over the product catalog
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - search falls back to unranked order
+    np = None
+
+
+# BM25 weight of each index field; title and category hits matter most
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "category": 2.0,
+    "colors": 1.5,
+    "materials": 1.5,
+    "pattern": 1.2,
+    "description": 0.5,
+}
+
+K1 = 1.2
+B = 0.75
+
+# Added to the text score, which is normalized to [0, 1] per query
+STOCK_WEIGHT = 0.1
+STOCK_CAP = 50
+SALES_WEIGHT = 0.3
+
+MAX_TERM_EXPANSIONS = 20
+# Substring expansions remembered per index before the memo is reset
+MAX_CACHED_EXPANSIONS = 4096
+
+
+def ranking_available() -> bool:
+    """True when NumPy is installed"""
+    return np is not None
+
+
+class FieldMatrix:
+    """
+    Term-major sparse term/document matrix for one field
+    
+    Documents containing term `t` are `docs[ptr[t]:ptr[t + 1]]` with term
+    frequencies `tf[ptr[t]:ptr[t + 1]]` (CSC layout).
+    """
+    
+    def __init__(self, documents: Sequence[List[str]]):
+        """Build from one token list per document (in catalog row order)"""
+        postings: Dict[str, Dict[int, int]] = {}
+        for row, tokens in enumerate(documents):
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+        
+        self.term_index = {term: i for i, term in enumerate(postings)}
+        lengths = [len(postings[term]) for term in postings]
+        self.ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.ptr[1:])
+        self.docs = np.fromiter(
+            (row for counts in postings.values() for row in counts), dtype=np.int64, count=int(self.ptr[-1])
+        )
+        self.tf = np.fromiter(
+            (tf for counts in postings.values() for tf in counts.values()), dtype=np.float32, count=int(self.ptr[-1])
+        )
+        
+        total = len(documents)
+        df = np.diff(self.ptr).astype(np.float32)
+        self.idf = np.log1p((total - df + 0.5) / (df + 0.5))
+        
+        self.doc_length = np.fromiter((len(tokens) for tokens in documents), dtype=np.float32, count=total)
+        average = float(self.doc_length.mean()) if total else 0.0
+        self.length_norm = K1 * (1 - B + B * self.doc_length / (average or 1.0))
+        
+        self._expansions: Dict[str, List[int]] = {}
+    
+    def term_ids(self, word: str) -> List[int]:
+        """Exact term, or else up to MAX_TERM_EXPANSIONS terms containing `word`"""
+        term_id = self.term_index.get(word)
+        if term_id is not None:
+            return [term_id]
+        
+        cached = self._expansions.get(word)
+        if cached is None:
+            cached = [i for term, i in self.term_index.items() if word in term][:MAX_TERM_EXPANSIONS]
+            if len(self._expansions) >= MAX_CACHED_EXPANSIONS:
+                self._expansions.clear()
+            self._expansions[word] = cached
+        return cached
+    
+    def add_scores(self, scores, term_id: int, weight: float):
+        """Add the weighted BM25 contribution of one term to `scores` in place"""
+        start, end = self.ptr[term_id], self.ptr[term_id + 1]
+        docs = self.docs[start:end]
+        tf = self.tf[start:end]
+        # Each document appears once per term, so fancy-index += is safe
+        scores[docs] += weight * self.idf[term_id] * tf * (K1 + 1) / (tf + self.length_norm[docs])
+
+
+class BM25Ranker:
+    """Scores catalog rows for a query with vectorized BM25 plus stock and sales signals"""
+    
+    def __init__(self, pks: Sequence[int], field_tokens: Dict[str, Sequence[List[str]]],
+                 stock: Sequence[int], sales: Sequence[int]):
+        """
+        Args:
+            pks: Product primary keys in ascending order
+            field_tokens: Field name -> token list per product (same order as `pks`)
+            stock: stock_quantity per product
+            sales: total_salses per product
+        """
+        self.pks = np.asarray(pks, dtype=np.int64)
+        self.fields = {
+            name: FieldMatrix(documents)
+            for name, documents in field_tokens.items()
+            if name in FIELD_WEIGHTS
+        }
+        
+        stock = np.clip(np.asarray(stock, dtype=np.float32), 0, STOCK_CAP)
+        sales = np.log1p(np.clip(np.asarray(sales, dtype=np.float32), 0, None))
+        top_sales = float(sales.max()) if len(sales) else 0.0
+        self.signals = STOCK_WEIGHT * stock / STOCK_CAP + SALES_WEIGHT * sales / (top_sales or 1.0)
+    
+    def rank(self, words: Iterable[str], candidate_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Order products by relevance to `words`, best first
+        
+        Args:
+            words: Lowercase query tokens
+            candidate_ids: Restrict to these primary keys (None ranks the whole catalog)
+        
+        Returns:
+            Primary keys; ties are broken by primary key
+        """
+        if candidate_ids is None:
+            rows = np.arange(len(self.pks))
+        else:
+            wanted = np.fromiter(candidate_ids, dtype=np.int64)
+            rows = np.searchsorted(self.pks, wanted)
+            found = rows < len(self.pks)
+            rows = rows[found]
+            # Drop ids that are not in the snapshot (e.g. created since it was built)
+            rows = rows[self.pks[rows] == wanted[found]]
+        
+        if not len(rows):
+            return []
+        
+        scores = np.zeros(len(self.pks), dtype=np.float32)
+        for word in set(words):
+            for name, matrix in self.fields.items():
+                for term_id in matrix.term_ids(word):
+                    matrix.add_scores(scores, term_id, FIELD_WEIGHTS[name])
+        
+        relevance = scores[rows]
+        best = float(relevance.max())
+        final = (relevance / best if best > 0 else relevance) + self.signals[rows]
+        
+        order = np.lexsort((self.pks[rows], -final))
+        return self.pks[rows][order].tolist()
@@ -15,7 +15,7 @@ class MessageRole(str, Enum):
     FUNCTION = "function"
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationMessage:
     """Single message in a conversation"""
     role: MessageRole
@@ -24,7 +24,7 @@ class ConversationMessage:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatSession:
     """Chat session with conversation history and context"""
     session_id: str
@@ -33,6 +33,10 @@ class ChatSession:
     context: Dict[str, Any] = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
     last_activity: datetime = field(default_factory=datetime.now)
+    # Leading entries of `messages` already persisted by the session store
+    stored_message_count: int = 0
+    # True when older messages were left in the store by a partial history load
+    history_truncated: bool = False
     
     def add_message(self, role: MessageRole, content: str, metadata: Optional[Dict] = None):
         """Add a message to the session"""
@@ -56,14 +60,6 @@ class ChatSession:
             }
             for msg in messages
         ]
-    
-    def get_openai_messages(self, limit: Optional[int] = None) -> List[Dict]:
-        """Get messages formatted for OpenAI API"""
-        messages = self.messages[-limit:] if limit else self.messages
-        return [
-            {"role": msg.role.value, "content": msg.content}
-            for msg in messages
-        ]
 
 
 @dataclass
@@ -0,0 +1,268 @@
+"""
+Search Index - In-process token index over the product catalog
+"""
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from django.db.models import Count, Max
+from dashboard.models import Product
+from ai_app.config import AIConfig
+from ai_app.ranker import MAX_CACHED_EXPANSIONS, BM25Ranker, ranking_available
+from ai_app.vocabulary import FuzzyVocabulary
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Index field name -> Product lookup it is built from
+INDEXED_FIELDS = {
+    "title": "product_title",
+    "description": "item_description",
+    "colors": "available_colors",
+    "materials": "materials",
+    "pattern": "pattern_type",
+    "category": "main_category__title",
+    # Product type stored on save (dashboard.attributes); not ranked
+    "type": "search_category",
+}
+
+# Fields whose tokens form the typo-tolerant vocabulary
+VOCABULARY_FIELDS = ("category", "colors", "materials", "pattern")
+
+
+class IndexSnapshot(NamedTuple):
+    """Immutable view of the catalog built in one pass"""
+    postings: Dict[str, Dict[str, Set[int]]]
+    expansions: dict
+    vocabularies: Dict[str, FuzzyVocabulary]
+    ranker: Optional[BM25Ranker]
+    # Primary key -> (stock_quantity, effective_price)
+    stock_and_price: Dict[int, Tuple[int, Decimal]]
+
+
+def tokenize(text: Optional[str]) -> list:
+    """Split free text into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class ProductSearchIndex:
+    """
+    Per-process inverted index mapping tokens to Product primary keys
+
+    The index is built lazily on first use and marked stale by Product/Category
+    post_save/post_delete signals. Writes made in other processes (e.g. the CSV
+    import running in Celery) are picked up by a cheap catalog stamp check.
+    """
+
+    def __init__(self, refresh_interval: Optional[int] = None):
+        """Initialize an empty index"""
+        self.refresh_interval = (
+            AIConfig.SEARCH_INDEX_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        )
+        self._lock = threading.Lock()
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """Drop the current index so the next search rebuilds it"""
+        with self._lock:
+            self._snapshot = None
+
+    def match(self, term: str, fields: Iterable[str]) -> Optional[Set[int]]:
+        """
+        Find products where every word of `term` appears in one of `fields`
+
+        Each word matches any indexed token containing it, mirroring the
+        `icontains` semantics of the original queryset filters.
+
+        Args:
+            term: Search term (single word or phrase)
+            fields: Index field names to search
+
+        Returns:
+            Set of matching primary keys, or None if the term has no words
+        """
+        words = tokenize(term)
+        if not words:
+            return None
+
+        snapshot = self._get_snapshot()
+        matched: Set[int] = set()
+
+        for field_name in fields:
+            field_ids = None
+            for word in words:
+                word_ids = self._expand(snapshot, field_name, word)
+                field_ids = word_ids if field_ids is None else field_ids & word_ids
+                if not field_ids:
+                    break
+            if field_ids:
+                matched |= field_ids
+
+        return matched
+
+    def match_any(self, terms: Iterable[str], fields: Iterable[str]) -> Optional[Set[int]]:
+        """Union of `match` over several alternative terms (synonyms, typos)"""
+        fields = tuple(fields)
+        result = None
+        for term in terms:
+            ids = self.match(term, fields)
+            if ids is None:
+                continue
+            result = ids if result is None else result | ids
+        return result
+
+    def similar_terms(self, word: str, field_name: str) -> List[str]:
+        """
+        Catalog terms of a field within a small edit distance of `word`
+        
+        Args:
+            word: Single query word (any case)
+            field_name: One of VOCABULARY_FIELDS
+            
+        Returns:
+            Matching terms, exact match first, then closest and most common
+        """
+        vocabulary = self._get_snapshot().vocabularies[field_name]
+        return vocabulary.similar(word.lower().strip())
+    
+    def correct(self, text: str, field_name: str) -> str:
+        """Replace each word of `text` with its closest catalog term in a field (if any)"""
+        vocabulary = self._get_snapshot().vocabularies[field_name]
+        return " ".join(vocabulary.correct(word) or word for word in tokenize(text))
+    
+    def filter(self, candidate_ids: Optional[Set[int]] = None, min_price=None, max_price=None) -> Set[int]:
+        """
+        Products in stock and within the price bounds, by the snapshot's stored values
+
+        Ids not in the snapshot (e.g. newer FTS matches) are kept; callers
+        re-apply the database filters when fetching.
+
+        Args:
+            candidate_ids: Products to filter; None filters the whole catalog
+            min_price: Lowest effective_price, inclusive
+            max_price: Highest effective_price, inclusive
+
+        Returns:
+            Matching primary keys
+        """
+        rows = self._get_snapshot().stock_and_price
+        # Decimal(str()) so a float bound such as 29.99 compares like the SQL filter
+        low = None if min_price is None else Decimal(str(min_price))
+        high = None if max_price is None else Decimal(str(max_price))
+
+        matched = set()
+        for pk in (rows if candidate_ids is None else candidate_ids):
+            row = rows.get(pk)
+            if row is not None:
+                stock, price = row
+                if stock <= 0 or (low is not None and price < low) or (high is not None and price > high):
+                    continue
+            matched.add(pk)
+        return matched
+
+    def rank(self, terms: Iterable[str], candidate_ids: Optional[Set[int]] = None) -> Optional[List[int]]:
+        """
+        Order products by BM25 relevance to `terms` combined with stock and sales
+
+        Args:
+            terms: Query phrases (tokenized here)
+            candidate_ids: Products to order; None ranks the whole catalog
+
+        Returns:
+            Ordered primary keys, or None when ranking is unavailable (no NumPy)
+        """
+        ranker = self._get_snapshot().ranker
+        if ranker is None:
+            return None
+
+        words = [word for term in terms for word in tokenize(term)]
+        ordered = ranker.rank(words, candidate_ids)
+
+        if candidate_ids is not None and len(ordered) < len(candidate_ids):
+            # Ids newer than the snapshot (e.g. from the FTS table) go last
+            ranked = set(ordered)
+            ordered.extend(sorted(pk for pk in candidate_ids if pk not in ranked))
+        return ordered
+
+    def _expand(self, snapshot: IndexSnapshot, field_name: str, word: str) -> Set[int]:
+        """Collect ids for every token in a field that contains `word`"""
+        postings, expansions = snapshot.postings, snapshot.expansions
+        key = (field_name, word)
+        cached = expansions.get(key)
+        if cached is not None:
+            return cached
+
+        ids: Set[int] = set()
+        for token, token_ids in postings.get(field_name, {}).items():
+            if word in token:
+                ids |= token_ids
+
+        if len(expansions) >= MAX_CACHED_EXPANSIONS:
+            expansions.clear()
+        expansions[key] = ids
+        return ids
+
+    def _get_snapshot(self) -> IndexSnapshot:
+        """Return the current snapshot, rebuilding if missing or stale"""
+        with self._lock:
+            if self._snapshot is not None and not self._is_stale():
+                return self._snapshot
+
+            self._stamp = self._catalog_stamp()
+            self._snapshot = self._build()
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def _is_stale(self) -> bool:
+        """Check the catalog stamp at most once per refresh interval"""
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return False
+
+        self._checked_at = now
+        return self._catalog_stamp() != self._stamp
+
+    def _catalog_stamp(self):
+        """Cheap fingerprint of the product table used to detect external writes"""
+        stamp = Product.objects.aggregate(count=Count("pk"), latest=Max("updated_at"))
+        return stamp["count"], stamp["latest"]
+
+    def _build(self) -> IndexSnapshot:
+        """Build postings, vocabularies and the ranker from one pass over the catalog"""
+        postings: Dict[str, Dict[str, Set[int]]] = {name: {} for name in INDEXED_FIELDS}
+        field_tokens: Dict[str, List[List[str]]] = {name: [] for name in INDEXED_FIELDS}
+        pks, stock, sales = [], [], []
+        stock_and_price: Dict[int, Tuple[int, Decimal]] = {}
+        lookups = list(INDEXED_FIELDS.values())
+
+        rows = Product.objects.order_by("pk").values_list(
+            "pk", "stock_quantity", "total_salses", "effective_price", *lookups
+        )
+        for row in rows.iterator(chunk_size=2000):
+            pk = row[0]
+            pks.append(pk)
+            stock.append(row[1] or 0)
+            sales.append(row[2] or 0)
+            stock_and_price[pk] = (row[1] or 0, row[3])
+            for field_name, value in zip(INDEXED_FIELDS, row[4:]):
+                tokens = tokenize(value)
+                field_tokens[field_name].append(tokens)
+                field_postings = postings[field_name]
+                for token in set(tokens):
+                    field_postings.setdefault(token, set()).add(pk)
+
+        vocabularies = {
+            field_name: FuzzyVocabulary({token: len(ids) for token, ids in postings[field_name].items()})
+            for field_name in VOCABULARY_FIELDS
+        }
+        ranker = BM25Ranker(pks, field_tokens, stock, sales) if ranking_available() else None
+
+        return IndexSnapshot(postings, {}, vocabularies, ranker, stock_and_price)
+
+
+product_search_index = ProductSearchIndex()
@@ -15,6 +15,7 @@ class TextMessageSerializer(serializers.Serializer):
     """Serializer for text message input"""
     message = serializers.CharField(required=True, max_length=2000)
     session_id = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    stream = serializers.BooleanField(required=False, default=False, help_text="Reply as Server-Sent Events")
 
 
 class VoiceMessageSerializer(serializers.Serializer):
@@ -28,6 +29,17 @@ class VoiceMessageSerializer(serializers.Serializer):
     language = serializers.CharField(default='en', max_length=10)
 
 
+class VoiceStreamSerializer(serializers.Serializer):
+    """Serializer for raw audio body parameters (query string)"""
+    audio_format = serializers.ChoiceField(
+        choices=['wav', 'mp3', 'webm', 'm4a', 'ogg'],
+        required=False,
+        help_text="Defaults to the format implied by Content-Type"
+    )
+    session_id = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    language = serializers.CharField(default='en', max_length=10)
+
+
 class VoiceFileSerializer(serializers.Serializer):
     """Serializer for voice file upload (multipart/form-data)"""
     audio_file = serializers.FileField(required=True, help_text="Audio file from microphone")
@@ -0,0 +1,139 @@
+"""
+Session Cache - In-process LRU of recently used sessions, validated by version
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+from ai_app.config import AIConfig
+from ai_app.schemas import ChatSession
+from ai_app.session_codec import get_session_codec
+
+
+class _Entry(NamedTuple):
+    version: int
+    data: Any
+    size: int
+    message_count: int
+    history_truncated: bool
+    expires_at: float
+
+
+class LocalSessionCache:
+    """
+    Bounded LRU/TTL copy of sessions held by this worker process
+    
+    Entries are encoded with the session codec, so callers always get a
+    fresh object they can mutate. An entry is only used if its version
+    still matches the session's version counter in the shared cache
+    (SessionManager bumps it on every save), which keeps workers coherent.
+    Size is bounded by entry count and by encoded bytes.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[int] = None):
+        """Initialize cache (limits default to AIConfig)"""
+        self.max_entries = AIConfig.SESSION_LOCAL_CACHE_SIZE if max_entries is None else max_entries
+        self.max_bytes = AIConfig.SESSION_LOCAL_CACHE_BYTES if max_bytes is None else max_bytes
+        self.ttl = AIConfig.SESSION_LOCAL_CACHE_TTL if ttl is None else ttl
+        self.codec = get_session_codec()
+        
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._counts = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+    
+    def get(self, session_id: str, version: Optional[int],
+            history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """
+        Cached copy of a session if it is current and holds enough history
+        
+        Args:
+            session_id: Session ID
+            version: Current version from the shared cache (None = unknown)
+            history_limit: Messages needed after the system prompt (None = all)
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or version is None:
+                self._counts["misses"] += 1
+                return None
+            
+            if entry.version != version or entry.expires_at <= time.monotonic():
+                self._remove(session_id)
+                self._counts["stale"] += 1
+                return None
+            
+            if entry.history_truncated and (history_limit is None or entry.message_count - 1 < history_limit):
+                self._counts["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(session_id)
+            self._counts["hits"] += 1
+        
+        session = self.codec.decode_session(entry.data)
+        session.stored_message_count = len(session.messages)
+        session.history_truncated = entry.history_truncated
+        return session
+    
+    def put(self, session: ChatSession, version: int):
+        """Remember the session as it is stored under `version`"""
+        data = self.codec.encode_session(session)
+        entry = _Entry(
+            version=version,
+            data=data,
+            size=len(data),
+            message_count=len(session.messages),
+            history_truncated=session.history_truncated,
+            expires_at=time.monotonic() + self.ttl
+        )
+        if entry.size > self.max_bytes:
+            self.discard(session.session_id)
+            return
+        
+        with self._lock:
+            self._remove(session.session_id)
+            self._entries[session.session_id] = entry
+            self._bytes += entry.size
+            
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counts["evictions"] += 1
+    
+    def discard(self, session_id: str):
+        """Forget a session"""
+        with self._lock:
+            self._remove(session_id)
+    
+    def clear(self):
+        """Forget every session and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counts = dict.fromkeys(self._counts, 0)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and memory use of this process's cache"""
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = counts["hits"] + counts["misses"] + counts["stale"]
+            return {
+                **counts,
+                "hit_ratio": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+    
+    def _remove(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+local_session_cache = LocalSessionCache()
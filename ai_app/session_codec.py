@@ -0,0 +1,195 @@
+"""
+Session Codecs - Wire formats used by the session stores
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Union
+import msgpack
+from ai_app.config import AIConfig
+from ai_app.schemas import ChatSession, ConversationMessage, MessageRole
+
+
+ROLE_CODES = {
+    MessageRole.SYSTEM: 0,
+    MessageRole.USER: 1,
+    MessageRole.ASSISTANT: 2,
+    MessageRole.FUNCTION: 3,
+}
+ROLES_BY_CODE = {code: role for role, code in ROLE_CODES.items()}
+
+MSGPACK_FORMAT_VERSION = 1
+
+
+def system_prompt_version(prompt: str = None) -> str:
+    """Short stable reference for a system prompt text"""
+    prompt = AIConfig.SYSTEM_PROMPT if prompt is None else prompt
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def _to_epoch_ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def _from_epoch_ms(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1000)
+
+
+class JSONSessionCodec:
+    """Human-readable JSON with ISO timestamps and inline system prompt"""
+
+    def encode_message(self, message: ConversationMessage) -> str:
+        return json.dumps(self._message_dict(message))
+
+    def decode_message(self, data: Union[str, bytes]) -> ConversationMessage:
+        return self._message_from_dict(json.loads(data))
+
+    def encode_session(self, session: ChatSession) -> str:
+        data = {
+            "session_id": session.session_id,
+            "user_id": session.user_id,
+            "messages": [self._message_dict(msg) for msg in session.messages],
+            "context": session.context,
+            "created_at": session.created_at.isoformat(),
+            "last_activity": session.last_activity.isoformat()
+        }
+        return json.dumps(data)
+
+    def decode_session(self, session_data: Union[str, bytes]) -> ChatSession:
+        data = json.loads(session_data)
+
+        session = ChatSession(
+            session_id=data["session_id"],
+            user_id=data.get("user_id"),
+            context=data.get("context", {}),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            last_activity=datetime.fromisoformat(data["last_activity"])
+        )
+        session.messages = [self._message_from_dict(msg_data) for msg_data in data["messages"]]
+
+        return session
+
+    def _message_dict(self, message: ConversationMessage) -> Dict[str, Any]:
+        return {
+            "role": message.role.value,
+            "content": message.content,
+            "timestamp": message.timestamp.isoformat(),
+            "metadata": message.metadata
+        }
+
+    def _message_from_dict(self, data: Dict[str, Any]) -> ConversationMessage:
+        return ConversationMessage(
+            role=MessageRole(data["role"]),
+            content=data["content"],
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            metadata=data.get("metadata", {})
+        )
+
+
+class MsgpackSessionCodec:
+    """
+    Compact msgpack encoding
+
+    Messages are positional arrays with integer role codes and epoch
+    millisecond timestamps. The system prompt is stored as a version
+    reference; a session whose reference no longer matches the configured
+    prompt (e.g. after a prompt change is deployed) is given the current one.
+    """
+
+    def encode_message(self, message: ConversationMessage) -> bytes:
+        return msgpack.packb(self._message_array(message), use_bin_type=True)
+
+    def decode_message(self, data: bytes) -> ConversationMessage:
+        return self._message_from_array(msgpack.unpackb(data, raw=False))
+
+    def encode_session(self, session: ChatSession) -> bytes:
+        return msgpack.packb([
+            MSGPACK_FORMAT_VERSION,
+            session.session_id,
+            session.user_id,
+            session.context,
+            _to_epoch_ms(session.created_at),
+            _to_epoch_ms(session.last_activity),
+            [self._message_array(msg) for msg in session.messages],
+        ], use_bin_type=True)
+
+    def decode_session(self, session_data: bytes) -> ChatSession:
+        _, session_id, user_id, context, created_at, last_activity, messages = msgpack.unpackb(
+            session_data, raw=False
+        )
+
+        session = ChatSession(
+            session_id=session_id,
+            user_id=user_id,
+            context=context,
+            created_at=_from_epoch_ms(created_at),
+            last_activity=_from_epoch_ms(last_activity)
+        )
+        session.messages = [self._message_from_array(msg) for msg in messages]
+
+        return session
+
+    def _message_array(self, message: ConversationMessage) -> list:
+        content = message.content
+        if message.role == MessageRole.SYSTEM and content == AIConfig.SYSTEM_PROMPT:
+            # Real content is always a string, so a dict marks a prompt reference
+            content = {"prompt": system_prompt_version()}
+
+        return [ROLE_CODES[message.role], content, _to_epoch_ms(message.timestamp), message.metadata or None]
+
+    def _message_from_array(self, data: list) -> ConversationMessage:
+        role, content, timestamp, metadata = data
+        if isinstance(content, dict):
+            content = AIConfig.SYSTEM_PROMPT
+
+        return ConversationMessage(
+            role=ROLES_BY_CODE[role],
+            content=content,
+            timestamp=_from_epoch_ms(timestamp),
+            metadata=metadata or {}
+        )
+
+
+class AutoSessionCodec:
+    """
+    Encodes with the configured codec and decodes either format
+
+    Sessions written before a codec switch stay readable: JSON documents are
+    text, msgpack payloads are bytes.
+    """
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.json_codec = JSONSessionCodec()
+        self.msgpack_codec = MsgpackSessionCodec()
+
+    def encode_message(self, message: ConversationMessage):
+        return self.encoder.encode_message(message)
+
+    def decode_message(self, data):
+        return self._codec_for(data).decode_message(data)
+
+    def encode_session(self, session: ChatSession):
+        return self.encoder.encode_session(session)
+
+    def decode_session(self, data):
+        return self._codec_for(data).decode_session(data)
+
+    def _codec_for(self, data):
+        if isinstance(data, str):
+            return self.json_codec
+        # Redis hands back bytes for both formats; JSON always starts with "{"
+        if data[:1] == b"{":
+            return self.json_codec
+        return self.msgpack_codec
+
+
+SESSION_CODECS = {
+    "json": JSONSessionCodec,
+    "msgpack": MsgpackSessionCodec,
+}
+
+
+def get_session_codec(name: str = None) -> AutoSessionCodec:
+    """Codec for AIConfig.SESSION_CODEC (or `name`) that still reads the other format"""
+    return AutoSessionCodec(SESSION_CODECS[name or AIConfig.SESSION_CODEC]())
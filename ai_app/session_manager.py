@@ -1,109 +1,253 @@
 """
 Session Manager - Handles AI conversation sessions
 """
+import asyncio
+import time
 import uuid
-import json
 from typing import Optional, Dict
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
 from ai_app.schemas import ChatSession, MessageRole
 from ai_app.config import AIConfig
+from ai_app.session_store import SESSION_STORES, queue_version_bump, redis_client
+from ai_app.session_cache import local_session_cache
+
+
+# `error` of a turn rejected because another turn holds the session
+SESSION_BUSY = "session_busy"
+
+TURN_POLL_INTERVAL = 0.05
 
 
 class SessionManager:
     """
     Manages chat sessions using Django's cache framework
     Supports Redis, Memcached, or Django's database cache
+    
+    The storage layout is chosen by AIConfig.SESSION_STORE (see
+    ai_app.session_store).
+    
+    Chat turns hold a per-session lock in the cache (acquire_turn /
+    release_turn) from loading the session until the reply is saved, so
+    concurrent turns cannot overwrite each other's history.
+    
+    Reads are served from a per-process LRU (ai_app.session_cache) when the
+    session's version counter in the cache still matches, which costs one
+    small GET instead of loading and decoding the whole session. Every save
+    bumps the counter and renews its expiry in the same round trip as the
+    write itself.
     """
     
     def __init__(self):
         """Initialize session manager"""
         self.cache_prefix = "ai_session:"
         self.timeout = AIConfig.SESSION_TIMEOUT_MINUTES * 60
+        self.store = SESSION_STORES[AIConfig.SESSION_STORE](self.cache_prefix, self.timeout)
     
     def create_session(self, user_id: Optional[str] = None) -> ChatSession:
         """Create a new chat session"""
-        session_id = str(uuid.uuid4())
-        session = ChatSession(
-            session_id=session_id,
-            user_id=user_id
-        )
-        
-        session.add_message(
-            role=MessageRole.SYSTEM,
-            content=AIConfig.SYSTEM_PROMPT
-        )
-        
-        self._save_session(session)
+        session = self._new_session(user_id)
+        self._save(session)
         return session
     
-    def get_session(self, session_id: str) -> Optional[ChatSession]:
-        """Retrieve a session by ID"""
-        cache_key = f"{self.cache_prefix}{session_id}"
-        session_data = cache.get(cache_key)
+    def get_session(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """
+        Retrieve a session by ID
         
-        if not session_data:
-            return None
+        Args:
+            session_id: Session ID
+            history_limit: Stores that support it load only the system prompt
+                and the last `history_limit` messages
+        """
+        if not local_session_cache.enabled:
+            return self.store.load(session_id, history_limit)
+        
+        # Read (or seed) the version first: a save racing with the load below
+        # can only make the cached copy look older than it is, never newer
+        key = self._version_key(session_id)
+        version = cache.get(key)
+        session = local_session_cache.get(session_id, version, history_limit)
+        if session:
+            return session
         
-        return self._deserialize_session(session_data)
+        if version is None:
+            version = self._bump_version(session_id)
+        
+        session = self.store.load(session_id, history_limit)
+        # A save that landed during the load has moved the version on
+        if session and cache.get(key) == version:
+            self._remember(session, version)
+        return session
     
     def update_session(self, session: ChatSession):
         """Update an existing session"""
         session.last_activity = datetime.now()
-        self._save_session(session)
+        self._save(session)
     
     def delete_session(self, session_id: str):
         """Delete a session"""
-        cache_key = f"{self.cache_prefix}{session_id}"
-        cache.delete(cache_key)
-    
-    def _save_session(self, session: ChatSession):
-        """Save session to cache"""
-        cache_key = f"{self.cache_prefix}{session.session_id}"
-        session_data = self._serialize_session(session)
-        cache.set(cache_key, session_data, timeout=self.timeout)
-    
-    def _serialize_session(self, session: ChatSession) -> str:
-        """Convert session to JSON string"""
-        data = {
-            "session_id": session.session_id,
-            "user_id": session.user_id,
-            "messages": [
-                {
-                    "role": msg.role.value,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat(),
-                    "metadata": msg.metadata
-                }
-                for msg in session.messages
-            ],
-            "context": session.context,
-            "created_at": session.created_at.isoformat(),
-            "last_activity": session.last_activity.isoformat()
-        }
-        return json.dumps(data)
-    
-    def _deserialize_session(self, session_data: str) -> ChatSession:
-        """Reconstruct session from JSON string"""
-        from ai_app.schemas import ConversationMessage
-        
-        data = json.loads(session_data)
+        self.store.delete(session_id)
+        cache.delete(self._version_key(session_id))
+        local_session_cache.discard(session_id)
+    
+    async def acreate_session(self, user_id: Optional[str] = None) -> ChatSession:
+        """Create a new chat session (async)"""
+        session = self._new_session(user_id)
+        await self._asave(session)
+        return session
+    
+    async def aget_session(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """Retrieve a session by ID (async)"""
+        if not local_session_cache.enabled:
+            return await self.store.aload(session_id, history_limit)
+        
+        key = self._version_key(session_id)
+        version = await cache.aget(key)
+        session = local_session_cache.get(session_id, version, history_limit)
+        if session:
+            return session
+        
+        if version is None:
+            version = await self._abump_version(session_id)
+        
+        session = await self.store.aload(session_id, history_limit)
+        if session and await cache.aget(key) == version:
+            self._remember(session, version)
+        return session
+    
+    async def aupdate_session(self, session: ChatSession):
+        """Update an existing session (async)"""
+        session.last_activity = datetime.now()
+        await self._asave(session)
+    
+    async def adelete_session(self, session_id: str):
+        """Delete a session (async)"""
+        await self.store.adelete(session_id)
+        await cache.adelete(self._version_key(session_id))
+        local_session_cache.discard(session_id)
+    
+    def acquire_turn(self, session_id: str, wait: Optional[float] = None) -> Optional[str]:
+        """
+        Take the session's turn lock, waiting up to `wait` seconds for a running turn
         
+        Args:
+            session_id: Session ID
+            wait: Seconds to wait (defaults to AIConfig.SESSION_TURN_WAIT)
+        
+        Returns:
+            Token to pass to release_turn(), or None if the session stayed busy
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (AIConfig.SESSION_TURN_WAIT if wait is None else wait)
+        
+        while not cache.add(self._turn_key(session_id), token, timeout=AIConfig.SESSION_TURN_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(TURN_POLL_INTERVAL)
+        
+        return token
+    
+    def release_turn(self, session_id: str, token: str):
+        """Release the turn lock if `token` still holds it"""
+        key = self._turn_key(session_id)
+        # A lock that expired and was taken by another turn is left alone
+        if cache.get(key) == token:
+            cache.delete(key)
+    
+    async def aacquire_turn(self, session_id: str, wait: Optional[float] = None) -> Optional[str]:
+        """Take the session's turn lock (async)"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (AIConfig.SESSION_TURN_WAIT if wait is None else wait)
+        
+        while not await cache.aadd(self._turn_key(session_id), token, timeout=AIConfig.SESSION_TURN_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(TURN_POLL_INTERVAL)
+        
+        return token
+    
+    async def arelease_turn(self, session_id: str, token: str):
+        """Release the turn lock if `token` still holds it (async)"""
+        key = self._turn_key(session_id)
+        if await cache.aget(key) == token:
+            await cache.adelete(key)
+    
+    def _turn_key(self, session_id: str) -> str:
+        return f"{self.cache_prefix}{session_id}:turn"
+    
+    def _version_key(self, session_id: str) -> str:
+        return f"{self.cache_prefix}{session_id}:version"
+    
+    def _save(self, session: ChatSession):
+        """Write the session and move its version on, in one round trip on Redis"""
+        if not local_session_cache.enabled:
+            self.store.save(session)
+            return
+        
+        version = self.store.save(session, self._version_key(session.session_id))
+        if version is None:
+            # Backend without pipelines
+            version = self._bump_version(session.session_id)
+        self._remember(session, version)
+    
+    async def _asave(self, session: ChatSession):
+        if not local_session_cache.enabled:
+            await self.store.asave(session)
+            return
+        
+        version = await self.store.asave(session, self._version_key(session.session_id))
+        if version is None:
+            version = await self._abump_version(session.session_id)
+        self._remember(session, version)
+    
+    def _bump_version(self, session_id: str) -> Optional[int]:
+        """Move the session to a new version, invalidating other workers' copies"""
+        if not local_session_cache.enabled:
+            return None
+        
+        key = self._version_key(session_id)
+        client = redis_client()
+        if client is not None:
+            with client.pipeline() as pipe:
+                queue_version_bump(pipe, key, self.timeout * 2)
+                return pipe.execute()[-2]
+        
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Missing or expired; seed from the clock so old versions are never reused
+            cache.add(key, time.time_ns() // 1000, timeout=self.timeout * 2)
+            return cache.incr(key)
+    
+    async def _abump_version(self, session_id: str) -> Optional[int]:
+        if not local_session_cache.enabled:
+            return None
+        
+        if redis_client() is not None:
+            return await sync_to_async(self._bump_version, thread_sensitive=False)(session_id)
+        
+        key = self._version_key(session_id)
+        try:
+            return await cache.aincr(key)
+        except ValueError:
+            await cache.aadd(key, time.time_ns() // 1000, timeout=self.timeout * 2)
+            return await cache.aincr(key)
+    
+    def _remember(self, session: ChatSession, version: Optional[int]):
+        if version is not None:
+            local_session_cache.put(session, version)
+    
+    def _new_session(self, user_id: Optional[str]) -> ChatSession:
+        """Build a session seeded with the system prompt"""
         session = ChatSession(
-            session_id=data["session_id"],
-            user_id=data.get("user_id"),
-            context=data.get("context", {}),
-            created_at=datetime.fromisoformat(data["created_at"]),
-            last_activity=datetime.fromisoformat(data["last_activity"])
+            session_id=str(uuid.uuid4()),
+            user_id=user_id
         )
         
-        for msg_data in data["messages"]:
-            message = ConversationMessage(
-                role=MessageRole(msg_data["role"]),
-                content=msg_data["content"],
-                timestamp=datetime.fromisoformat(msg_data["timestamp"]),
-                metadata=msg_data.get("metadata", {})
-            )
-            session.messages.append(message)
+        session.add_message(
+            role=MessageRole.SYSTEM,
+            content=AIConfig.SYSTEM_PROMPT
+        )
         
         return session
@@ -0,0 +1,235 @@
+"""
+Session Stores - Storage backends used by SessionManager
+"""
+import json
+import time
+from datetime import datetime
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from ai_app.schemas import ChatSession
+from ai_app.session_codec import get_session_codec
+
+
+def redis_client():
+    """Client of Django's RedisCache backend (sharing its pool), or None for other backends"""
+    if not isinstance(caches["default"], RedisCache):
+        return None
+    return cache._cache.get_client(write=True)
+
+
+def queue_version_bump(pipe, version_key: str, timeout: int):
+    """
+    Queue the commands that move a session version counter on
+
+    The new version is the second-to-last result of the pipeline. A missing
+    or expired counter restarts from the clock, so old versions are never
+    reused, and every bump renews the expiry within the same round trip.
+    """
+    key = cache.make_key(version_key)
+    pipe.set(key, time.time_ns() // 1000, nx=True, ex=timeout)
+    pipe.incr(key)
+    pipe.expire(key, timeout)
+
+
+class CacheSessionStore:
+    """
+    Stores each session as one document in the Django cache, encoded with
+    the configured session codec (ai_app.session_codec)
+
+    Works with any cache backend. Every save rewrites the whole session.
+    """
+
+    def __init__(self, cache_prefix: str, timeout: int):
+        """Initialize store"""
+        self.cache_prefix = cache_prefix
+        self.timeout = timeout
+        self.codec = get_session_codec()
+
+    def load(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """Load a session; this store always returns the full history"""
+        session_data = cache.get(f"{self.cache_prefix}{session_id}")
+
+        if not session_data:
+            return None
+
+        return self.deserialize(session_data)
+
+    def save(self, session: ChatSession, version_key: Optional[str] = None) -> Optional[int]:
+        """
+        Write the whole session
+
+        With `version_key` on Redis, the session's version counter is moved
+        on in the same round trip and its new value returned; otherwise None.
+        """
+        key = f"{self.cache_prefix}{session.session_id}"
+        client = redis_client() if version_key else None
+        version = None
+
+        if client is None:
+            cache.set(key, self.serialize(session), timeout=self.timeout)
+        else:
+            with client.pipeline() as pipe:
+                pipe.set(cache.make_key(key), cache._cache._serializer.dumps(self.serialize(session)), ex=self.timeout)
+                queue_version_bump(pipe, version_key, self.timeout * 2)
+                version = pipe.execute()[-2]
+
+        session.stored_message_count = len(session.messages)
+        return version
+
+    def delete(self, session_id: str):
+        """Delete a session"""
+        cache.delete(f"{self.cache_prefix}{session_id}")
+
+    async def aload(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """Load a session (async)"""
+        session_data = await cache.aget(f"{self.cache_prefix}{session_id}")
+
+        if not session_data:
+            return None
+
+        return self.deserialize(session_data)
+
+    async def asave(self, session: ChatSession, version_key: Optional[str] = None) -> Optional[int]:
+        """Write the whole session (async)"""
+        if version_key and redis_client() is not None:
+            return await sync_to_async(self.save, thread_sensitive=False)(session, version_key)
+
+        await cache.aset(f"{self.cache_prefix}{session.session_id}", self.serialize(session), timeout=self.timeout)
+        session.stored_message_count = len(session.messages)
+        return None
+
+    async def adelete(self, session_id: str):
+        """Delete a session (async)"""
+        await cache.adelete(f"{self.cache_prefix}{session_id}")
+
+    def serialize(self, session: ChatSession):
+        """Encode session with the configured codec"""
+        return self.codec.encode_session(session)
+
+    def deserialize(self, session_data) -> ChatSession:
+        """Decode a session written by either codec"""
+        session = self.codec.decode_session(session_data)
+        session.stored_message_count = len(session.messages)
+        return session
+
+
+class RedisListSessionStore:
+    """
+    Stores session metadata in a Redis hash and messages in a Redis list
+
+    A save appends only the messages added since the session was loaded and
+    rewrites the small metadata hash; a load reads the system prompt plus the
+    last `history_limit` messages. Per-turn I/O therefore stays constant as
+    conversations grow. Requires Django's RedisCache backend.
+    """
+
+    def __init__(self, cache_prefix: str, timeout: int):
+        """Initialize store"""
+        self.cache_prefix = cache_prefix
+        self.timeout = timeout
+        self.codec = get_session_codec()
+
+    def load(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """
+        Load session metadata and (part of) its history
+
+        Args:
+            session_id: Session ID
+            history_limit: Load only the first message (system prompt) and
+                the last `history_limit` messages; None loads everything
+        """
+        meta_key, messages_key = self._keys(session_id)
+        client = self._client()
+
+        meta = client.hgetall(meta_key)
+        if not meta:
+            return None
+
+        if history_limit:
+            with client.pipeline() as pipe:
+                pipe.llen(messages_key)
+                pipe.lindex(messages_key, 0)
+                pipe.lrange(messages_key, -history_limit, -1)
+                total, first, tail = pipe.execute()
+
+            raw_messages = tail if total <= history_limit else [first] + tail
+        else:
+            raw_messages = client.lrange(messages_key, 0, -1)
+
+        meta = {key.decode(): value.decode() for key, value in meta.items()}
+        session = ChatSession(
+            session_id=meta["session_id"],
+            user_id=meta.get("user_id") or None,
+            context=json.loads(meta.get("context", "{}")),
+            created_at=datetime.fromisoformat(meta["created_at"]),
+            last_activity=datetime.fromisoformat(meta["last_activity"])
+        )
+        session.messages = [self.codec.decode_message(raw) for raw in raw_messages if raw]
+        session.stored_message_count = len(session.messages)
+        session.history_truncated = bool(history_limit) and total > history_limit
+
+        return session
+
+    def save(self, session: ChatSession, version_key: Optional[str] = None) -> Optional[int]:
+        """
+        Append new messages and refresh metadata and expiry
+
+        With `version_key`, the session's version counter is moved on in the
+        same pipeline and its new value returned; otherwise None.
+        """
+        meta_key, messages_key = self._keys(session.session_id)
+        version = None
+        new_messages = session.messages[session.stored_message_count:]
+
+        with self._client().pipeline() as pipe:
+            pipe.hset(meta_key, mapping={
+                "session_id": session.session_id,
+                "user_id": session.user_id or "",
+                "context": json.dumps(session.context),
+                "created_at": session.created_at.isoformat(),
+                "last_activity": session.last_activity.isoformat()
+            })
+            if new_messages:
+                pipe.rpush(messages_key, *[self.codec.encode_message(msg) for msg in new_messages])
+            pipe.expire(meta_key, self.timeout)
+            pipe.expire(messages_key, self.timeout)
+            if version_key:
+                queue_version_bump(pipe, version_key, self.timeout * 2)
+                version = pipe.execute()[-2]
+            else:
+                pipe.execute()
+
+        session.stored_message_count = len(session.messages)
+        return version
+
+    def delete(self, session_id: str):
+        """Delete a session"""
+        self._client().delete(*self._keys(session_id))
+
+    async def aload(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        """Load a session (async)"""
+        return await sync_to_async(self.load, thread_sensitive=False)(session_id, history_limit)
+
+    async def asave(self, session: ChatSession, version_key: Optional[str] = None) -> Optional[int]:
+        """Append new messages (async)"""
+        return await sync_to_async(self.save, thread_sensitive=False)(session, version_key)
+
+    async def adelete(self, session_id: str):
+        """Delete a session (async)"""
+        await sync_to_async(self.delete, thread_sensitive=False)(session_id)
+
+    def _keys(self, session_id: str):
+        base = cache.make_key(f"{self.cache_prefix}{session_id}")
+        return f"{base}:meta", f"{base}:messages"
+
+    def _client(self):
+        # Reuse the connection pool of Django's RedisCache backend
+        return cache._cache.get_client(write=True)
+
+
+SESSION_STORES = {
+    "cache": CacheSessionStore,
+    "redis_list": RedisListSessionStore,
+}
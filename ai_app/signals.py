@@ -0,0 +1,26 @@
+"""
+Signal handlers keeping AI-side catalog caches in sync with product writes
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dashboard.models import Product, Category
+from ai_app.search_index import product_search_index
+from ai_app.tool_cache import bump_catalog_version
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_product_search_index(sender, **kwargs):
+    """Rebuild the product search index on the next search"""
+    product_search_index.invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_tool_cache(sender, **kwargs):
+    """Orphan cached tool results computed from the old catalog"""
+    bump_catalog_version()
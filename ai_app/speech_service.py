@@ -3,17 +3,103 @@ Speech Service - Handles audio transcription using OpenAI Whisper
 """
 import base64
 import io
-from typing import Optional
-from openai import OpenAI
+import os
+import tempfile
+from typing import Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ai_app.audio_preprocess import preprocess_wav
+from ai_app.clients import get_openai_client, get_async_openai_client
 from ai_app.config import AIConfig
+from ai_app.transcription_cache import transcription_cache, transcription_key
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class AudioTooLarge(ValueError):
+    """Raw audio body exceeds AIConfig.VOICE_MAX_UPLOAD_BYTES"""
+
+
+def spool_audio(stream, max_bytes: Optional[int] = None):
+    """
+    Copy a raw audio stream (e.g. a request body) into a spooled temporary file
+    
+    Reads in STREAM_CHUNK_SIZE chunks, so memory stays bounded by
+    FILE_UPLOAD_MAX_MEMORY_SIZE; larger clips spill to disk.
+    
+    Raises:
+        AudioTooLarge: More than `max_bytes` were sent
+        ValueError: The stream was empty
+    """
+    max_bytes = AIConfig.VOICE_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    
+    try:
+        while stream is not None:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise AudioTooLarge(f"Audio exceeds {max_bytes} bytes")
+            spooled.write(chunk)
+        
+        if not size:
+            raise ValueError("Empty audio body")
+    except Exception:
+        spooled.close()
+        raise
+    
+    spooled.seek(0)
+    return spooled
+
+
+def prepare_upload(name: str, audio_file) -> Tuple[str, object]:
+    """
+    (filename, content) for the OpenAI client
+    
+    WAV clips are replaced by their preprocessed bytes (mono, 16 kHz,
+    silence trimmed; see audio_preprocess), which are decoded block by
+    block from the file. Other formats, and WAV clips that need no change,
+    are passed as the file object, which httpx streams in chunks.
+    
+    Raises:
+        AudioTooLong: The WAV clip exceeds AUDIO_MAX_DURATION_SECONDS
+    """
+    audio_file.seek(0)
+    if AIConfig.AUDIO_PREPROCESS_ENABLED and name.lower().endswith(".wav"):
+        processed = preprocess_wav(audio_file)
+        audio_file.seek(0)
+        if processed is not None:
+            return name, processed
+    return name, audio_file
+
+
+def upload_file(audio_file, default_name: str = "audio.wav") -> Tuple[str, object]:
+    """
+    (filename, file object) of a Django upload, without reading the content
+    
+    Uploads are used as their underlying BytesIO or temporary file;
+    Whisper needs the extension in the name.
+    """
+    name = os.path.basename(getattr(audio_file, "name", None) or default_name)
+    return name, getattr(audio_file, "file", audio_file)
 
 
 class SpeechService:
-    """Handles speech-to-text conversion using OpenAI Whisper"""
+    """
+    Handles speech-to-text conversion using OpenAI Whisper
+    
+    Transcripts go through transcription_cache, so a resent clip (same
+    bytes, language and model) is not transcribed again within
+    TRANSCRIPTION_CACHE_TTL.
+    """
     
     def __init__(self):
         """Initialize speech service"""
-        self.client = OpenAI(api_key=AIConfig.OPENAI_API_KEY)
+        self.client = get_openai_client()
         self.model = AIConfig.WHISPER_MODEL
     
     def transcribe_audio(self, audio_data: bytes, audio_format: str = "wav", language: str = "en") -> str:
@@ -24,20 +110,12 @@ class SpeechService:
             audio_data: Raw audio bytes
             audio_format: Audio format (wav, mp3, webm, m4a)
             language: Language code (default: en)
-            
+        
         Returns:
             Transcribed text
         """
-        audio_file = io.BytesIO(audio_data)
-        audio_file.name = f"audio.{audio_format}"
-        
-        transcript = self.client.audio.transcriptions.create(
-            model=self.model,
-            file=audio_file,
-            language=language
-        )
-        
-        return transcript.text
+        # BytesIO shares the bytes object's buffer until written to
+        return self._transcribe(f"audio.{audio_format}", io.BytesIO(audio_data), language)
     
     def transcribe_base64_audio(self, base64_audio: str, audio_format: str = "wav", language: str = "en") -> str:
         """
@@ -47,7 +125,7 @@ class SpeechService:
             base64_audio: Base64 encoded audio string
             audio_format: Audio format
             language: Language code
-            
+        
         Returns:
             Transcribed text
         """
@@ -58,22 +136,90 @@ class SpeechService:
         """
         Transcribe audio file directly (for file uploads)
         
+        Non-WAV uploads are streamed to OpenAI from Django's in-memory buffer
+        or temporary file without being copied; WAV uploads are preprocessed.
+        
         Args:
             audio_file: Django UploadedFile object from request.FILES
             language: Language code (default: en)
-            
+        
+        Returns:
+            Transcribed text
+        """
+        name, content = upload_file(audio_file)
+        return self._transcribe(name, content, language)
+    
+    def transcribe_stream(self, stream, audio_format: str = "wav", language: str = "en") -> str:
+        """
+        Transcribe a raw (not base64) audio request body
+        
+        Args:
+            stream: File-like body, read in chunks
+            audio_format: Audio format (wav, mp3, webm, m4a, ogg)
+            language: Language code
+        
         Returns:
             Transcribed text
         """
-        # Read the file content and wrap it in BytesIO for OpenAI API
-        audio_bytes = audio_file.read()
-        audio_buffer = io.BytesIO(audio_bytes)
-        audio_buffer.name = audio_file.name
+        with spool_audio(stream) as audio_file:
+            return self._transcribe(f"audio.{audio_format}", audio_file, language)
+    
+    def _transcribe(self, name: str, audio_file, language: str) -> str:
+        """Transcript of a seekable audio file, from the cache or Whisper"""
+        def call():
+            transcript = self.client.audio.transcriptions.create(
+                model=self.model,
+                file=prepare_upload(name, audio_file),
+                language=language
+            )
+            return {"text": transcript.text}
         
-        transcript = self.client.audio.transcriptions.create(
-            model=self.model,
-            file=audio_buffer,
-            language=language
-        )
+        key = transcription_key(audio_file, language, self.model)
+        if key is None:
+            return call()["text"]
+        return transcription_cache.run(key, call)["text"]
+
+
+class AsyncSpeechService(SpeechService):
+    """asyncio counterpart of SpeechService (construct inside a coroutine)"""
+    
+    def __init__(self):
+        """Initialize async speech service"""
+        self.client = get_async_openai_client()
+        self.model = AIConfig.WHISPER_MODEL
+    
+    async def transcribe_audio(self, audio_data: bytes, audio_format: str = "wav", language: str = "en") -> str:
+        """Transcribe audio to text"""
+        return await self._transcribe(f"audio.{audio_format}", io.BytesIO(audio_data), language)
+    
+    async def transcribe_base64_audio(self, base64_audio: str, audio_format: str = "wav", language: str = "en") -> str:
+        """Transcribe base64 encoded audio"""
+        audio_bytes = base64.b64decode(base64_audio)
+        return await self.transcribe_audio(audio_bytes, audio_format, language)
+    
+    async def transcribe_file(self, audio_file, language: str = "en") -> str:
+        """Transcribe audio file directly (for file uploads)"""
+        name, content = upload_file(audio_file)
+        return await self._transcribe(name, content, language)
+    
+    async def transcribe_stream(self, stream, audio_format: str = "wav", language: str = "en") -> str:
+        """Transcribe a raw (not base64) audio request body"""
+        audio_file = await sync_to_async(spool_audio, thread_sensitive=False)(stream)
+        with audio_file:
+            return await self._transcribe(f"audio.{audio_format}", audio_file, language)
+    
+    async def _transcribe(self, name: str, audio_file, language: str) -> str:
+        """Transcript of a seekable audio file; hashing and WAV preprocessing run in worker threads"""
+        async def call():
+            upload = await sync_to_async(prepare_upload, thread_sensitive=False)(name, audio_file)
+            transcript = await self.client.audio.transcriptions.create(
+                model=self.model,
+                file=upload,
+                language=language
+            )
+            return {"text": transcript.text}
         
-        return transcript.text
+        key = await sync_to_async(transcription_key, thread_sensitive=False)(audio_file, language, self.model)
+        if key is None:
+            return (await call())["text"]
+        return (await transcription_cache.arun(key, call))["text"]
@@ -1,10 +1,50 @@
 """
 Simple tests for AI functionality
 """
-from django.test import TestCase
+import io
+import json
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase
 from ai_app.api import FloorBotAPI
+from ai_app.chatbot import FloorBotAI, AsyncFloorBotAI
+from ai_app import audio_preprocess, clients
+from ai_app.context_builder import ContextBuilder, SUMMARY_CONTEXT_KEY
 from ai_app.session_manager import SessionManager
+from ai_app.session_store import RedisListSessionStore
+from ai_app.session_codec import JSONSessionCodec, MsgpackSessionCodec, get_session_codec
+from ai_app.config import AIConfig
+from ai_app.schemas import ChatSession, MessageRole
 from ai_app.product_service import DjangoProductService
+from ai_app.order_calculator import OrderCalculator
+from ai_app.intent_router import IntentRouter, router_stats
+from ai_app.tool_payload import compact_product, projection_stats
+from ai_app.vocabulary import FuzzyVocabulary, bounded_edit_distance
+
+
+# Required Product fields the tests do not care about
+PRODUCT_DEFAULTS = {
+    "brand_manufacturer": "Acme",
+    "primary_image": "products/placeholder.png",
+    "pack_coverage": "1",
+    "length": "1", "width": "1", "thickness": "1", "weight": "1",
+    "installation_method": "glue",
+    "coverage_per_pack": "2.5 m2 per box",
+    "regular_price": 30,
+    "stock_quantity": 10,
+}
+
+
+def make_product(**overrides):
+    """Create a Product from PRODUCT_DEFAULTS plus the given fields"""
+    from dashboard.models import Product
+    
+    return Product.objects.create(**dict(PRODUCT_DEFAULTS, **overrides))
 
 
 class AISessionTestCase(TestCase):
@@ -50,3 +90,1477 @@ class ProductServiceTestCase(TestCase):
         """Test getting all products"""
         products = self.product_service.get_all_products(limit=10)
         self.assertIsInstance(products, list)
+
+
+class ProductSearchIndexTestCase(TestCase):
+    """Test in-memory product search index"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from dashboard.models import Category
+        
+        carpets = Category.objects.create(title="Carpets", image="categoris/carpets.png")
+        laminate = Category.objects.create(title="Laminate", image="categoris/laminate.png")
+        
+        self.grey_carpet = make_product(
+            product_title="Soft Twist Carpet", product_id="C-1", main_category=carpets,
+            available_colors="Grey, Silver", materials="Wool", pattern_type="Modern"
+        )
+        self.beige_carpet = make_product(
+            product_title="Berber Carpet", product_id="C-2", main_category=carpets,
+            available_colors="Beige", materials="Nylon"
+        )
+        self.oak_laminate = make_product(
+            product_title="Natural Oak Laminate", product_id="L-1", main_category=laminate,
+            available_colors="Oak", materials="HDF"
+        )
+        self.product_service = DjangoProductService()
+    
+    def test_filters_intersect(self):
+        """Test category and color filters are combined"""
+        products = self.product_service.search_products(product_type="carpet", color="gray")
+        self.assertEqual([p.pk for p in products], [self.grey_carpet.pk])
+    
+    def test_substring_match(self):
+        """Test partial words still match like icontains"""
+        products = self.product_service.search_products(keyword="lamin")
+        self.assertEqual([p.pk for p in products], [self.oak_laminate.pk])
+    
+    def test_misspelt_terms_resolve_to_catalog_terms(self):
+        """Test typos map to known or catalog spellings instead of matching nothing"""
+        products = self.product_service.search_products(product_type="carpat", color="gery")
+        self.assertEqual([p.pk for p in products], [self.grey_carpet.pk])
+        
+        self.assertEqual(self.product_service._normalize_product_type("vynil"), "vinyl")
+        self.assertEqual(self.product_service._get_color_variations("silvr"), ["silver"])
+        
+        products = self.product_service.search_products(material="nyloon")
+        self.assertEqual([p.pk for p in products], [self.beige_carpet.pk])
+    
+    def test_misspelt_catalog_category(self):
+        """Test a product type corrected to a catalog category title is searched under that title"""
+        from dashboard.models import Category
+        
+        tiles = Category.objects.create(title="Tiles", image="categoris/tiles.png")
+        tile = make_product(product_title="Metro Wall", product_id="T-1", main_category=tiles)
+        
+        self.assertEqual(self.product_service._normalize_product_type("tilles"), "tiles")
+        products = self.product_service.search_products(product_type="tilles")
+        self.assertEqual([p.pk for p in products], [tile.pk])
+    
+    def test_results_ranked_by_relevance_and_sales(self):
+        """Test stronger text matches and best sellers come first"""
+        products = self.product_service.search_products(keyword="oak")
+        self.assertEqual(products[0].pk, self.oak_laminate.pk)
+        
+        self.beige_carpet.total_salses = 500
+        self.beige_carpet.save()
+        products = self.product_service.search_products(product_type="carpets")
+        self.assertEqual([p.pk for p in products], [self.beige_carpet.pk, self.grey_carpet.pk])
+        
+        products = self.product_service.search_products(max_price=100)
+        self.assertEqual(products[0].pk, self.beige_carpet.pk)
+    
+    def test_ranker_expansions_are_bounded(self):
+        """Test the ranker's substring expansion memo is reset when full"""
+        from ai_app.ranker import FieldMatrix
+        
+        matrix = FieldMatrix([["oak", "laminate"], ["berber", "carpet"]])
+        with patch("ai_app.ranker.MAX_CACHED_EXPANSIONS", 2):
+            for word in ("lam", "carp", "ber", "oa"):
+                matrix.term_ids(word)
+        
+        self.assertLessEqual(len(matrix._expansions), 2)
+        self.assertEqual(matrix.term_ids("oa"), [matrix.term_index["oak"]])
+    
+    def test_index_refreshes_on_save(self):
+        """Test product writes are visible to the next search"""
+        self.beige_carpet.available_colors = "Grey"
+        self.beige_carpet.save()
+        products = self.product_service.search_products(product_type="carpets", color="grey")
+        self.assertEqual({p.pk for p in products}, {self.grey_carpet.pk, self.beige_carpet.pk})
+    
+    def test_product_type_matches_synonyms_and_stored_type(self):
+        """Test product types match synonyms in descriptions as well as the stored type"""
+        from dashboard.models import Category
+        
+        floors = Category.objects.create(title="Floors", image="categoris/floors.png")
+        engineered = make_product(
+            product_title="Rustic Plank", product_id="W-1", main_category=floors,
+            item_description="Engineered wood with an oak veneer"
+        )
+        self.assertEqual(engineered.search_category, "flooring")
+        
+        products = self.product_service.search_products(product_type="wood flooring")
+        self.assertIn(engineered.pk, {p.pk for p in products})
+        
+        # The stored type is read from the in-memory index, not the database
+        self.product_service.search_products(product_type="carpets")
+        with self.assertNumQueries(1):
+            products = self.product_service.search_products(product_type="carpets")
+        self.assertEqual({p.pk for p in products}, {self.grey_carpet.pk, self.beige_carpet.pk})
+    
+    def test_price_filter_uses_index_snapshot(self):
+        """Test price-only searches filter the index snapshot, then pick up newer products with the stamp"""
+        from dashboard.models import Product
+        from ai_app.search_index import product_search_index
+        
+        make_product(product_title="Luxury Saxony", product_id="C-4", regular_price=45.5)
+        self.product_service.search_products(max_price=100)
+        
+        # One query: the fetch; no catalog-wide primary key scan
+        with self.assertNumQueries(1):
+            products = self.product_service.search_products(min_price=40)
+        self.assertEqual([p.product_id for p in products], ["C-4"])
+        self.assertEqual(len(self.product_service.search_products(max_price=45.5)), 4)
+        
+        budget = Product(**dict(PRODUCT_DEFAULTS, product_title="Budget Twist", product_id="C-3", regular_price=12))
+        budget.refresh_search_attributes()
+        Product.objects.bulk_create([budget])
+        
+        with patch.object(product_search_index, "refresh_interval", 0):
+            products = self.product_service.search_products(max_price=20)
+        self.assertEqual([p.product_id for p in products], ["C-3"])
+    
+    def test_out_of_stock_excluded(self):
+        """Test stock filter still applies to index matches"""
+        self.grey_carpet.stock_quantity = 0
+        self.grey_carpet.save()
+        products = self.product_service.search_products(material="wool")
+        self.assertEqual(products, [])
+
+
+class StreamingChatTestCase(TestCase):
+    """Test streamed chat turns with a scripted OpenAI client"""
+    
+    def _chunk(self, content=None, tool_calls=None):
+        delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+    
+    def _tool_delta(self, index, id=None, name=None, arguments=None):
+        return SimpleNamespace(
+            index=index,
+            id=id,
+            function=SimpleNamespace(name=name, arguments=arguments)
+        )
+    
+    def test_tool_call_deltas_are_accumulated(self):
+        """Test split tool-call arguments are joined before execution"""
+        first = [
+            self._chunk(tool_calls=[self._tool_delta(0, id="call_1", name="search_products", arguments='{"product_')]),
+            self._chunk(tool_calls=[self._tool_delta(0, arguments='type": "carpets"}')]),
+        ]
+        second = [self._chunk("Here are "), self._chunk("some carpets.")]
+        
+        with patch("ai_app.chatbot.get_openai_client"):
+            chatbot = FloorBotAI()
+        chatbot.client.chat.completions.create.side_effect = [iter(first), iter(second)]
+        session = chatbot.session_manager.create_session()
+        
+        with patch.object(chatbot, "_execute_function", return_value={"products": [{"id": 1}], "count": 1}) as execute:
+            events = list(chatbot.chat_stream(session.session_id, "I need carpets"))
+        
+        execute.assert_called_once_with("search_products", {"product_type": "carpets"})
+        self.assertEqual([e["event"] for e in events], ["products", "token", "token", "done"])
+        self.assertEqual(events[-1]["data"]["response"], "Here are some carpets.")
+        
+        history = chatbot.session_manager.get_session(session.session_id).messages
+        self.assertEqual(history[-1].content, "Here are some carpets.")
+    
+    def test_plain_reply_streams_from_first_completion(self):
+        """Test replies without tool calls need a single completion"""
+        with patch("ai_app.chatbot.get_openai_client"):
+            chatbot = FloorBotAI()
+        chatbot.client.chat.completions.create.return_value = iter([self._chunk("Hello"), self._chunk("!")])
+        session = chatbot.session_manager.create_session()
+        
+        events = list(chatbot.chat_stream(session.session_id, "Hi"))
+        
+        self.assertEqual(chatbot.client.chat.completions.create.call_count, 1)
+        self.assertEqual([e["event"] for e in events], ["token", "token", "done"])
+        self.assertEqual(events[-1]["data"]["response"], "Hello!")
+
+
+class AsyncChatTestCase(TestCase):
+    """Test the asyncio chat engine and views"""
+    
+    def _completion(self, content):
+        message = SimpleNamespace(content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def test_async_chat_turn(self):
+        """Test a plain reply is stored through the async session API"""
+        with patch("ai_app.chatbot.get_async_openai_client"):
+            chatbot = AsyncFloorBotAI()
+        chatbot.client.chat.completions.create = AsyncMock(return_value=self._completion("Hello!"))
+        
+        session = async_to_sync(chatbot.session_manager.acreate_session)()
+        response = async_to_sync(chatbot.chat)(session.session_id, "Hi")
+        
+        self.assertTrue(response["success"])
+        self.assertEqual(response["response"], "Hello!")
+        stored = chatbot.session_manager.get_session(session.session_id)
+        self.assertEqual([m.content for m in stored.messages[1:]], ["Hi", "Hello!"])
+    
+    def test_async_text_chat_view(self):
+        """Test the async text endpoint creates a session and replies"""
+        with patch("ai_app.chatbot.get_async_openai_client") as get_client:
+            get_client.return_value.chat.completions.create = AsyncMock(return_value=self._completion("Hi there"))
+            response = self.client.post(
+                "/api/v1/ai/async/chat/text/",
+                data={"message": "Hello"},
+                content_type="application/json"
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["response"], "Hi there")
+    
+    def test_async_text_chat_view_validates(self):
+        """Test invalid input is rejected before any LLM call"""
+        response = self.client.post("/api/v1/ai/async/chat/text/", data={}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ASGIStreamingTestCase(TransactionTestCase):
+    """Test SSE turns reach the client event by event under the ASGI handler"""
+    
+    def test_first_token_arrives_before_turn_finishes(self):
+        """Test /chat/text/ with stream=true sends the first token while the reply is still running"""
+        import asyncio
+        from asgiref.testing import ApplicationCommunicator
+        from django.core.handlers.asgi import ASGIHandler
+        
+        async def scenario():
+            finish = asyncio.Event()
+            
+            async def chat_stream(chatbot, session_id, message):
+                yield {"event": "token", "data": {"content": "Hello"}}
+                await finish.wait()
+                yield {"event": "done", "data": {"session_id": session_id, "success": True}}
+            
+            body = json.dumps({"message": "Hi", "stream": True}).encode()
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                "scheme": "http", "path": "/api/v1/ai/chat/text/", "raw_path": b"/api/v1/ai/chat/text/",
+                "query_string": b"", "root_path": "", "client": ("127.0.0.1", 5000), "server": ("testserver", 80),
+                "headers": [(b"host", b"testserver"), (b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())],
+            }
+            with patch.object(AsyncFloorBotAI, "chat_stream", chat_stream):
+                communicator = ApplicationCommunicator(ASGIHandler(), scope)
+                await communicator.send_input({"type": "http.request", "body": body, "more_body": False})
+                start = await communicator.receive_output(5)
+                first = await communicator.receive_output(5)
+                finish.set()
+                rest = []
+                while True:
+                    message = await communicator.receive_output(5)
+                    rest.append(message.get("body", b""))
+                    if not message.get("more_body"):
+                        break
+            return start, first, b"".join(rest)
+        
+        start, first, rest = async_to_sync(scenario)()
+        
+        self.assertEqual(start["status"], 200)
+        self.assertTrue(first["body"].startswith(b"event: token"))
+        self.assertIn(b"event: done", rest)
+
+
+class OpenAIClientPoolTestCase(TestCase):
+    """Test shared OpenAI client registry"""
+    
+    def tearDown(self):
+        clients.reset_clients()
+    
+    def test_sync_client_is_shared(self):
+        """Test services reuse one client per process"""
+        self.assertIs(clients.get_openai_client(), clients.get_openai_client())
+    
+    def test_async_client_is_per_loop(self):
+        """Test each event loop gets its own async client"""
+        async def get_twice():
+            return clients.get_async_openai_client(), clients.get_async_openai_client()
+        
+        first, second = async_to_sync(get_twice)()
+        self.assertIs(first, second)
+    
+    def test_reset_after_fork(self):
+        """Test forked children build a fresh pool"""
+        client = clients.get_openai_client()
+        clients._reset_after_fork()
+        self.assertIsNot(clients.get_openai_client(), client)
+
+
+class ToolResultCacheTestCase(TestCase):
+    """Test caching of chatbot tool results"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from django.core.cache import cache
+        from dashboard.models import Category
+        
+        cache.clear()
+        self.category = Category.objects.create(title="Carpets", image="categoris/carpets.png")
+        with patch("ai_app.chatbot.get_openai_client"):
+            self.chatbot = FloorBotAI()
+    
+    def test_repeated_search_hits_cache(self):
+        """Test equivalent arguments are served from cache"""
+        session = self.chatbot.session_manager.create_session()
+        
+        with patch.object(self.chatbot.product_service, "search_products", return_value=[]) as search:
+            self.chatbot._execute_function("search_products", {"product_type": "carpets", "color": "Grey"}, session)
+            self.chatbot._execute_function("search_products", {"color": " grey ", "product_type": "carpets", "keyword": None}, session)
+        
+        self.assertEqual(search.call_count, 1)
+        self.assertEqual(session.context["last_products"], [])
+    
+    def test_catalog_write_invalidates(self):
+        """Test a category write bumps the catalog version"""
+        with patch.object(self.chatbot.product_service, "search_products", return_value=[]) as search:
+            self.chatbot._execute_function("search_products", {"product_type": "carpets"})
+            self.category.title = "Rugs"
+            self.category.save()
+            self.chatbot._execute_function("search_products", {"product_type": "carpets"})
+        
+        self.assertEqual(search.call_count, 2)
+
+
+@skipUnless(
+    settings.CACHES["default"]["BACKEND"] == "django.core.cache.backends.redis.RedisCache",
+    "redis_list session store needs the Redis cache backend"
+)
+class RedisListSessionStoreTestCase(TestCase):
+    """Test append-only Redis session storage"""
+    
+    def setUp(self):
+        """Set up test case"""
+        self.store = RedisListSessionStore("ai_session_test:", 60)
+        self.session = ChatSession(session_id="store-test")
+        self.session.add_message(MessageRole.SYSTEM, "system prompt")
+        self.store.save(self.session)
+    
+    def tearDown(self):
+        self.store.delete(self.session.session_id)
+    
+    def test_save_appends_only_new_messages(self):
+        """Test earlier messages are not rewritten"""
+        for i in range(5):
+            self.session.add_message(MessageRole.USER, f"message {i}")
+            self.store.save(self.session)
+        
+        loaded = self.store.load(self.session.session_id)
+        self.assertEqual(len(loaded.messages), 6)
+        self.assertEqual(loaded.stored_message_count, 6)
+    
+    def test_load_keeps_system_prompt_and_tail(self):
+        """Test partial loads pin the first message"""
+        for i in range(5):
+            self.session.add_message(MessageRole.USER, f"message {i}")
+        self.store.save(self.session)
+        
+        loaded = self.store.load(self.session.session_id, history_limit=2)
+        self.assertEqual(
+            [m.content for m in loaded.messages],
+            ["system prompt", "message 3", "message 4"]
+        )
+        
+        loaded.add_message(MessageRole.ASSISTANT, "reply")
+        self.store.save(loaded)
+        self.assertEqual(len(self.store.load(self.session.session_id).messages), 7)
+
+
+class SessionCodecTestCase(TestCase):
+    """Test session wire formats"""
+    
+    def setUp(self):
+        """Set up test case"""
+        self.session = SessionManager()._new_session(user_id="7")
+        self.session.add_message(MessageRole.USER, "grey carpets please", metadata={"source": "voice"})
+        self.session.context = {"last_products": [1, 2]}
+    
+    def test_msgpack_round_trip(self):
+        """Test msgpack restores content, roles and millisecond timestamps"""
+        codec = MsgpackSessionCodec()
+        decoded = codec.decode_session(codec.encode_session(self.session))
+        
+        self.assertEqual(decoded.messages[0].content, AIConfig.SYSTEM_PROMPT)
+        self.assertEqual(decoded.messages[1].metadata, {"source": "voice"})
+        self.assertEqual(decoded.context, self.session.context)
+        delta = abs(decoded.messages[1].timestamp - self.session.messages[1].timestamp)
+        self.assertLess(delta.total_seconds(), 0.001)
+    
+    def test_system_prompt_not_stored_inline(self):
+        """Test the prompt text is replaced by a version reference"""
+        payload = MsgpackSessionCodec().encode_session(self.session)
+        self.assertNotIn(AIConfig.SYSTEM_PROMPT[:40].encode(), payload)
+    
+    def test_reads_sessions_written_by_other_codec(self):
+        """Test switching codecs keeps existing sessions readable"""
+        json_payload = JSONSessionCodec().encode_session(self.session)
+        decoded = get_session_codec("msgpack").decode_session(json_payload)
+        self.assertEqual(decoded.session_id, self.session.session_id)
+
+
+class ContextBuilderTestCase(TestCase):
+    """Test token-budgeted prompt assembly"""
+    
+    def setUp(self):
+        """Set up a long conversation with distinct timestamps"""
+        self.session = SessionManager()._new_session(user_id=None)
+        start = datetime.now() - timedelta(hours=1)
+        for i in range(30):
+            role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+            self.session.add_message(role, f"message {i} " + "about oak flooring " * 10)
+            self.session.messages[-1].timestamp = start + timedelta(seconds=i)
+        self.summarizer = lambda previous, messages: f"{previous} +{len(messages)}".strip()
+    
+    def test_system_prompt_is_pinned(self):
+        """Test the system prompt survives trimming and a summary is added"""
+        messages = ContextBuilder(self.summarizer, token_budget=500).build(self.session)
+        
+        self.assertEqual(messages[0]["content"], AIConfig.SYSTEM_PROMPT)
+        self.assertTrue(messages[1]["content"].startswith("Summary of the earlier conversation"))
+        self.assertEqual(messages[-1]["content"], self.session.messages[-1].content)
+        self.assertIn(SUMMARY_CONTEXT_KEY, self.session.context)
+    
+    def test_summary_is_reused(self):
+        """Test later turns reuse the cached summary until the budget overflows again"""
+        summarizer_calls = []
+        
+        def summarizer(previous, messages):
+            summarizer_calls.append(len(messages))
+            return "earlier turns"
+        
+        builder = ContextBuilder(summarizer, token_budget=500)
+        first = builder.build(self.session)
+        self.session.add_message(MessageRole.USER, "and in grey?")
+        second = builder.build(self.session)
+        
+        self.assertEqual(len(summarizer_calls), 1)
+        self.assertEqual(second[:-1], first)
+    
+    def test_fold_point_survives_msgpack_timestamps(self):
+        """Test messages in the fold point's millisecond stay in the prompt after a msgpack reload"""
+        instant = datetime.now().replace(microsecond=123000)
+        for i, message in enumerate(self.session.messages[1:]):
+            message.timestamp = instant + timedelta(microseconds=97 * i)
+        
+        builder = ContextBuilder(self.summarizer, token_budget=500)
+        first = builder.build(self.session)
+        
+        codec = MsgpackSessionCodec()
+        reloaded = codec.decode_session(codec.encode_session(self.session))
+        self.assertEqual(builder.build(reloaded), first)
+    
+    def test_summarizer_failure_falls_back(self):
+        """Test a failing summarizer still produces a bounded prompt"""
+        def summarizer(previous, messages):
+            raise RuntimeError("LLM unavailable")
+        
+        messages = ContextBuilder(summarizer, token_budget=500).build(self.session)
+        self.assertIn("message 24", messages[1]["content"])
+        self.assertLess(len(messages), len(self.session.messages))
+
+
+class ConcurrentToolCallTestCase(TestCase):
+    """Test concurrent execution of tool calls from one assistant message"""
+    
+    def setUp(self):
+        """Set up test case"""
+        with patch("ai_app.chatbot.get_openai_client"):
+            self.chatbot = FloorBotAI()
+        self.session = self.chatbot.session_manager.create_session()
+        self.tool_calls = [
+            {"id": "call_1", "name": "calculate_area", "arguments": '{"length": 2, "width": 3}'},
+            {"id": "call_2", "name": "calculate_area", "arguments": '{"length": 4, "width": 5}'},
+        ]
+    
+    def test_calls_overlap_and_keep_order(self):
+        """Test calls run in parallel and results follow tool_call order"""
+        barrier = threading.Barrier(2, timeout=2)
+        
+        def execute(function_name, arguments):
+            barrier.wait()
+            return {"area": arguments["length"] * arguments["width"]}
+        
+        messages = []
+        with patch.object(self.chatbot, "_execute_function", side_effect=execute):
+            self.chatbot._run_tool_calls(messages, None, self.tool_calls, self.session)
+        
+        self.assertEqual([m.get("tool_call_id") for m in messages[1:]], ["call_1", "call_2"])
+        self.assertEqual([json.loads(m["content"])["area"] for m in messages[1:]], [6, 20])
+    
+    def test_slow_call_times_out(self):
+        """Test a slow tool yields an error result instead of stalling the turn"""
+        release = threading.Event()
+        
+        def execute(function_name, arguments):
+            if arguments["length"] == 2:
+                release.wait(2)
+            return {"area": arguments["length"] * arguments["width"]}
+        
+        messages = []
+        with patch.object(self.chatbot, "_execute_function", side_effect=execute), \
+                patch.object(AIConfig, "TOOL_CALL_TIMEOUT", 0.1):
+            self.chatbot._run_tool_calls(messages, None, self.tool_calls, self.session)
+        release.set()
+        
+        self.assertIn("timed out", json.loads(messages[1]["content"])["error"])
+        self.assertEqual(json.loads(messages[2]["content"])["area"], 20)
+    
+    def test_single_call_times_out(self):
+        """Test a lone slow tool call is bounded by the timeout as well"""
+        release = threading.Event()
+        
+        def execute(function_name, arguments):
+            release.wait(2)
+            return {"area": arguments["length"] * arguments["width"]}
+        
+        messages = []
+        with patch.object(self.chatbot, "_execute_function", side_effect=execute), \
+                patch.object(AIConfig, "TOOL_CALL_TIMEOUT", 0.1):
+            self.chatbot._run_tool_calls(messages, None, self.tool_calls[:1], self.session)
+        release.set()
+        
+        self.assertIn("timed out", json.loads(messages[1]["content"])["error"])
+    
+    def test_single_call_runs_inline_without_timeout(self):
+        """Test a lone tool call skips the pool when the timeout is disabled"""
+        threads = []
+        
+        def execute(function_name, arguments):
+            threads.append(threading.current_thread())
+            return {"area": arguments["length"] * arguments["width"]}
+        
+        messages = []
+        with patch.object(self.chatbot, "_execute_function", side_effect=execute), \
+                patch.object(AIConfig, "TOOL_CALL_TIMEOUT", 0):
+            self.chatbot._run_tool_calls(messages, None, self.tool_calls[:1], self.session)
+        
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertEqual(json.loads(messages[1]["content"])["area"], 6)
+
+
+class OrderQuoteTestCase(TestCase):
+    """Test batched cart pricing"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from dashboard.models import Category
+        
+        carpets = Category.objects.create(title="Carpets", image="categoris/carpets.png")
+        make_product(product_title="Twist Carpet", product_id="C-1", main_category=carpets, regular_price=40, sale_price=30)
+        make_product(product_title="Berber Carpet", product_id="C-2", main_category=carpets, regular_price=20)
+        self.calculator = OrderCalculator(DjangoProductService())
+    
+    def test_quote_uses_one_query(self):
+        """Test a multi-item cart is priced from a single product query"""
+        items = [
+            {"product_id": "C-1", "quantity": 2},
+            {"product_id": "C-2", "quantity": 3},
+            {"product_id": "C-1", "quantity": 1},
+            {"product_id": "missing", "quantity": 5},
+        ]
+        with self.assertNumQueries(1):
+            summary = self.calculator.quote_order(items)
+        
+        self.assertEqual(len(summary.items), 3)
+        self.assertAlmostEqual(summary.subtotal, 30 * 3 + 20 * 3)
+        self.assertAlmostEqual(summary.grand_total, (summary.subtotal - summary.total_discount) * 1.1)
+    
+    def test_quote_matches_per_item_pricing(self):
+        """Test batch pricing agrees with calculate_order_item"""
+        items = [{"product_id": "C-1", "quantity": 2}, {"product_id": "C-2", "quantity": 3}]
+        expected = self.calculator.create_order_summary(
+            [self.calculator.calculate_order_item(i["product_id"], i["quantity"]) for i in items]
+        )
+        self.assertEqual(self.calculator.quote_order(items).to_dict(), expected.to_dict())
+    
+    def test_quote_without_known_products(self):
+        """Test unknown products produce no summary"""
+        self.assertIsNone(self.calculator.quote_order([{"product_id": "missing", "quantity": 1}]))
+    
+    def test_recommendations_sorted_by_stored_discount(self):
+        """Test recommendations filter and sort on the denormalized price columns"""
+        with self.assertNumQueries(1):
+            products = self.calculator.get_product_recommendations("rugs", budget=35)
+        
+        self.assertEqual([p.id for p in products], ["C-1", "C-2"])
+        self.assertEqual(products[0].discount_percentage, 25.0)
+        self.assertEqual(products[0].unit, "box")
+        self.assertEqual([p.id for p in self.calculator.get_product_recommendations("carpet", budget=25)], ["C-2"])
+
+
+class IntentRouterTestCase(TestCase):
+    """Test the LLM-free fast path"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from django.core.cache import cache
+        from dashboard.models import Category
+        
+        cache.clear()
+        laminate = Category.objects.create(title="Laminate", image="categoris/laminate.png")
+        self.product = make_product(
+            product_title="Natural Oak Laminate", product_id="L-1", main_category=laminate,
+            installation_method="click", available_colors="Oak", materials="HDF"
+        )
+        self.router = IntentRouter(DjangoProductService())
+    
+    def test_routes_structured_messages(self):
+        """Test unambiguous messages map to tool calls"""
+        area = self.router.route("Room is 4 by 5")
+        self.assertEqual((area.function_name, area.arguments), ("calculate_area", {"width": 4.0, "length": 5.0}))
+        
+        search = self.router.route("show me grey carpets")
+        self.assertEqual(search.arguments, {"product_type": "carpets", "color": "grey"})
+        self.assertEqual(self.router.route("find wood flooring").arguments, {"product_type": "wood flooring"})
+        
+        quantity = self.router.route("How many boxes of l-1 for 20m2?")
+        self.assertEqual(quantity.arguments, {"product_id": "L-1", "area": 20.0})
+    
+    def test_ambiguous_messages_go_to_model(self):
+        """Test anything outside the patterns is left to the LLM"""
+        for message in ["show me products", "show sparkly carpets", "I need carpets for two rooms",
+                        "how many boxes of carpet for 20m2"]:
+            self.assertIsNone(self.router.route(message), message)
+    
+    def test_chat_answers_without_llm(self):
+        """Test a routed turn skips OpenAI and is counted as a hit"""
+        with patch("ai_app.chatbot.get_openai_client"):
+            chatbot = FloorBotAI()
+        session = chatbot.session_manager.create_session()
+        session.context["last_products"] = [self.product.pk]
+        chatbot.session_manager.update_session(session)
+        
+        response = chatbot.chat(session.session_id, "how much natural oak do i need for 10 sqm")
+        
+        chatbot.client.chat.completions.create.assert_not_called()
+        self.assertIn("4 boxes", response["response"])
+        self.assertEqual(router_stats()["hits"]["calculate_quantity"], 1)
+        self.assertEqual(router_stats()["hit_rate"], 1.0)
+
+
+class ToolPayloadTestCase(TransactionTestCase):
+    """Test the compact product projection sent to the model (tools run on pool threads)"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from django.core.cache import cache
+        from dashboard.models import Category
+        
+        cache.clear()
+        carpets = Category.objects.create(title="Carpets", image="categoris/carpets.png")
+        make_product(
+            product_title="Soft Twist Carpet", product_id="C-1", main_category=carpets,
+            length="4", width="5", coverage_per_pack="4 m2 per roll",
+            available_colors="Grey", materials="Wool", item_description="Soft and durable. " * 40,
+            return_policy="Returns accepted within 30 days of delivery. " * 10
+        )
+        with patch("ai_app.chatbot.get_openai_client"):
+            self.chatbot = FloorBotAI()
+    
+    def test_model_gets_compact_products(self):
+        """Test the tool message is projected while the turn keeps full products"""
+        session = self.chatbot.session_manager.create_session()
+        tool_calls = [{"id": "call_1", "name": "search_products", "arguments": '{"product_type": "carpets"}'}]
+        messages = []
+        
+        with patch.object(AIConfig, "TOOL_PAYLOAD_STATS_SAMPLE", 1):
+            found_products = self.chatbot._run_tool_calls(messages, None, tool_calls, session)
+        sent = json.loads(messages[1]["content"])["products"][0]
+        
+        self.assertIn("return_policy", found_products[0])
+        self.assertNotIn("return_policy", sent)
+        self.assertEqual(sent["title"], "Soft Twist Carpet")
+        self.assertLessEqual(len(sent["description"]), 161)
+        self.assertGreater(projection_stats()["reduction"], 0.5)
+    
+    def test_empty_fields_are_omitted(self):
+        """Test missing values do not reach the model"""
+        compact = compact_product({"id": 1, "product_title": "Berber", "sale_price": None, "item_description": ""})
+        self.assertEqual(compact, {"id": 1, "title": "Berber"})
+
+
+class FuzzyVocabularyTestCase(TestCase):
+    """Test typo-tolerant vocabulary lookup"""
+    
+    def setUp(self):
+        """Set up test case"""
+        self.vocabulary = FuzzyVocabulary({"beige": 3, "beech": 1, "grey": 5, "green": 2, "red": 1})
+    
+    def test_bounded_edit_distance(self):
+        """Test adjacent swaps count once and the bound cuts off early"""
+        self.assertEqual(bounded_edit_distance("biege", "beige", 2), 1)
+        self.assertEqual(bounded_edit_distance("vynil", "vinyl", 2), 2)
+        self.assertIsNone(bounded_edit_distance("carpet", "laminate", 2))
+    
+    def test_corrects_to_closest_term(self):
+        """Test misspellings resolve to the nearest known term"""
+        self.assertEqual(self.vocabulary.correct("biege"), "beige")
+        self.assertEqual(self.vocabulary.correct("gery"), "grey")
+        self.assertEqual(self.vocabulary.similar("green")[0], "green")
+    
+    def test_short_words_need_exact_match(self):
+        """Test short words are not fuzzily matched"""
+        self.assertEqual(self.vocabulary.correct("red"), "red")
+        self.assertIsNone(self.vocabulary.correct("rad"))
+    
+    def test_typos_from_old_maps_resolve(self):
+        """Test every typo the old hardcoded product type and color maps handled still resolves"""
+        product_service = DjangoProductService()
+        
+        type_typos = {"carpat": "carpets", "vynil": "vinyl", "vinly": "vinyl", "laminat": "laminate"}
+        for typo, product_type in type_typos.items():
+            self.assertEqual(product_service._normalize_product_type(typo), product_type, typo)
+        
+        color_typos = {"biege": "beige", "bronw": "brown", "wite": "white", "blak": "black", "blu": "blue"}
+        for typo, color in color_typos.items():
+            self.assertEqual(product_service._get_color_variations(typo)[0], color, typo)
+    
+    def test_real_words_are_not_corrected(self):
+        """Test everyday words near a catalog term are left alone"""
+        vocabulary = FuzzyVocabulary.from_terms(["wood", "red", "grey", "vinyl"])
+        
+        for word in ("good", "food", "read", "great"):
+            self.assertIsNone(vocabulary.correct(word), word)
+        self.assertEqual(vocabulary.correct("vynil"), "vinyl")
+
+
+class CompletionCoalescerTestCase(TestCase):
+    """Test single-flight sharing and caching of identical completions"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from django.core.cache import cache
+        from ai_app.completion_cache import CompletionCoalescer
+        
+        cache.clear()
+        self.coalescer = CompletionCoalescer(ttl=30, wait=5)
+    
+    def test_concurrent_identical_calls_share_one_upstream_call(self):
+        """Test waiting callers get the leader's result"""
+        release = threading.Event()
+        calls = []
+        
+        def call():
+            calls.append(1)
+            release.wait(5)
+            return {"content": "Hello!", "tool_calls": []}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.coalescer.run("key", call)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self.coalescer._flights:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r["content"] for r in results], ["Hello!"] * 4)
+    
+    def test_repeats_are_cached_until_disabled(self):
+        """Test an exact repeat is served from the cache, and ttl=0 always calls upstream"""
+        from ai_app.completion_cache import CompletionCoalescer
+        
+        calls = []
+        
+        def call():
+            calls.append(1)
+            return {"content": str(len(calls)), "tool_calls": []}
+        
+        self.assertEqual(self.coalescer.run("key", call)["content"], "1")
+        self.assertEqual(self.coalescer.run("key", call)["content"], "1")
+        self.assertEqual(self.coalescer.run("other", call)["content"], "2")
+        
+        uncached = CompletionCoalescer(ttl=0)
+        self.assertEqual(uncached.run("key", call)["content"], "3")
+        self.assertEqual(len(calls), 3)
+    
+    def test_max_entries_evicts_oldest(self):
+        """Test results beyond max_entries push the oldest out of the cache"""
+        from ai_app.completion_cache import CompletionCoalescer
+        
+        bounded = CompletionCoalescer(ttl=30, wait=5, prefix="ai_bounded:", max_entries=2)
+        calls = []
+        
+        def call():
+            calls.append(1)
+            return {"content": str(len(calls))}
+        
+        for key in ("a", "b", "c"):
+            bounded.run(key, call)
+        
+        self.assertEqual(bounded.run("c", call)["content"], "3")
+        self.assertEqual(bounded.run("b", call)["content"], "2")
+        self.assertEqual(bounded.run("a", call)["content"], "4")
+        self.assertEqual(len(calls), 4)
+        
+        async def acall():
+            calls.append(1)
+            return {"content": str(len(calls))}
+        
+        async def arun(key):
+            return (await bounded.arun(key, acall))["content"]
+        
+        self.assertEqual(async_to_sync(arun)("d"), "5")
+        self.assertEqual(async_to_sync(arun)("b"), "6")
+    
+    def test_chat_reuses_identical_first_completion(self):
+        """Test the same opening message in fresh sessions reaches OpenAI once"""
+        with patch("ai_app.chatbot.get_openai_client"):
+            chatbot = FloorBotAI()
+        message = SimpleNamespace(content="Welcome to FloorBot!", tool_calls=None)
+        chatbot.client.chat.completions.create.return_value = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        
+        for _ in range(2):
+            session = chatbot.session_manager.create_session()
+            response = chatbot.chat(session.session_id, "What do you sell?")
+            self.assertEqual(response["response"], "Welcome to FloorBot!")
+        
+        self.assertEqual(chatbot.client.chat.completions.create.call_count, 1)
+
+
+class SessionTurnLockTestCase(TestCase):
+    """Test chat turns for one session are serialized"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from django.core.cache import cache
+        
+        cache.clear()
+        with patch("ai_app.chatbot.get_openai_client"):
+            self.chatbot = FloorBotAI()
+        message = SimpleNamespace(content="Hello!", tool_calls=None)
+        self.chatbot.client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=message)]
+        )
+        self.session = self.chatbot.session_manager.create_session()
+    
+    def test_duplicate_turn_is_rejected_without_llm_call(self):
+        """Test a turn submitted while another holds the session gets SESSION_BUSY"""
+        from ai_app.session_manager import SESSION_BUSY
+        
+        manager = self.chatbot.session_manager
+        turn = manager.acquire_turn(self.session.session_id)
+        
+        with patch.object(AIConfig, "SESSION_TURN_WAIT", 0):
+            result = self.chatbot.chat(self.session.session_id, "Hi")
+            response = self.client.post(
+                "/api/v1/ai/chat/text/",
+                data={"message": "Hi", "session_id": self.session.session_id},
+                content_type="application/json"
+            )
+        
+        self.assertEqual(result["error"], SESSION_BUSY)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], SESSION_BUSY)
+        self.chatbot.client.chat.completions.create.assert_not_called()
+        
+        manager.release_turn(self.session.session_id, turn)
+        self.assertTrue(self.chatbot.chat(self.session.session_id, "Hi")["success"])
+    
+    def test_queued_turn_sees_previous_reply(self):
+        """Test a waiting turn runs after the first one and keeps both in history"""
+        manager = self.chatbot.session_manager
+        turn = manager.acquire_turn(self.session.session_id)
+        
+        results = []
+        waiting = threading.Thread(
+            target=lambda: results.append(self.chatbot.chat(self.session.session_id, "Second"))
+        )
+        waiting.start()
+        
+        session = manager.get_session(self.session.session_id)
+        session.add_message(MessageRole.USER, "First")
+        session.add_message(MessageRole.ASSISTANT, "Reply")
+        manager.update_session(session)
+        manager.release_turn(self.session.session_id, turn)
+        waiting.join()
+        
+        self.assertTrue(results[0]["success"])
+        stored = manager.get_session(self.session.session_id)
+        self.assertEqual([m.content for m in stored.messages[1:]], ["First", "Reply", "Second", "Hello!"])
+
+
+class AdmissionControlTestCase(TestCase):
+    """Test concurrency limits, the wait queue and 429/503 responses"""
+    
+    def test_per_client_limit(self):
+        """Test a client over its limit is rejected with 429"""
+        from ai_app.admission import AdmissionController
+        
+        controller = AdmissionController(max_concurrent=10, max_per_client=1)
+        self.assertIsNone(controller.admit("user:1"))
+        self.assertEqual(controller.admit("user:1").status, 429)
+        self.assertIsNone(controller.admit("user:2"))
+        
+        controller.release("user:1")
+        self.assertIsNone(controller.admit("user:1"))
+    
+    def test_queued_request_gets_released_slot(self):
+        """Test a waiter is admitted when a running request finishes"""
+        from ai_app.admission import AdmissionController
+        
+        controller = AdmissionController(max_concurrent=1, max_per_client=5, max_queue=1, queue_timeout=5)
+        self.assertIsNone(controller.admit("a"))
+        
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(controller.admit("b")))
+        waiting.start()
+        while not controller.stats()["queued"]:
+            pass
+        
+        self.assertEqual(controller.admit("c").status, 503)
+        controller.release("a")
+        waiting.join()
+        
+        self.assertEqual(results, [None])
+        self.assertEqual(controller.stats(), {"active": 1, "queued": 0})
+    
+    def test_queue_deadline(self):
+        """Test a request that waits past the deadline gets 503 and leaves the queue"""
+        from ai_app.admission import AdmissionController
+        
+        controller = AdmissionController(max_concurrent=1, max_per_client=5, max_queue=5, queue_timeout=0.05)
+        controller.admit("a")
+        
+        self.assertEqual(controller.admit("b").status, 503)
+        self.assertEqual(async_to_sync(controller.aadmit)("b").status, 503)
+        self.assertEqual(controller.stats(), {"active": 1, "queued": 0})
+    
+    def test_async_admission_counts_in_background(self):
+        """Test aadmit leaves the cache round trips to background tasks"""
+        import asyncio
+        from ai_app import metrics
+        from ai_app.admission import AdmissionController, COUNTERS
+        
+        metrics.reset(COUNTERS)
+        controller = AdmissionController(max_concurrent=5, max_per_client=1)
+        
+        async def admit_twice():
+            results = [await controller.aadmit("a"), await controller.aadmit("a")]
+            await asyncio.gather(*metrics._background)
+            return results
+        
+        with patch("ai_app.admission.metrics.incr") as incr:
+            first, second = async_to_sync(admit_twice)()
+        
+        self.assertIsNone(first)
+        self.assertEqual(second.status, 429)
+        incr.assert_not_called()
+        counts = metrics.get_counts(COUNTERS)
+        self.assertEqual((counts["admission.admitted"], counts["admission.rejected.user_limit"]), (1, 1))
+    
+    def test_anonymous_clients_behind_proxy(self):
+        """Test anonymous clients are keyed on the address the trusted proxy forwarded"""
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        from ai_app.admission import _client_key
+        
+        request = RequestFactory().post(
+            "/api/v1/ai/chat/text/", REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR="6.6.6.6, 203.0.113.5"
+        )
+        self.assertEqual(_client_key(request, AnonymousUser()), "ip:10.0.0.2")
+        
+        with patch.object(AIConfig, "ADMISSION_FORWARDED_HEADER", "X-Forwarded-For"):
+            self.assertEqual(_client_key(request, AnonymousUser()), "ip:203.0.113.5")
+            with patch.object(AIConfig, "ADMISSION_TRUSTED_PROXIES", 2):
+                self.assertEqual(_client_key(request, AnonymousUser()), "ip:6.6.6.6")
+            with patch.object(AIConfig, "ADMISSION_TRUSTED_PROXIES", 3):
+                self.assertEqual(_client_key(request, AnonymousUser()), "ip:10.0.0.2")
+    
+    def test_views_reject_with_retry_after(self):
+        """Test chat views answer 503 with Retry-After when the worker is full"""
+        from ai_app.admission import AdmissionController
+        
+        full = AdmissionController(max_concurrent=0, max_queue=0)
+        with patch("ai_app.admission.admission_controller", full):
+            for url in ("/api/v1/ai/chat/text/", "/api/v1/ai/async/chat/text/"):
+                response = self.client.post(url, data={"message": "Hi"}, content_type="application/json")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], str(AIConfig.ADMISSION_RETRY_AFTER))
+
+
+class LocalSessionCacheTestCase(TestCase):
+    """Test the in-process session tier and its version checks"""
+    
+    def setUp(self):
+        """Set up test case"""
+        from ai_app.session_cache import local_session_cache
+        
+        self.local = local_session_cache
+        self.local.clear()
+        self.manager = SessionManager()
+    
+    def test_hot_session_served_locally(self):
+        """Test repeated reads decode the local copy instead of loading from the store"""
+        session = self.manager.create_session()
+        
+        with patch.object(self.manager.store, "load") as load:
+            first = self.manager.get_session(session.session_id)
+            first.add_message(MessageRole.USER, "not saved")
+            second = self.manager.get_session(session.session_id)
+        
+        load.assert_not_called()
+        self.assertEqual(len(second.messages), 1)
+        self.assertEqual(self.local.stats()["hits"], 2)
+        self.assertGreater(self.local.stats()["bytes"], 0)
+    
+    def test_write_from_another_worker_invalidates(self):
+        """Test a save elsewhere (new version) forces a reload"""
+        session = self.manager.create_session()
+        
+        other_worker = SessionManager()
+        stored = other_worker.get_session(session.session_id)
+        stored.add_message(MessageRole.USER, "Hi")
+        other_worker.store.save(stored)
+        other_worker._bump_version(session.session_id)
+        
+        reloaded = self.manager.get_session(session.session_id)
+        self.assertEqual([m.content for m in reloaded.messages[1:]], ["Hi"])
+        self.assertEqual(self.local.stats()["stale"], 1)
+    
+    def test_save_during_load_is_not_masked(self):
+        """Test a copy loaded while another worker saves is not served once the version is reseeded"""
+        from django.core.cache import cache
+        
+        session = self.manager.create_session()
+        self.local.clear()
+        cache.delete(self.manager._version_key(session.session_id))
+        
+        other_worker = SessionManager()
+        load = self.manager.store.load
+        
+        def load_then_save_elsewhere(session_id, history_limit=None):
+            loaded = load(session_id, history_limit)
+            stored = load(session_id, history_limit)
+            stored.add_message(MessageRole.USER, "Hi")
+            other_worker.update_session(stored)
+            return loaded
+        
+        with patch.object(self.manager.store, "load", side_effect=load_then_save_elsewhere):
+            self.manager.get_session(session.session_id)
+        
+        reloaded = self.manager.get_session(session.session_id)
+        self.assertEqual([m.content for m in reloaded.messages[1:]], ["Hi"])
+    
+    def test_save_renews_version_expiry(self):
+        """Test each save bumps the version and pushes back its expiry in the write's own round trip"""
+        from django.core.cache import cache
+        from ai_app.session_store import redis_client
+        
+        session = self.manager.create_session()
+        key = cache.make_key(self.manager._version_key(session.session_id))
+        redis_client().expire(key, 5)
+        version = cache.get(self.manager._version_key(session.session_id))
+        
+        with patch.object(cache, "incr") as incr, patch.object(cache, "touch") as touch:
+            self.manager.update_session(session)
+        
+        incr.assert_not_called()
+        touch.assert_not_called()
+        self.assertEqual(cache.get(self.manager._version_key(session.session_id)), version + 1)
+        self.assertGreater(redis_client().ttl(key), 5)
+    
+    def test_version_restarts_after_expiry(self):
+        """Test a lapsed version key is seeded again by the next save"""
+        from django.core.cache import cache
+        
+        session = self.manager.create_session()
+        cache.delete(self.manager._version_key(session.session_id))
+        
+        self.manager.update_session(session)
+        
+        self.assertIsNotNone(cache.get(self.manager._version_key(session.session_id)))
+        self.assertEqual(self.manager.get_session(session.session_id).session_id, session.session_id)
+    
+    def test_lru_bounds(self):
+        """Test entries beyond the size or byte limits are evicted oldest first"""
+        from ai_app.session_cache import LocalSessionCache
+        
+        local = LocalSessionCache(max_entries=2, max_bytes=10 ** 6, ttl=60)
+        sessions = [self.manager._new_session(None) for _ in range(3)]
+        for version, session in enumerate(sessions):
+            local.put(session, version)
+        
+        self.assertIsNone(local.get(sessions[0].session_id, 0))
+        self.assertIsNotNone(local.get(sessions[2].session_id, 2))
+        self.assertEqual(local.stats()["evictions"], 1)
+        
+        tiny = LocalSessionCache(max_entries=10, max_bytes=10, ttl=60)
+        tiny.put(sessions[0], 0)
+        self.assertEqual(tiny.stats()["entries"], 0)
+
+
+class RawAudioUploadTestCase(TestCase):
+    """Test raw audio bodies are streamed to Whisper without base64 or extra copies"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def _completion(self, content):
+        message = SimpleNamespace(content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def test_raw_body_voice_chat(self):
+        """Test a raw audio/wav body is transcribed and answered"""
+        with patch("ai_app.speech_service.get_openai_client") as speech_client, \
+                patch("ai_app.chatbot.get_openai_client") as chat_client:
+            create = speech_client.return_value.audio.transcriptions.create
+            create.return_value = SimpleNamespace(text="show me grey carpets")
+            chat_client.return_value.chat.completions.create.return_value = self._completion("Here you go")
+            
+            response = self.client.post(
+                "/api/v1/ai/chat/voice/?language=de",
+                data=b"RIFF" + b"\x00" * 1000,
+                content_type="audio/wav"
+            )
+            
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["transcribed_text"], "show me grey carpets")
+            name, audio_file = create.call_args.kwargs["file"]
+            self.assertEqual(name, "audio.wav")
+            self.assertEqual(create.call_args.kwargs["language"], "de")
+    
+    def test_content_type_with_parameters(self):
+        """Test a MediaRecorder type such as audio/webm;codecs=opus is taken as raw audio"""
+        with patch("ai_app.speech_service.get_openai_client") as speech_client, \
+                patch("ai_app.speech_service.get_async_openai_client") as async_speech_client, \
+                patch("ai_app.chatbot.get_openai_client") as chat_client, \
+                patch("ai_app.chatbot.get_async_openai_client") as async_chat_client:
+            create = speech_client.return_value.audio.transcriptions.create
+            create.return_value = SimpleNamespace(text="show me grey carpets")
+            async_create = AsyncMock(return_value=SimpleNamespace(text="show me grey carpets"))
+            async_speech_client.return_value.audio.transcriptions.create = async_create
+            chat_client.return_value.chat.completions.create.return_value = self._completion("Here you go")
+            async_chat_client.return_value.chat.completions.create = AsyncMock(
+                return_value=self._completion("Here you go")
+            )
+            
+            for url, transcribe in (("/api/v1/ai/chat/voice/", create),
+                                    ("/api/v1/ai/async/chat/voice/", async_create)):
+                # Distinct clips, so the second is not served from the transcription cache
+                response = self.client.post(url, data=b"\x1aE\xdf\xa3" + url.encode(),
+                                            content_type="audio/webm;codecs=opus")
+                
+                self.assertEqual(response.status_code, 200)
+                name, audio_file = transcribe.call_args.kwargs["file"]
+                self.assertEqual(name, "audio.webm")
+    
+    def test_chat_value_error_is_server_error(self):
+        """Test a ValueError from the chat turn is a 500, not a bad-audio 400"""
+        with patch("ai_app.speech_service.get_openai_client") as speech_client, \
+                patch("ai_app.chatbot.get_openai_client"), \
+                patch.object(FloorBotAI, "chat", side_effect=ValueError("bad tool arguments")):
+            create = speech_client.return_value.audio.transcriptions.create
+            create.return_value = SimpleNamespace(text="show me grey carpets")
+            
+            response = self.client.post("/api/v1/ai/chat/voice/", data=b"RIFF" + b"\x00" * 1000,
+                                        content_type="audio/wav")
+        
+        self.assertEqual(response.status_code, 500)
+    
+    def test_upload_file_is_not_copied(self):
+        """Test transcribe_file hands OpenAI the upload's own file object"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from ai_app.speech_service import SpeechService
+        
+        upload = SimpleUploadedFile("clip.mp3", b"ID3" + b"\x00" * 100, content_type="audio/mpeg")
+        upload.read()
+        with patch("ai_app.speech_service.get_openai_client") as speech_client:
+            create = speech_client.return_value.audio.transcriptions.create
+            create.return_value = SimpleNamespace(text="hello")
+            SpeechService().transcribe_file(upload)
+        
+        name, audio_file = create.call_args.kwargs["file"]
+        self.assertEqual(name, "clip.mp3")
+        self.assertIs(audio_file, upload.file)
+        self.assertEqual(audio_file.tell(), 0)
+    
+    def test_raw_body_limits(self):
+        """Test oversized raw bodies get 413 and empty ones 400"""
+        with patch("ai_app.speech_service.get_async_openai_client"), \
+                patch.object(AIConfig, "VOICE_MAX_UPLOAD_BYTES", 16):
+            for url in ("/api/v1/ai/chat/voice/", "/api/v1/ai/async/chat/voice/"):
+                response = self.client.post(url, data=b"\x00" * 17, content_type="application/octet-stream")
+                self.assertEqual(response.status_code, 413)
+                
+                response = self.client.post(url, data=b"", content_type="audio/wav")
+                self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(audio_preprocess.np is not None, "NumPy is not installed")
+class AudioPreprocessTestCase(TestCase):
+    """Test WAV clips are downmixed, resampled and trimmed before upload"""
+    
+    def _wav(self, samples, rate, channels=1):
+        import wave
+        import numpy as np
+        
+        pcm = (np.repeat(samples, channels) * 32767).astype("<i2")
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setnchannels(channels)
+            writer.setsampwidth(2)
+            writer.setframerate(rate)
+            writer.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+    
+    def _read(self, data):
+        import wave
+        
+        with wave.open(io.BytesIO(data)) as reader:
+            return reader.getnchannels(), reader.getframerate(), reader.getnframes()
+    
+    def test_stereo_clip_with_silent_edges(self):
+        """Test a 44.1 kHz stereo clip becomes 16 kHz mono with the silence cut"""
+        import numpy as np
+        
+        rate = 44100
+        silence = np.zeros(rate, dtype=np.float32)
+        tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(rate) / rate).astype(np.float32)
+        data = self._wav(np.concatenate([silence, tone, silence]), rate, channels=2)
+        
+        processed = audio_preprocess.preprocess_wav(io.BytesIO(data))
+        channels, out_rate, frames = self._read(processed)
+        
+        self.assertEqual((channels, out_rate), (1, 16000))
+        padding = 16000 * AIConfig.AUDIO_SILENCE_PADDING_MS // 1000
+        self.assertAlmostEqual(frames, 16000 + 2 * padding, delta=2 * 320)
+        self.assertLess(len(processed), len(data) / 8)
+    
+    def test_clips_left_alone(self):
+        """Test normalized clips and non-WAV audio are returned unchanged"""
+        import numpy as np
+        
+        tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000).astype(np.float32)
+        data = self._wav(tone, 16000)
+        
+        self.assertIsNone(audio_preprocess.preprocess_wav(io.BytesIO(data)))
+        self.assertIsNone(audio_preprocess.preprocess_wav(io.BytesIO(b"ID3\x00not a wav")))
+    
+    def test_blocks_match_whole_clip(self):
+        """Test resampling block by block gives the same samples as one pass"""
+        import numpy as np
+        
+        rate = 44100
+        clip = np.random.default_rng(0).uniform(-0.5, 0.5, int(2.5 * rate)).astype(np.float32)
+        
+        whole = audio_preprocess._Resampler(rate, 16000).feed(clip)
+        blockwise = audio_preprocess._Resampler(rate, 16000)
+        parts = [blockwise.feed(clip[start:start + rate]) for start in range(0, len(clip), rate)]
+        
+        np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-6)
+    
+    def test_spooled_upload(self):
+        """Test a clip spooled to a temporary file (as large uploads are) is read in place"""
+        import tempfile
+        import numpy as np
+        
+        tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(44100) / 44100).astype(np.float32)
+        with tempfile.TemporaryFile() as upload:
+            upload.write(self._wav(tone, 44100, channels=2))
+            upload.seek(0)
+            processed = audio_preprocess.preprocess_wav(upload)
+        
+        self.assertEqual(self._read(processed)[:2], (1, 16000))
+    
+    def test_maximum_duration(self):
+        """Test speech longer than the limit is rejected"""
+        import numpy as np
+        
+        tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(3 * 8000) / 8000).astype(np.float32)
+        with self.assertRaises(audio_preprocess.AudioTooLong):
+            audio_preprocess.preprocess_wav(io.BytesIO(self._wav(tone, 8000)), max_duration=2)
+
+
+class TranscriptionCacheTestCase(TestCase):
+    """Test identical clips are transcribed once per language and model"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def _service(self):
+        from ai_app.speech_service import SpeechService
+        
+        with patch("ai_app.speech_service.get_openai_client"):
+            service = SpeechService()
+        service.client.audio.transcriptions.create.return_value = SimpleNamespace(text="grey carpet")
+        return service
+    
+    def test_resent_clip_is_served_from_cache(self):
+        """Test the same bytes via base64 and file upload reach Whisper once"""
+        import base64
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        service = self._service()
+        clip = b"ID3" + b"\x01" * 500
+        
+        self.assertEqual(service.transcribe_audio(clip, "mp3"), "grey carpet")
+        self.assertEqual(service.transcribe_base64_audio(base64.b64encode(clip).decode(), "mp3"), "grey carpet")
+        self.assertEqual(service.transcribe_file(SimpleUploadedFile("clip.mp3", clip)), "grey carpet")
+        self.assertEqual(service.client.audio.transcriptions.create.call_count, 1)
+        
+        service.transcribe_audio(clip, "mp3", language="de")
+        self.assertEqual(service.client.audio.transcriptions.create.call_count, 2)
+    
+    def test_async_service_shares_cache(self):
+        """Test the async service reuses a transcript cached by the sync one"""
+        from ai_app.speech_service import AsyncSpeechService
+        
+        clip = b"ID3" + b"\x02" * 500
+        self._service().transcribe_audio(clip, "mp3")
+        
+        with patch("ai_app.speech_service.get_async_openai_client"):
+            service = AsyncSpeechService()
+        service.client.audio.transcriptions.create = AsyncMock()
+        
+        self.assertEqual(async_to_sync(service.transcribe_audio)(clip, "mp3"), "grey carpet")
+        service.client.audio.transcriptions.create.assert_not_called()
+    
+    def test_large_clips_are_cached(self):
+        """Test clips up to the upload limit are cached, however large"""
+        service = self._service()
+        clip = b"ID3" + b"\x03" * (12 * 1024 * 1024)
+        
+        service.transcribe_audio(clip, "mp3")
+        service.transcribe_audio(clip, "mp3")
+        self.assertEqual(service.client.audio.transcriptions.create.call_count, 1)
+    
+    def test_oversized_clips_are_not_cached(self):
+        """Test clips over the upload limit always go to Whisper"""
+        service = self._service()
+        clip = b"ID3" + b"\x03" * 500
+        
+        with patch.object(AIConfig, "VOICE_MAX_UPLOAD_BYTES", 100):
+            service.transcribe_audio(clip, "mp3")
+            service.transcribe_audio(clip, "mp3")
+        self.assertEqual(service.client.audio.transcriptions.create.call_count, 2)
+
+
+class AIChatConsumerTestCase(TestCase):
+    """Test the WebSocket consumer streams chat and voice turns"""
+    
+    def setUp(self):
+        self.messages = []
+        
+        async def chat_stream(chatbot, session_id, message):
+            self.messages.append((session_id, message))
+            yield {"event": "token", "data": {"content": "Hello"}}
+            yield {"event": "done", "data": {"session_id": session_id, "success": True}}
+        
+        patches = [
+            patch("ai_app.chatbot.get_async_openai_client"),
+            patch.object(AsyncFloorBotAI, "chat_stream", chat_stream),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def _run(self, frames, replies, path="/ws/ai/chat/"):
+        from channels.testing import WebsocketCommunicator
+        from ai_app.consumers import AIChatConsumer
+        
+        async def scenario():
+            communicator = WebsocketCommunicator(AIChatConsumer.as_asgi(), path)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            received = [await communicator.receive_json_from()]
+            for frame in frames:
+                if isinstance(frame, bytes):
+                    await communicator.send_to(bytes_data=frame)
+                else:
+                    await communicator.send_json_to(frame)
+            for _ in range(replies):
+                received.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return received
+        
+        return async_to_sync(scenario)()
+    
+    def test_text_turn(self):
+        """Test a text frame streams tokens on the connection's session"""
+        events = self._run([{"type": "message", "message": "Hi"}], replies=2)
+        
+        session_id = events[0]["data"]["session_id"]
+        self.assertEqual(events[0]["event"], "session")
+        self.assertEqual([event["event"] for event in events[1:]], ["token", "done"])
+        self.assertEqual(self.messages, [(session_id, "Hi")])
+    
+    def test_voice_frame(self):
+        """Test a binary frame is transcribed and answered"""
+        from ai_app.speech_service import AsyncSpeechService
+        
+        with patch.object(AsyncSpeechService, "__init__", return_value=None), \
+                patch.object(AsyncSpeechService, "transcribe_audio", AsyncMock(return_value="grey carpets")) as transcribe:
+            events = self._run([{"type": "audio_config", "audio_format": "webm"}, b"\x1aE\xdf\xa3"], replies=3)
+        
+        self.assertEqual(events[1], {"event": "transcript", "data": {"transcribed_text": "grey carpets"}})
+        self.assertEqual(transcribe.call_args.args, (b"\x1aE\xdf\xa3", "webm", "en"))
+        self.assertEqual(self.messages[0][1], "grey carpets")
+    
+    def test_resume_session(self):
+        """Test an existing session_id is reused and bad frames get an error event"""
+        session = SessionManager().create_session()
+        
+        events = self._run([{"type": "unknown"}], replies=1, path=f"/ws/ai/chat/?session_id={session.session_id}")
+        
+        self.assertEqual(events[0]["data"]["session_id"], session.session_id)
+        self.assertEqual(events[1]["event"], "error")
+
+
+class FakeOpenAIServerTestCase(TransactionTestCase):
+    """Test FloorBotAI end to end against the local fake OpenAI server"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from openai import OpenAI
+        from ai_app.fake_openai import FakeOpenAIServer
+        
+        cache.clear()
+        self.server = FakeOpenAIServer().start()
+        self.addCleanup(self.server.stop)
+        
+        client = OpenAI(base_url=self.server.url, api_key="fake-key", max_retries=0)
+        self.addCleanup(client.close)
+        patchers = [
+            patch("ai_app.chatbot.get_openai_client", return_value=client),
+            patch.object(AIConfig, "INTENT_ROUTER_ENABLED", False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_tool_call_turn(self):
+        """Test the scripted search tool call and reply complete a turn"""
+        from ai_app.fake_openai import DEFAULT_REPLY
+        
+        chatbot = FloorBotAI()
+        session = chatbot.session_manager.create_session()
+        response = chatbot.chat(session.session_id, "Any grey carpets?")
+        
+        self.assertTrue(response["success"])
+        self.assertEqual(response["response"], DEFAULT_REPLY)
+        self.assertEqual(self.server.requests, {"chat.completions": 2})
+    
+    def test_streamed_turn(self):
+        """Test streamed tokens from the fake server reassemble into the reply"""
+        from ai_app.fake_openai import DEFAULT_REPLY
+        
+        chatbot = FloorBotAI()
+        session = chatbot.session_manager.create_session()
+        events = list(chatbot.chat_stream(session.session_id, "Any oak laminate?"))
+        
+        tokens = "".join(event["data"]["content"] for event in events if event["event"] == "token")
+        self.assertEqual(tokens, DEFAULT_REPLY)
+        self.assertEqual(events[-1]["event"], "done")
@@ -0,0 +1,83 @@
+"""
+Tool Cache - Caches chatbot tool results until the catalog changes
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+from django.core.cache import cache
+from ai_app.config import AIConfig
+
+
+CATALOG_VERSION_KEY = "ai_catalog_version"
+
+# Tools whose output depends only on their arguments and the catalog
+CACHEABLE_TOOLS = {"search_products", "calculate_quantity", "create_order_summary"}
+
+
+def get_catalog_version() -> int:
+    """Current catalog version, shared by all processes through the cache"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction is never reused
+        seed = int(time.time() * 1000)
+        cache.add(CATALOG_VERSION_KEY, seed, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, seed)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached tool result by moving to a new catalog version"""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key missing (evicted or never set); re-seeding is already a new version
+        get_catalog_version()
+
+
+def _normalize(value: Any) -> Any:
+    """Canonical form of tool arguments so equivalent calls share a key"""
+    if isinstance(value, dict):
+        return {key: _normalize(val) for key, val in sorted(value.items()) if val not in (None, "")}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+class ToolResultCache:
+    """
+    Caches tool results in the configured Django cache
+    
+    Keys combine the catalog version with a hash of the tool name and its
+    normalized arguments, so any Product/Category write orphans old entries.
+    """
+    
+    def __init__(self):
+        """Initialize tool cache"""
+        self.cache_prefix = "ai_tool:"
+        self.timeout = AIConfig.TOOL_CACHE_TIMEOUT
+    
+    def is_cacheable(self, function_name: str) -> bool:
+        """Whether results of this tool may be cached"""
+        return self.timeout > 0 and function_name in CACHEABLE_TOOLS
+    
+    def get(self, function_name: str, arguments: Dict) -> Optional[Dict]:
+        """Return a cached result or None"""
+        return cache.get(self._key(function_name, arguments))
+    
+    def set(self, function_name: str, arguments: Dict, result: Dict):
+        """Store a tool result; error results are not cached"""
+        if "error" in result:
+            return
+        cache.set(self._key(function_name, arguments), result, timeout=self.timeout)
+    
+    def _key(self, function_name: str, arguments: Dict) -> str:
+        payload = json.dumps([function_name, _normalize(arguments)], sort_keys=True, default=str)
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return f"{self.cache_prefix}{get_catalog_version()}:{digest}"
@@ -0,0 +1,94 @@
+"""
+Tool Executor - Bounded thread pool for running chatbot tool calls concurrently
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from django.db import close_old_connections
+from ai_app.config import AIConfig
+
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Get the process-wide tool thread pool (created on first use)"""
+    global _executor
+    
+    executor = _executor
+    if executor is not None:
+        return executor
+    
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=AIConfig.TOOL_MAX_WORKERS,
+                thread_name_prefix="ai-tool"
+            )
+        return _executor
+
+
+def _run_with_db_cleanup(fn: Callable, args: Tuple) -> Any:
+    """Run `fn` in a pool thread and release its database connection afterwards"""
+    try:
+        return fn(*args)
+    finally:
+        # Pool threads outlive requests, so request_finished never closes these
+        close_old_connections()
+
+
+def run_concurrently(fn: Callable, calls: Sequence[Tuple], timeout: Optional[float] = None,
+                     on_timeout: Optional[Callable[[Tuple], Any]] = None) -> List[Any]:
+    """
+    Run `fn(*args)` for every args tuple on the shared pool
+    
+    A single call is bounded by the timeout too, so it also goes to the
+    pool; only with the timeout disabled does it run inline on the calling
+    thread, reusing its database connection.
+    
+    Args:
+        fn: Function to call
+        calls: Argument tuples, one per call
+        timeout: Seconds each call may take, counted from submission
+            (0 or less: no limit)
+        on_timeout: Builds the result for a call that timed out; the call
+            itself keeps running in the background until it returns
+    
+    Returns:
+        Results in the same order as `calls`. Exceptions raised by `fn` propagate.
+    """
+    timeout = AIConfig.TOOL_CALL_TIMEOUT if timeout is None else timeout
+    if timeout <= 0 and len(calls) <= 1:
+        return [fn(*args) for args in calls]
+    
+    executor = get_tool_executor()
+    
+    submitted_at = time.monotonic()
+    futures = [executor.submit(_run_with_db_cleanup, fn, args) for args in calls]
+    
+    results = []
+    for args, future in zip(calls, futures):
+        remaining = max(0.0, submitted_at + timeout - time.monotonic()) if timeout > 0 else None
+        try:
+            results.append(future.result(timeout=remaining))
+        except FutureTimeout:
+            future.cancel()
+            if on_timeout is None:
+                raise
+            results.append(on_timeout(args))
+    
+    return results
+
+
+def _reset_after_fork():
+    global _lock, _executor
+    # Worker threads do not survive a fork; the child needs its own pool
+    _lock = threading.Lock()
+    _executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
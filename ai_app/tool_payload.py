@@ -0,0 +1,93 @@
+"""
+Tool Payload - Compact tool results sent back to the model
+"""
+import itertools
+import json
+from typing import Any, Dict
+from ai_app import metrics
+from ai_app.config import AIConfig
+from ai_app.context_builder import estimate_tokens
+
+
+DESCRIPTION_CHARS = 160
+
+# Serialized product field -> key the model sees
+COMPACT_PRODUCT_FIELDS = {
+    "id": "id",
+    "product_id": "product_id",
+    "product_title": "title",
+    "brand_manufacturer": "brand",
+    "regular_price": "price",
+    "sale_price": "sale_price",
+    "available_colors": "colors",
+    "materials": "materials",
+    "pattern_type": "pattern",
+    "coverage_per_pack": "coverage",
+    "stock_quantity": "stock",
+}
+
+COUNTERS = ("tool_payload.searches", "tool_payload.full_tokens", "tool_payload.compact_tokens")
+
+# Numbers product searches for TOOL_PAYLOAD_STATS_SAMPLE (next() is atomic)
+_searches = itertools.count()
+
+
+def compact_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Project a serialized product onto the fields the model needs
+    
+    Images, dimensions, return policy and other display-only fields are
+    dropped, empty values are omitted and the description is truncated.
+    """
+    compact = {
+        key: product[field_name]
+        for field_name, key in COMPACT_PRODUCT_FIELDS.items()
+        if product.get(field_name) not in (None, "", [])
+    }
+    
+    description = " ".join((product.get("item_description") or "").split())
+    if description:
+        if len(description) > DESCRIPTION_CHARS:
+            description = description[:DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "…"
+        compact["description"] = description
+    
+    return compact
+
+
+def tool_message_content(function_name: str, result: Dict[str, Any]) -> str:
+    """
+    JSON content of the tool message for a function result
+    
+    search_products results are projected with `compact_product`; the full
+    products still reach the frontend through the chat response. Only
+    sampled searches pay for serializing the full result and the counter
+    round trips behind `projection_stats`.
+    """
+    if function_name != "search_products" or "products" not in result:
+        return json.dumps(result)
+    
+    compact = dict(result, products=[compact_product(p) for p in result["products"]])
+    content = json.dumps(compact, ensure_ascii=False)
+    
+    sample = AIConfig.TOOL_PAYLOAD_STATS_SAMPLE
+    if sample > 0 and next(_searches) % sample == 0:
+        metrics.incr("tool_payload.searches")
+        metrics.incr("tool_payload.full_tokens", estimate_tokens(json.dumps(result)))
+        metrics.incr("tool_payload.compact_tokens", estimate_tokens(content))
+    
+    return content
+
+
+def projection_stats() -> Dict[str, Any]:
+    """Estimated prompt tokens per sampled search with and without the projection"""
+    counts = metrics.get_counts(COUNTERS)
+    searches = counts["tool_payload.searches"]
+    full = counts["tool_payload.full_tokens"]
+    compact = counts["tool_payload.compact_tokens"]
+    
+    return {
+        "sampled_searches": searches,
+        "avg_full_tokens": round(full / searches) if searches else 0,
+        "avg_compact_tokens": round(compact / searches) if searches else 0,
+        "reduction": round(1 - compact / full, 4) if full else 0.0
+    }
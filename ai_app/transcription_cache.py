@@ -0,0 +1,58 @@
+"""
+Transcription Cache - Whisper transcripts keyed by audio content, language and model
+"""
+import hashlib
+import os
+from typing import Any, Dict, Optional
+from ai_app import metrics
+from ai_app.completion_cache import CompletionCoalescer
+from ai_app.config import AIConfig
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+COUNTERS = ("transcription.upstream", "transcription.cache_hit", "transcription.coalesced")
+
+
+def transcription_key(audio_file, language: str, model: str) -> Optional[str]:
+    """
+    Cache key for a clip: SHA-256 of its bytes plus language and model
+    
+    Reads the file in chunks and leaves it at position 0. Returns None for
+    clips over VOICE_MAX_UPLOAD_BYTES, which Whisper would reject anyway.
+    """
+    size = audio_file.seek(0, os.SEEK_END)
+    audio_file.seek(0)
+    if size > AIConfig.VOICE_MAX_UPLOAD_BYTES:
+        return None
+    
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: audio_file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    audio_file.seek(0)
+    
+    return f"{model}:{language}:{digest.hexdigest()}"
+
+
+def transcription_stats() -> Dict[str, Any]:
+    """Whisper calls versus transcripts served from the cache or a running call"""
+    counts = metrics.get_counts(COUNTERS)
+    saved = counts["transcription.cache_hit"] + counts["transcription.coalesced"]
+    total = saved + counts["transcription.upstream"]
+    
+    return {
+        "upstream": counts["transcription.upstream"],
+        "cache_hits": counts["transcription.cache_hit"],
+        "coalesced": counts["transcription.coalesced"],
+        "saved_rate": round(saved / total, 4) if total else 0.0
+    }
+
+
+# Results are {"text": transcript}; see CompletionCoalescer for the locking
+transcription_cache = CompletionCoalescer(
+    ttl=AIConfig.TRANSCRIPTION_CACHE_TTL,
+    wait=AIConfig.TRANSCRIPTION_COALESCE_WAIT,
+    prefix="ai_transcript:",
+    metric="transcription",
+    max_entries=AIConfig.TRANSCRIPTION_CACHE_MAX_ENTRIES
+)
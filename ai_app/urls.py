@@ -8,7 +8,11 @@ from ai_app.views import (
     VoiceChatView,
     VoiceFileChatView,
     ConversationHistoryView,
-    DeleteSessionView
+    DeleteSessionView,
+    AIMetricsView,
+    AsyncTextChatView,
+    AsyncVoiceChatView,
+    AsyncVoiceFileChatView
 )
 
 urlpatterns = [
@@ -18,4 +22,10 @@ urlpatterns = [
     path('chat/voice-file/', VoiceFileChatView.as_view(), name='ai_voice_file_chat'),
     path('session/history/', ConversationHistoryView.as_view(), name='ai_conversation_history'),
     path('session/delete/', DeleteSessionView.as_view(), name='ai_delete_session'),
+    path('metrics/', AIMetricsView.as_view(), name='ai_metrics'),
+    
+    # Async (ASGI) variants of the chat endpoints
+    path('async/chat/text/', AsyncTextChatView.as_view(), name='ai_async_text_chat'),
+    path('async/chat/voice/', AsyncVoiceChatView.as_view(), name='ai_async_voice_chat'),
+    path('async/chat/voice-file/', AsyncVoiceFileChatView.as_view(), name='ai_async_voice_file_chat'),
 ]
@@ -1,22 +1,119 @@
 """
 AI App Views - REST API endpoints for FloorBot AI
 """
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from ai_app.serializers import (
     TextMessageSerializer,
     VoiceMessageSerializer,
     VoiceFileSerializer,
+    VoiceStreamSerializer,
     ChatResponseSerializer,
     ConversationHistorySerializer,
     SessionSerializer,
     SessionRequestSerializer
 )
-from ai_app.chatbot import FloorBotAI
-from ai_app.speech_service import SpeechService
-from ai_app.session_manager import SessionManager
+from ai_app.chatbot import FloorBotAI, AsyncFloorBotAI
+from ai_app.speech_service import SpeechService, AsyncSpeechService, AudioTooLarge
+from ai_app.session_manager import SessionManager, SESSION_BUSY
+from ai_app.intent_router import router_stats
+from ai_app.tool_payload import projection_stats
+from ai_app.completion_cache import completion_stats
+from ai_app.admission import admission_controlled, admission_stats
+from ai_app.session_cache import local_session_cache
+from ai_app.transcription_cache import transcription_stats
+
+
+def _encode_sse(event: dict) -> str:
+    data = json.dumps(event["data"], cls=DjangoJSONEncoder)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+def sse_response(events):
+    """Wrap chatbot events (sync or async iterable) in a Server-Sent Events response"""
+    if hasattr(events, "__aiter__"):
+        async def encode():
+            async for event in events:
+                yield _encode_sse(event)
+    else:
+        def encode():
+            for event in events:
+                yield _encode_sse(event)
+    
+    response = StreamingHttpResponse(encode(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# Content types accepted as a raw audio body -> default audio_format
+RAW_AUDIO_TYPES = {
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/wave': 'wav',
+    'audio/mpeg': 'mp3',
+    'audio/webm': 'webm',
+    'audio/mp4': 'm4a',
+    'audio/x-m4a': 'm4a',
+    'audio/ogg': 'ogg',
+    'application/octet-stream': 'wav',
+}
+
+
+def _media_type(request) -> str:
+    """Content type without parameters ('audio/webm;codecs=opus' -> 'audio/webm')"""
+    return request.content_type.split(';')[0].strip().lower()
+
+
+def _raw_audio_params(request, query_params):
+    """Validated parameters of a raw audio body request, or the serializer errors"""
+    serializer = VoiceStreamSerializer(data=query_params)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    
+    params = dict(serializer.validated_data)
+    params.setdefault('audio_format', RAW_AUDIO_TYPES[_media_type(request)])
+    return params, None
+
+
+def _voice_error(session_id, error: Exception, what: str = "voice message", transcribing: bool = True) -> tuple:
+    """
+    Response body and status for a failed voice request
+    
+    Oversized bodies get 413, unusable audio (empty, bad base64, too long)
+    400, and anything else (e.g. a Whisper or LLM failure) 500. Only errors
+    raised while reading and transcribing the audio (`transcribing`) count
+    as unusable audio; a ValueError from the chat turn is a server error.
+    """
+    if isinstance(error, AudioTooLarge):
+        status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    elif transcribing and isinstance(error, ValueError):
+        status_code = status.HTTP_400_BAD_REQUEST
+    else:
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    
+    return {
+        "session_id": session_id if session_id else None,
+        "response": f"Failed to process {what}: {str(error)}",
+        "success": False,
+        "error": str(error)
+    }, status_code
+
+
+def _turn_status(response_data: dict) -> int:
+    """409 for a turn rejected because the session is busy with another turn"""
+    if response_data.get("error") == SESSION_BUSY:
+        return status.HTTP_409_CONFLICT
+    return status.HTTP_200_OK
 
 
 class CreateSessionView(APIView):
@@ -46,6 +143,7 @@ class TextChatView(APIView):
     """Handle text-based chat messages"""
     permission_classes = [AllowAny]
     
+    @admission_controlled
     def post(self, request):
         """Send text message to AI"""
         serializer = TextMessageSerializer(data=request.data)
@@ -62,19 +160,41 @@ class TextChatView(APIView):
             session = chatbot.session_manager.create_session()
             session_id = session.session_id
         
+        if serializer.validated_data['stream']:
+            # The ASGI handler sends an async iterator event by event; a sync
+            # one would be read to the end before the first byte goes out.
+            # The async chatbot is built inside the generator, on the event
+            # loop: its client is per loop and this view runs in a thread.
+            async def events():
+                async for event in AsyncFloorBotAI().chat_stream(session_id, message):
+                    yield event
+            
+            return sse_response(events())
+        
         response_data = chatbot.chat(session_id, message)
         
         response_serializer = ChatResponseSerializer(response_data)
         
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(response_serializer.data, status=_turn_status(response_data))
 
 
 class VoiceChatView(APIView):
-    """Handle voice-based chat messages (base64 format)"""
+    """
+    Handle voice-based chat messages
+    
+    Accepts JSON with base64 audio, or the raw audio bytes as the request
+    body (Content-Type audio/* or application/octet-stream) with
+    session_id, language and audio_format in the query string. Raw bodies
+    are streamed to disk in chunks instead of being held as base64 text.
+    """
     permission_classes = [AllowAny]
     
+    @admission_controlled
     def post(self, request):
-        """Send voice message to AI (base64 encoded)"""
+        """Send voice message to AI (base64 encoded or raw body)"""
+        if _media_type(request) in RAW_AUDIO_TYPES:
+            return self._post_raw_audio(request)
+        
         serializer = VoiceMessageSerializer(data=request.data)
         
         if not serializer.is_valid():
@@ -85,6 +205,7 @@ class VoiceChatView(APIView):
         session_id = serializer.validated_data.get('session_id')
         language = serializer.validated_data['language']
         
+        transcribing = True
         try:
             speech_service = SpeechService()
             transcribed_text = speech_service.transcribe_base64_audio(
@@ -92,6 +213,7 @@ class VoiceChatView(APIView):
                 audio_format, 
                 language
             )
+            transcribing = False
             
             chatbot = FloorBotAI()
             
@@ -104,21 +226,52 @@ class VoiceChatView(APIView):
             
             response_serializer = ChatResponseSerializer(response_data)
             
-            return Response(response_serializer.data, status=status.HTTP_200_OK)
+            return Response(response_serializer.data, status=_turn_status(response_data))
         
         except Exception as e:
-            return Response({
-                "session_id": session_id,
-                "response": f"Failed to process voice message: {str(e)}",
-                "success": False,
-                "error": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            body, status_code = _voice_error(session_id, e, transcribing=transcribing)
+            return Response(body, status=status_code)
+    
+    def _post_raw_audio(self, request):
+        params, errors = _raw_audio_params(request, request.query_params)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        session_id = params.get('session_id')
+        
+        transcribing = True
+        try:
+            speech_service = SpeechService()
+            transcribed_text = speech_service.transcribe_stream(
+                request.stream,
+                params['audio_format'],
+                params['language']
+            )
+            transcribing = False
+            
+            chatbot = FloorBotAI()
+            
+            if not session_id:
+                session = chatbot.session_manager.create_session()
+                session_id = session.session_id
+            
+            response_data = chatbot.chat(session_id, transcribed_text)
+            response_data['transcribed_text'] = transcribed_text
+            
+            response_serializer = ChatResponseSerializer(response_data)
+            
+            return Response(response_serializer.data, status=_turn_status(response_data))
+        
+        except Exception as e:
+            body, status_code = _voice_error(session_id, e, transcribing=transcribing)
+            return Response(body, status=status_code)
 
 
 class VoiceFileChatView(APIView):
     """Handle voice file uploads from microphone (multipart/form-data)"""
     permission_classes = [AllowAny]
     
+    @admission_controlled
     def post(self, request):
         """Send voice file to AI (typical mic button format)"""
         serializer = VoiceFileSerializer(data=request.data)
@@ -130,12 +283,14 @@ class VoiceFileChatView(APIView):
         session_id = serializer.validated_data.get('session_id')
         language = serializer.validated_data['language']
         
+        transcribing = True
         try:
             speech_service = SpeechService()
             transcribed_text = speech_service.transcribe_file(
                 audio_file,
                 language
             )
+            transcribing = False
             
             chatbot = FloorBotAI()
             
@@ -148,15 +303,11 @@ class VoiceFileChatView(APIView):
             
             response_serializer = ChatResponseSerializer(response_data)
             
-            return Response(response_serializer.data, status=status.HTTP_200_OK)
+            return Response(response_serializer.data, status=_turn_status(response_data))
         
         except Exception as e:
-            return Response({
-                "session_id": session_id if session_id else None,
-                "response": f"Failed to process voice file: {str(e)}",
-                "success": False,
-                "error": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            body, status_code = _voice_error(session_id, e, "voice file", transcribing=transcribing)
+            return Response(body, status=status_code)
 
 
 class ConversationHistoryView(APIView):
@@ -213,3 +364,189 @@ class DeleteSessionView(APIView):
             "message": "Session deleted successfully",
             "success": True
         }, status=status.HTTP_200_OK)
+
+
+class AIMetricsView(APIView):
+    """Chatbot performance counters (staff only)"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """Current counters, aggregated over all workers"""
+        return Response({
+            "intent_router": router_stats(),
+            "product_projection": projection_stats(),
+            "completions": completion_stats(),
+            "admission": admission_stats(),
+            "transcriptions": transcription_stats(),
+            # Per worker: the answering process's local session cache
+            "session_cache": local_session_cache.stats()
+        }, status=status.HTTP_200_OK)
+
+
+# Async variants of the chat views. DRF's APIView is sync-only, so these are
+# plain Django views; under Daphne they await the LLM and Whisper calls
+# instead of holding a worker thread. Permissions match the views above.
+
+def _async_request_data(request):
+    """Parse a JSON or form/multipart body into serializer input"""
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    
+    data = request.POST.copy()
+    data.update(request.FILES)
+    return data
+
+
+def _invalid_body_response():
+    return JsonResponse({"detail": "Malformed JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def _async_voice_turn(session_id, transcribed_text):
+    """Run a chat turn for transcribed audio and build the JSON response"""
+    chatbot = AsyncFloorBotAI()
+    
+    if not session_id:
+        session = await chatbot.session_manager.acreate_session()
+        session_id = session.session_id
+    
+    response_data = await chatbot.chat(session_id, transcribed_text)
+    response_data['transcribed_text'] = transcribed_text
+    
+    response_serializer = ChatResponseSerializer(response_data)
+    
+    return JsonResponse(response_serializer.data, status=_turn_status(response_data))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncTextChatView(View):
+    """Handle text-based chat messages (async)"""
+    
+    @admission_controlled
+    async def post(self, request):
+        """Send text message to AI"""
+        data = _async_request_data(request)
+        if data is None:
+            return _invalid_body_response()
+        
+        serializer = TextMessageSerializer(data=data)
+        
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        message = serializer.validated_data['message']
+        session_id = serializer.validated_data.get('session_id')
+        
+        chatbot = AsyncFloorBotAI()
+        
+        if not session_id:
+            session = await chatbot.session_manager.acreate_session()
+            session_id = session.session_id
+        
+        if serializer.validated_data['stream']:
+            return sse_response(chatbot.chat_stream(session_id, message))
+        
+        response_data = await chatbot.chat(session_id, message)
+        
+        response_serializer = ChatResponseSerializer(response_data)
+        
+        return JsonResponse(response_serializer.data, status=_turn_status(response_data))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncVoiceChatView(View):
+    """Handle voice-based chat messages, base64 or raw body (async)"""
+    
+    @admission_controlled
+    async def post(self, request):
+        """Send voice message to AI (base64 encoded or raw body)"""
+        if _media_type(request) in RAW_AUDIO_TYPES:
+            return await self._post_raw_audio(request)
+        
+        data = _async_request_data(request)
+        if data is None:
+            return _invalid_body_response()
+        
+        serializer = VoiceMessageSerializer(data=data)
+        
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        audio_data = serializer.validated_data['audio_data']
+        audio_format = serializer.validated_data['audio_format']
+        session_id = serializer.validated_data.get('session_id')
+        language = serializer.validated_data['language']
+        
+        transcribing = True
+        try:
+            speech_service = AsyncSpeechService()
+            transcribed_text = await speech_service.transcribe_base64_audio(
+                audio_data,
+                audio_format,
+                language
+            )
+            transcribing = False
+            
+            return await _async_voice_turn(session_id, transcribed_text)
+        
+        except Exception as e:
+            body, status_code = _voice_error(session_id, e, transcribing=transcribing)
+            return JsonResponse(body, status=status_code)
+    
+    async def _post_raw_audio(self, request):
+        params, errors = _raw_audio_params(request, request.GET)
+        if errors:
+            return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        session_id = params.get('session_id')
+        
+        transcribing = True
+        try:
+            speech_service = AsyncSpeechService()
+            transcribed_text = await speech_service.transcribe_stream(
+                request,
+                params['audio_format'],
+                params['language']
+            )
+            transcribing = False
+            
+            return await _async_voice_turn(session_id, transcribed_text)
+        
+        except Exception as e:
+            body, status_code = _voice_error(session_id, e, transcribing=transcribing)
+            return JsonResponse(body, status=status_code)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncVoiceFileChatView(View):
+    """Handle voice file uploads from microphone (async)"""
+    
+    @admission_controlled
+    async def post(self, request):
+        """Send voice file to AI (typical mic button format)"""
+        serializer = VoiceFileSerializer(data=_async_request_data(request))
+        
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        audio_file = serializer.validated_data['audio_file']
+        session_id = serializer.validated_data.get('session_id')
+        language = serializer.validated_data['language']
+        
+        transcribing = True
+        try:
+            speech_service = AsyncSpeechService()
+            transcribed_text = await speech_service.transcribe_file(
+                audio_file,
+                language
+            )
+            transcribing = False
+            
+            return await _async_voice_turn(session_id, transcribed_text)
+        
+        except Exception as e:
+            body, status_code = _voice_error(session_id, e, "voice file", transcribing=transcribing)
+            return JsonResponse(body, status=status_code)
+
@@ -0,0 +1,140 @@
+"""
+Vocabulary - Typo-tolerant term lookup with a trigram index and bounded edit distance
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+
+# Candidates (by shared trigrams) that get a full edit-distance check
+MAX_CANDIDATES = 64
+MAX_CACHED_LOOKUPS = 4096
+
+# Edits tolerated when a term has exactly the word's letters, reordered
+# ("gery" -> "grey", "vynil" -> "vinyl"), from 4 letters up
+MAX_REORDER_EDITS = 2
+
+
+def max_edits(word: str) -> int:
+    """
+    Edits tolerated for a word: none up to 4 letters, one up to 7, then two
+    
+    Short words sit close to many real words ("good"/"wood", "read"/"red",
+    "great"/"grey"), so a looser bound silently turns them into filters.
+    """
+    if len(word) <= 4:
+        return 0
+    if len(word) <= 7:
+        return 1
+    return 2
+
+
+def trigrams(word: str) -> Set[str]:
+    """Character trigrams of a word padded so prefixes and suffixes count"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent swaps)
+    
+    Returns None as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return None
+        previous_previous, previous = previous, current
+    
+    distance = previous[len(b)]
+    return distance if distance <= limit else None
+
+
+class FuzzyVocabulary:
+    """
+    Set of known terms that resolves misspelled words to the closest ones
+    
+    Candidates come from a trigram index; only the best few are checked with
+    the (bounded) edit distance. Results are memoized, so repeated lookups
+    are dictionary hits.
+    """
+    
+    def __init__(self, terms: Dict[str, int]):
+        """
+        Args:
+            terms: term -> frequency (used to break distance ties)
+        """
+        self.terms = terms
+        self._trigrams: Dict[str, List[str]] = {}
+        for term in terms:
+            for gram in trigrams(term):
+                self._trigrams.setdefault(gram, []).append(term)
+        self._cache: Dict[str, List[str]] = {}
+    
+    def __contains__(self, word: str) -> bool:
+        return word in self.terms
+    
+    def similar(self, word: str) -> List[str]:
+        """
+        Known terms within `max_edits(word)` of `word`, closest (then most frequent) first
+        
+        Terms made of the same letters in another order are allowed up to
+        MAX_REORDER_EDITS. An exact match is always first.
+        """
+        cached = self._cache.get(word)
+        if cached is not None:
+            return cached
+        
+        limit = max_edits(word)
+        reorder_limit = MAX_REORDER_EDITS if len(word) >= 4 else 0
+        letters = sorted(word)
+        scored = []
+        if word in self.terms:
+            scored.append((0, -self.terms[word], word))
+        
+        if limit or reorder_limit:
+            shared: Dict[str, int] = {}
+            for gram in trigrams(word):
+                for term in self._trigrams.get(gram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+            
+            candidates = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+            for term in candidates:
+                if term == word:
+                    continue
+                distance = bounded_edit_distance(word, term, max(limit, reorder_limit))
+                if distance is None:
+                    continue
+                if distance <= limit or sorted(term) == letters:
+                    scored.append((distance, -self.terms[term], term))
+        
+        result = [term for _, _, term in sorted(scored)]
+        
+        if len(self._cache) >= MAX_CACHED_LOOKUPS:
+            self._cache.clear()
+        self._cache[word] = result
+        return result
+    
+    def correct(self, word: str) -> Optional[str]:
+        """Closest known term, or None if nothing is within the edit bound"""
+        matches = self.similar(word)
+        return matches[0] if matches else None
+    
+    @classmethod
+    def from_terms(cls, terms: Iterable[str]) -> "FuzzyVocabulary":
+        """Vocabulary over a fixed word list (all terms weighted equally)"""
+        return cls({term: 1 for term in terms})
@@ -1,5 +1,6 @@
 from django.urls import path
 from chat_app import consumers
+from ai_app.consumers import AIChatConsumer
 
 websocket_urlpatterns = [
     path(r'ws/asc/notifications/', consumers.NotificationConsumer.as_asgi()),
@@ -8,6 +9,7 @@ websocket_urlpatterns = [
     # path(r'ws/asc/reaction/<int:message_id>/', consumers.Sent_Reaction_ON_Message.as_asgi()),
     path(r'ws/asc/chat/seen_status_update/<int:chat_id>/', consumers.MessageSeenStatusUpdate.as_asgi()),
     path(r"ws/asc/location_change/", consumers.Location_Change_Websocket.as_asgi()),
+    path(r"ws/ai/chat/", AIChatConsumer.as_asgi()),
 
 
     # update chat consumers
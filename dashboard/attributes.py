@@ -0,0 +1,125 @@
+"""
+Normalized product attributes derived from the free-text product fields.
+
+`Product.save()` stores them in indexed columns (see SEARCH_ATTRIBUTE_FIELDS)
+so search, filtering and pricing read plain values instead of re-parsing
+`coverage_per_pack`, category titles and colour lists on every request.
+"""
+import re
+from decimal import Decimal, ROUND_HALF_UP
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, Q, Value, When
+
+
+SEARCH_ATTRIBUTE_FIELDS = (
+    'search_category',
+    'primary_color',
+    'coverage_value',
+    'coverage_unit',
+    'effective_price',
+    'discount_percentage',
+)
+
+COVERAGE_PATTERN = re.compile(r'\d+\.?\d*')
+
+# Checked in order against the category title, then the product title
+CATEGORY_KEYWORDS = (
+    ('carpets', ('carpet', 'rug')),
+    ('vinyl', ('vinyl', 'lvt')),
+    ('laminate', ('laminate',)),
+    ('wood flooring', ('wood', 'timber', 'hardwood')),
+)
+
+TITLE_COLORS = (
+    'grey', 'gray', 'beige', 'brown', 'white', 'black', 'oak', 'walnut',
+    'natural', 'dark', 'light', 'cream', 'tan', 'charcoal',
+)
+
+CENT = Decimal('0.01')
+
+
+def category_type(category_title, product_title):
+    """Product type ('carpets', 'vinyl', 'laminate', 'wood flooring' or 'flooring')"""
+    for text in (category_title, product_title):
+        text = (text or '').lower()
+        for name, keywords in CATEGORY_KEYWORDS:
+            if any(keyword in text for keyword in keywords):
+                return name
+    return 'flooring'
+
+
+def category_type_expression(category_title):
+    """`category_type()` for every product of a category, as one UPDATE value.
+
+    A category title naming a type decides it outright; otherwise each
+    product's own title is checked in SQL.
+    """
+    category_name = category_type(category_title, '')
+    if category_name != 'flooring':
+        return Value(category_name)
+
+    whens = [
+        When(reduce(or_, (Q(product_title__icontains=keyword) for keyword in keywords)), then=Value(name))
+        for name, keywords in CATEGORY_KEYWORDS
+    ]
+    return Case(*whens, default=Value('flooring'))
+
+
+def primary_color(available_colors, product_title):
+    """First listed colour, else a colour word from the title, else 'Natural'"""
+    first = (available_colors or '').split(',')[0].strip()
+    if first:
+        return first
+
+    title = (product_title or '').lower()
+    for color in TITLE_COLORS:
+        if color in title:
+            return color.capitalize()
+
+    return 'Natural'
+
+
+def parse_coverage(coverage_per_pack):
+    """First number in e.g. '2.5 m2 per box' (1.0 when there is none)"""
+    numbers = COVERAGE_PATTERN.findall(coverage_per_pack or '')
+    return float(numbers[0]) if numbers else 1.0
+
+
+def coverage_unit(coverage_per_pack):
+    """'box' for products sold by the box or pack, otherwise 'm2'"""
+    text = (coverage_per_pack or '').lower()
+    return 'box' if 'box' in text or 'pack' in text else 'm2'
+
+
+def effective_price(regular_price, sale_price):
+    """Price the customer pays: the sale price when one is set"""
+    return Decimal(sale_price) if sale_price else Decimal(regular_price or 0)
+
+
+def discount_percentage(regular_price, sale_price):
+    """Sale discount off the regular price, rounded to 2 places"""
+    regular_price = Decimal(regular_price or 0)
+    sale_price = Decimal(sale_price or 0)
+    if not sale_price or not regular_price or sale_price >= regular_price:
+        return Decimal('0.00')
+
+    percentage = (regular_price - sale_price) / regular_price * 100
+    return percentage.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def search_attributes(product):
+    """Values for SEARCH_ATTRIBUTE_FIELDS computed from a product's own fields.
+
+    Works with historical models in migrations as well as `Product`.
+    """
+    category = product.main_category
+    return {
+        'search_category': category_type(category.title if category else '', product.product_title),
+        'primary_color': primary_color(product.available_colors, product.product_title)[:100],
+        'coverage_value': parse_coverage(product.coverage_per_pack),
+        'coverage_unit': coverage_unit(product.coverage_per_pack),
+        'effective_price': effective_price(product.regular_price, product.sale_price),
+        'discount_percentage': discount_percentage(product.regular_price, product.sale_price),
+    }
@@ -0,0 +1,24 @@
+# Creates the SQLite FTS5 mirror of product text used by dashboard.search
+
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    from dashboard.search import create_fts_schema
+    create_fts_schema(schema_editor)
+
+
+def drop_fts(apps, schema_editor):
+    from dashboard.search import drop_fts_schema
+    drop_fts_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0023_remove_ordertable_product_remove_ordertable_products_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
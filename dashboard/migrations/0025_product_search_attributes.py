@@ -0,0 +1,77 @@
+# Adds the normalized search attributes computed by Product.save() and
+# backfills them. Adding columns rebuilds the product table on SQLite, which
+# fails while the FTS triggers reference it, so the FTS schema is dropped
+# first and re-created afterwards.
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+def create_fts(apps, schema_editor):
+    from dashboard.search import create_fts_schema
+    create_fts_schema(schema_editor)
+
+
+def drop_fts(apps, schema_editor):
+    from dashboard.search import drop_fts_schema
+    drop_fts_schema(schema_editor)
+
+
+def backfill_search_attributes(apps, schema_editor):
+    from dashboard.attributes import SEARCH_ATTRIBUTE_FIELDS, search_attributes
+
+    Product = apps.get_model('dashboard', 'Product')
+    products = []
+    for product in Product.objects.select_related('main_category').iterator(chunk_size=BATCH_SIZE):
+        for field, value in search_attributes(product).items():
+            setattr(product, field, value)
+        products.append(product)
+        if len(products) >= BATCH_SIZE:
+            Product.objects.bulk_update(products, SEARCH_ATTRIBUTE_FIELDS)
+            products = []
+    Product.objects.bulk_update(products, SEARCH_ATTRIBUTE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0024_product_search_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_fts, create_fts),
+        migrations.AddField(
+            model_name='product',
+            name='coverage_unit',
+            field=models.CharField(default='m2', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='coverage_value',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0.0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_color',
+            field=models.CharField(db_index=True, default='Natural', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_category',
+            field=models.CharField(db_index=True, default='flooring', max_length=32),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(backfill_search_attributes, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Now
 from auths.models import CustomUser
 from decimal import Decimal
+from .attributes import SEARCH_ATTRIBUTE_FIELDS, category_type_expression, search_attributes
 
 # Create your models here.
 
@@ -19,6 +21,34 @@ class Category(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_title = instance.__dict__.get('title')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        renamed = (
+            not self._state.adding
+            and (update_fields is None or 'title' in update_fields)
+            and self.title != getattr(self, '_saved_title', None)
+        )
+        if not renamed:
+            super().save(*args, **kwargs)
+        else:
+            # Products store the product type derived from the category title.
+            # They are updated first, so the post_save handlers that drop the
+            # search caches never see the old types; updated_at moves the
+            # catalog stamp that other processes check.
+            with transaction.atomic():
+                self.product_set.update(
+                    search_category=category_type_expression(self.title),
+                    updated_at=Now()
+                )
+                super().save(*args, **kwargs)
+        self._saved_title = self.title
+
 
 
 class Product(models.Model):
@@ -66,10 +96,30 @@ class Product(models.Model):
     total_salses = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Normalized search attributes, recomputed on every save (dashboard.attributes)
+    search_category = models.CharField(max_length=32, default='flooring', db_index=True)
+    primary_color = models.CharField(max_length=100, default='Natural', db_index=True)
+    coverage_value = models.FloatField(default=1.0)
+    coverage_unit = models.CharField(max_length=8, default='m2')
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, db_index=True)
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, db_index=True)
     
     def __str__(self):
         return self.product_title
 
+    def save(self, *args, **kwargs):
+        self.refresh_search_attributes()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(SEARCH_ATTRIBUTE_FIELDS)
+        super().save(*args, **kwargs)
+
+    def refresh_search_attributes(self):
+        """Recompute the normalized search attributes from the product's fields"""
+        for field, value in search_attributes(self).items():
+            setattr(self, field, value)
+
 
 
 
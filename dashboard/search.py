@@ -0,0 +1,216 @@
+"""
+Full-text product search backed by an SQLite FTS5 table.
+
+`dashboard_product_fts` mirrors the searchable text of `Product` (plus the
+category title) and is kept in sync by triggers on the product and category
+tables. On other database backends, or if the table is missing, every helper
+falls back to the plain `icontains` filters the views used before.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import Product
+
+
+FTS_TABLE = 'dashboard_product_fts'
+
+# FTS column -> Product lookup used for the icontains fallback
+FTS_COLUMNS = {
+    'product_title': 'product_title',
+    'item_description': 'item_description',
+    'available_colors': 'available_colors',
+    'materials': 'materials',
+    'pattern_type': 'pattern_type',
+    'tags': 'tags',
+    'category_title': 'main_category__title',
+}
+
+# bm25() weights, in FTS_COLUMNS order: title hits matter most
+FTS_WEIGHTS = (10.0, 2.0, 4.0, 4.0, 3.0, 2.0, 6.0)
+
+FTS_TRIGGERS = (
+    'dashboard_product_fts_ai',
+    'dashboard_product_fts_au',
+    'dashboard_product_fts_ad',
+    'dashboard_category_fts_au',
+)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def _row_values(alias):
+    return (
+        f"{alias}.product_title, {alias}.item_description, {alias}.available_colors, "
+        f"{alias}.materials, COALESCE({alias}.pattern_type, ''), COALESCE({alias}.tags, ''), "
+        f"COALESCE((SELECT title FROM dashboard_category WHERE id = {alias}.main_category_id), '')"
+    )
+
+
+def create_fts_schema(schema_editor):
+    """Create (or re-create) the FTS table, backfill it and install sync triggers.
+
+    Must be re-run by any migration that makes Django rebuild the product
+    table on SQLite, since dropping the old table drops its triggers. Such a
+    migration has to call drop_fts_schema() before the rebuild as well: the
+    category trigger references the product table, and SQLite refuses the
+    rename that completes the rebuild while it does.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    columns = ', '.join(FTS_COLUMNS)
+    drop_fts_schema(schema_editor)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+        f"SELECT p.id, {_row_values('p')} FROM dashboard_product p"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER dashboard_product_fts_ai AFTER INSERT ON dashboard_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {_row_values('new')}); "
+        f"END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER dashboard_product_fts_au AFTER UPDATE ON dashboard_product BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {_row_values('new')}); "
+        f"END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER dashboard_product_fts_ad AFTER DELETE ON dashboard_product BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+        f"END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER dashboard_category_fts_au AFTER UPDATE OF title ON dashboard_category BEGIN "
+        f"UPDATE {FTS_TABLE} SET category_title = new.title "
+        f"WHERE rowid IN (SELECT id FROM dashboard_product WHERE main_category_id = new.id); "
+        f"END"
+    )
+
+
+def drop_fts_schema(schema_editor):
+    """Remove the FTS table and its triggers"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for trigger in FTS_TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class ProductSearch:
+    """
+    Shared product text search.
+
+    Results are ranked by weighted BM25 when FTS5 is available; otherwise the
+    same calls degrade to `icontains` filtering without ranking.
+    """
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self):
+        """True when the FTS table and all of its sync triggers exist"""
+        if self._available is None:
+            if connection.vendor != 'sqlite':
+                self._available = False
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT name FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND name LIKE %s)",
+                        [FTS_TABLE, 'dashboard_%_fts_%'],
+                    )
+                    names = {row[0] for row in cursor.fetchall()}
+                self._available = FTS_TABLE in names and names.issuperset(FTS_TRIGGERS)
+        return self._available
+
+    def reset(self):
+        """Forget the cached availability check (e.g. after migrations)"""
+        self._available = None
+
+    def build_match(self, query, columns=None):
+        """Turn free user text into a safe FTS5 MATCH expression.
+
+        Every word becomes a quoted prefix term and all words must match,
+        optionally restricted to `columns`.
+        """
+        words = TOKEN_PATTERN.findall((query or '').lower())
+        if not words:
+            return None
+
+        expression = ' AND '.join(f'"{word}"*' for word in words)
+        if columns:
+            return '{%s} : (%s)' % (' '.join(columns), expression)
+        return expression
+
+    def ranked_ids(self, query, columns=None, limit=None):
+        """Product ids matching `query`, best BM25 match first"""
+        match = self.build_match(query, columns)
+        if match is None:
+            return []
+
+        if not self.is_available():
+            queryset = Product.objects.filter(self._fallback_q(query, columns, '')).order_by('pk')
+            ids = queryset.values_list('pk', flat=True)
+            return list(ids[:limit] if limit else ids)
+
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {self._rank_sql()}"
+        params = [match]
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, queryset, query, columns=None):
+        """Filter a Product queryset by `query`, ordered by relevance"""
+        match = self.build_match(query, columns)
+        if match is None:
+            return queryset
+
+        if not self.is_available():
+            return queryset.filter(self._fallback_q(query, columns, ''))
+
+        table = Product._meta.db_table
+        rank = RawSQL(
+            f"SELECT {self._rank_sql()} FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id",
+            (match,),
+        )
+        return queryset.filter(self.match_q(query, columns)).annotate(search_rank=rank).order_by('search_rank', 'pk')
+
+    def match_q(self, query, columns=None, prefix=''):
+        """Q object selecting products matching `query`.
+
+        `prefix` lets other models filter through a relation, e.g.
+        `match_q(search, ('product_title',), prefix='items__product__')`.
+        """
+        match = self.build_match(query, columns)
+        if match is None:
+            return Q()
+
+        if not self.is_available():
+            return self._fallback_q(query, columns, prefix)
+
+        ids = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        return Q(**{f'{prefix}pk__in': ids})
+
+    def _rank_sql(self):
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return f"bm25({FTS_TABLE}, {weights})"
+
+    def _fallback_q(self, query, columns, prefix):
+        condition = Q()
+        for column in (columns or FTS_COLUMNS):
+            condition |= Q(**{f'{prefix}{FTS_COLUMNS[column]}__icontains': query})
+        return condition
+
+
+product_search = ProductSearch()
@@ -1,3 +1,119 @@
 from django.test import TestCase
+from .models import Product, Category
+from .search import product_search
 
 # Create your tests here.
+
+
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        product_search.reset()
+        self.category = Category.objects.create(title="Carpets", image="categoris/carpets.png")
+        self.title_hit = self._product("P1", "Grey Twist Carpet", "Hard wearing loop pile")
+        self.description_hit = self._product("P2", "Berber Loop", "Soft carpet in a grey tone")
+
+    def _product(self, product_id, title, description):
+        return Product.objects.create(
+            product_title=title,
+            brand_manufacturer="Brand",
+            item_description=description,
+            main_category=self.category,
+            product_id=product_id,
+            primary_image="products/placeholder.png",
+        )
+
+    def test_fts_available(self):
+        self.assertTrue(product_search.is_available())
+
+    def test_title_matches_rank_first(self):
+        ids = product_search.ranked_ids("carpet")
+        self.assertEqual(ids, [self.title_hit.pk, self.description_hit.pk])
+
+    def test_triggers_track_updates_and_deletes(self):
+        self.description_hit.product_title = "Sisal Runner"
+        self.description_hit.save()
+        self.assertEqual(product_search.ranked_ids("sisal"), [self.description_hit.pk])
+
+        self.description_hit.delete()
+        self.assertEqual(product_search.ranked_ids("sisal"), [])
+
+    def test_category_rename_is_searchable(self):
+        self.category.title = "Rugs"
+        self.category.save()
+        ids = product_search.ranked_ids("rugs", columns=("category_title",))
+        self.assertEqual(set(ids), {self.title_hit.pk, self.description_hit.pk})
+
+    def test_search_queryset_is_ranked(self):
+        products = product_search.search(Product.objects.all(), "grey carpet")
+        self.assertEqual(list(products), [self.title_hit, self.description_hit])
+
+
+class ProductSearchAttributesTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(title="Luxury Vinyl Tiles", image="categoris/vinyl.png")
+        self.product = Product.objects.create(
+            product_title="Coastal Plank",
+            brand_manufacturer="Brand",
+            main_category=self.category,
+            product_id="V1",
+            primary_image="products/placeholder.png",
+            coverage_per_pack="2.2 m2 per box",
+            available_colors="Grey, Silver",
+            regular_price=40,
+            sale_price=30,
+        )
+
+    def test_attributes_computed_on_save(self):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.search_category, "vinyl")
+        self.assertEqual(self.product.primary_color, "Grey")
+        self.assertEqual(self.product.coverage_value, 2.2)
+        self.assertEqual(self.product.coverage_unit, "box")
+        self.assertEqual(self.product.effective_price, 30)
+        self.assertEqual(self.product.discount_percentage, 25)
+
+        self.product.sale_price = 0
+        self.product.save(update_fields=["sale_price"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.effective_price, 40)
+        self.assertEqual(self.product.discount_percentage, 0)
+
+    def test_category_rename_updates_products(self):
+        self.category.title = "Laminate"
+        self.category.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.search_category, "laminate")
+
+        # A title naming no type falls back to each product's title
+        Product.objects.filter(pk=self.product.pk).update(product_title="Oak Hardwood Plank")
+        category = Category.objects.get(pk=self.category.pk)
+        category.title = "Clearance"
+        category.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.search_category, "wood flooring")
+
+    def test_category_rename_precedes_post_save(self):
+        from django.db.models.signals import post_save
+
+        seen = []
+
+        def record(sender, instance, **kwargs):
+            seen.append(Product.objects.get(pk=self.product.pk).search_category)
+
+        before = Product.objects.get(pk=self.product.pk).updated_at
+        post_save.connect(record, sender=Category)
+        try:
+            self.category.title = "Laminate"
+            self.category.save()
+        finally:
+            post_save.disconnect(record, sender=Category)
+
+        # Caches dropped by post_save must not be rebuilt from the old type
+        self.assertEqual(seen, ["laminate"])
+        self.assertGreater(Product.objects.get(pk=self.product.pk).updated_at, before)
+
+    def test_category_save_without_rename_skips_products(self):
+        category = Category.objects.get(pk=self.category.pk)
+        category.image = "categoris/vinyl-new.png"
+        with self.assertNumQueries(1):
+            category.save()
@@ -129,6 +129,7 @@ class CustomerFeedBacke(APIView):
     
 
 from django.db.models import Q
+from .search import product_search
 
 class OrdersManagementsAdminView(APIView):
     permission_classes = [IsAdminUser]
@@ -146,7 +147,7 @@ class OrdersManagementsAdminView(APIView):
                 orders = OrderTable.objects.filter(
                     Q(user__full_name__icontains=search) |
                     Q(id__icontains=search) |
-                    Q(items__product__product_title__icontains=search) |
+                    product_search.match_q(search, ('product_title',), prefix='items__product__') |
                     Q(items__product__id__icontains=search)
                 ).distinct()
 
@@ -158,7 +159,7 @@ class OrdersManagementsAdminView(APIView):
                     Q(status="in_transit") & (
                         Q(user__full_name__icontains=search) |
                         Q(id__icontains=search) |
-                        Q(items__product__product_title__icontains=search) |
+                        product_search.match_q(search, ('product_title',), prefix='items__product__') |
                         Q(items__product__id__icontains=search)
                     )
                 ).distinct()
@@ -171,7 +172,7 @@ class OrdersManagementsAdminView(APIView):
                     Q(status="placed") & (
                         Q(user__full_name__icontains=search) |
                         Q(id__icontains=search) |
-                        Q(items__product__product_title__icontains=search) |
+                        product_search.match_q(search, ('product_title',), prefix='items__product__') |
                         Q(items__product__id__icontains=search)
                     )
                 ).distinct()
@@ -184,7 +185,7 @@ class OrdersManagementsAdminView(APIView):
                     Q(status="cancelled") & (
                         Q(user__full_name__icontains=search) |
                         Q(id__icontains=search) |
-                        Q(items__product__product_title__icontains=search) |
+                        product_search.match_q(search, ('product_title',), prefix='items__product__') |
                         Q(items__product__id__icontains=search)
                     )
                 ).distinct()
@@ -196,7 +197,7 @@ class OrdersManagementsAdminView(APIView):
                     Q(status="delivered") & (
                         Q(user__full_name__icontains=search) |
                         Q(id__icontains=search) |
-                        Q(items__product__product_title__icontains=search) |
+                        product_search.match_q(search, ('product_title',), prefix='items__product__') |
                         Q(items__product__id__icontains=search)
                     )
                 ).distinct()
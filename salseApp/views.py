@@ -4,11 +4,11 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from .serializers import ProductSerializerPublic, CategorisSerializers, OrderSerializers, OrderCreateSerializer,OrderCreateSerializerV2, ProductSearchSuggestion, OrderFeedBackSerializer, OrderDelivaryStatusUpdateSerializer
 from dashboard.models import Product, Category, OrderTable, OrderItem, CustomUser
+from dashboard.search import product_search
 from Floor_Bot.pagination import CustomPagination
 from Floor_Bot import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Q
 from django.db import transaction
 from decimal import Decimal
 import json
@@ -91,9 +91,10 @@ class ProductsView(APIView):
             })
 
         else:
-            products = Product.objects.filter(
-                Q(product_title__icontains=search) |
-                Q(item_description__icontains=search)
+            products = product_search.search(
+                Product.objects.all(),
+                search,
+                columns=('product_title', 'item_description')
             )
             paginator = self.pagination_class()
             page = paginator.paginate_queryset(products, request)